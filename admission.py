@@ -0,0 +1,189 @@
+"""
+Admission control for audits, with priority lanes.
+
+Every async audit (and every program fetch a batch shares between its
+items) runs in a slot of one AdmissionScheduler per process. Slots are
+handed out per lane:
+
+- a lane never holds more than its own limit, so a cohort in the "batch"
+  lane cannot take the slots "interactive" users need;
+- when lanes are waiting for the same free slot, they get slots in
+  proportion to their weights (stride scheduling: each admission advances
+  the lane's pass by 1 / weight and the lane with the lowest pass goes
+  next). A lane that was idle resumes at the current pass instead of
+  catching up on the turns it did not use.
+
+Within a lane, requests are admitted first come, first served.
+"""
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+@dataclass
+class LaneConfig:
+    """
+    Configuration of one lane.
+
+    Attributes:
+        limit: Maximum audits of this lane running at once
+        weight: Share of contended slots relative to the other lanes
+    """
+    limit: int
+    weight: float = 1.0
+
+
+@dataclass
+class _Lane:
+    config: LaneConfig
+    running: int = 0
+    passes: float = 0.0
+    # (time.monotonic() when queued, future resolved on admission)
+    waiters: Deque[Tuple[float, "asyncio.Future[None]"]] = field(default_factory=deque)
+    admitted: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class AdmissionScheduler:
+    """
+    Hands out capacity slots to lanes.
+
+    Args:
+        capacity: Slots shared by all lanes
+        lanes: Lane configurations by name
+    """
+
+    def __init__(self, capacity: int, lanes: Dict[str, LaneConfig]):
+        self.capacity = capacity
+        self._lanes = {name: _Lane(config) for name, config in lanes.items()}
+        self._running = 0
+        # Pass of the latest admission; lanes with nothing queued rejoin from here
+        self._pass = 0.0
+        self._lock = Lock()
+
+    def _lane(self, name: str) -> _Lane:
+        lane = self._lanes.get(name)
+        if lane is None:
+            raise ValueError(f"Unknown admission lane '{name}'")
+        return lane
+
+    def _admit(self, lane: _Lane, waited: float):
+        lane.running += 1
+        self._running += 1
+        self._pass = max(self._pass, lane.passes)
+        lane.passes += 1.0 / lane.config.weight
+        lane.admitted += 1
+        lane.wait_seconds += waited
+        lane.max_wait_seconds = max(lane.max_wait_seconds, waited)
+
+    def _dispatch(self):
+        """Wake waiters while slots are free, lowest pass first."""
+        while self._running < self.capacity:
+            ready = [
+                lane for lane in self._lanes.values()
+                if lane.running < lane.config.limit and lane.waiters
+            ]
+            if not ready:
+                return
+            lane = min(ready, key=lambda lane: lane.passes)
+            enqueued, waiter = lane.waiters.popleft()
+            if waiter.done():  # cancelled while waiting
+                continue
+            self._admit(lane, time.monotonic() - enqueued)
+            waiter.set_result(None)
+
+    async def acquire(self, name: str):
+        lane = self._lane(name)
+        with self._lock:
+            if not lane.waiters:
+                lane.passes = max(lane.passes, self._pass)
+            if self._running < self.capacity and lane.running < lane.config.limit and not lane.waiters:
+                self._admit(lane, 0.0)
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            lane.waiters.append((time.monotonic(), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.done() and not waiter.cancelled():
+                    # Admitted just as the caller went away: hand the slot on
+                    self._release(lane)
+                else:
+                    waiter.cancel()
+                    self._prune(lane)
+            raise
+
+    def _prune(self, lane: _Lane):
+        lane.waiters = deque((t, w) for t, w in lane.waiters if not w.done())
+
+    def _release(self, lane: _Lane):
+        lane.running -= 1
+        self._running -= 1
+        self._dispatch()
+
+    def release(self, name: str):
+        with self._lock:
+            self._release(self._lane(name))
+
+    @asynccontextmanager
+    async def slot(self, name: str) -> AsyncIterator[None]:
+        """Hold one slot of lane name for the duration of the block."""
+        await self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Running and queued audits, admissions and queueing time per lane."""
+        with self._lock:
+            return {
+                name: {
+                    "running": lane.running,
+                    "queued": sum(1 for _, w in lane.waiters if not w.done()),
+                    "limit": lane.config.limit,
+                    "weight": lane.config.weight,
+                    "admitted": lane.admitted,
+                    "avg_wait_seconds": round(lane.wait_seconds / lane.admitted, 4) if lane.admitted else 0.0,
+                    "max_wait_seconds": round(lane.max_wait_seconds, 4),
+                }
+                for name, lane in self._lanes.items()
+            }
+
+
+_scheduler: Optional[AdmissionScheduler] = None
+_scheduler_lock = Lock()
+
+
+def get_scheduler() -> AdmissionScheduler:
+    """
+    Process-wide scheduler. MAX_CONCURRENT_AUDITS (default: 200) is the
+    capacity; INTERACTIVE_MAX_AUDITS (default: all of it) and
+    BATCH_MAX_AUDITS (default: half of it) bound the lanes, and
+    INTERACTIVE_WEIGHT (default: 4) and BATCH_WEIGHT (default: 1) weigh them.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            capacity = int(os.getenv("MAX_CONCURRENT_AUDITS", "200"))
+            _scheduler = AdmissionScheduler(capacity, {
+                INTERACTIVE: LaneConfig(
+                    limit=int(os.getenv("INTERACTIVE_MAX_AUDITS") or capacity),
+                    weight=float(os.getenv("INTERACTIVE_WEIGHT", "4")),
+                ),
+                BATCH: LaneConfig(
+                    limit=int(os.getenv("BATCH_MAX_AUDITS") or max(1, capacity // 2)),
+                    weight=float(os.getenv("BATCH_WEIGHT", "1")),
+                ),
+            })
+        return _scheduler
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass, field, asdict
-from typing import List, Iterator, Optional, Literal, Dict, Tuple   
+from typing import List, Iterator, Optional, Literal, Dict, Sequence, Set, Tuple, Callable
 from enum import Enum
 from transcript import *
 from common import *
@@ -12,88 +12,16 @@ from xai_sdk.chat import tool, tool_result, user, system
 from pydantic import BaseModel, Field
 from program import *
 from fetcher import *
-class Status(Enum):
-    FULFILLED = "FULFILLED"
-    UNFULFILLED = "UNFULFILLED"
-
-
-class AgentBlockReport(BaseModel):
-    """     
-    A BlockReport represents a report of a Block. A Block is "block of requirements".
-    Each Block can be of only 4 types; PROGRAM, REQUIRED, COMPLEMENTARY, CUSTOM. 
-    A PROGRAM can contain either REQUIRED or COMPLEMENTARY or both blocks. A COMPLEMENTARY Block 
-    further can have one or more CUSTOM blocks. Example Report:
-    { 
-        "name": "XYZ Major",
-        "minimum_credit": 36,
-        "received_credit":21,
-        "block_type":"PROGRAM",
-        "notes":["overall need 15 more credits" ],
-        "status": "UNFULFILLED",
-        "courses": [], //shoudl be left empty for block's of type PROGRAM 
-        "blocks":[
-                    {
-                        "name": "Required Courses",
-                        "minimum_credit": 18,
-                        "received_credit":12,
-                        "block_type":"REQUIRED",
-                        "status": "UNFULFILLED",
-                        "courses": [('MATH', '223','3'),('MATH', '318','3'),('MATH', '340','3'),('MATH', '370','3')],
-                        "notes": ["need 6 credits from MATH 389, MATH 240"],
-                        "blocks":[],
-                    },
-                    {
-                        "name": "Complementary Courses",
-                        "minimum_credit": 18,
-                        "received_credit":6,
-                        "block_type":"COMPLEMENTARY",
-                        "status": "UNFULFILLED",
-                        "courses": [('MATH', '223','3')], //courses that generally goes to the complementary block and not to any specific CUSTOM block
-                        "notes": ["need 3 more credits from Group A","9 credit from any MATH courses 300 level and above except MATH 389"],
-                        "blocks":[
-                            {
-                                "name": "Group A",
-                                "block_type": "CUSTOM",
-                                "courses": [('PHYS', '141','3')],
-                            }
-                        ],
-                    }    
-                ]
-    }
-    """
-   
-    name: str = Field(description="Name of the block. eg:'Major Mathematics','Required Courses', 'Group A', 'Complementary Courses' etc.")
-    minimum_credit: Optional[int] = Field(default=None, description="Minimum credit requierments for this block. Must be 0 skipped for CUSTOM blocks.")
-    received_credit: Optional[int] = Field(default=None,description="Total credit recieved for this block. For COMPLEMENTARY block total credit count includes the credit recieved for contained CUSTOM blocks. SO, for CUSTOM blocks this field can be skipped.")
-    block_type: BlockType
-    notes: List[str] = Field(default_factory=list,
-        description="""
-            Notes can be dropped to specifiy the requirements that is still needed to be 
-            fufilled for this block. When requirements have not been fulfilled. Provide a 1 line note 
-            on what is needed. For example: 'Need (COMP 230 or COMP 350) and MATH 360 ', 'need 6 credits 
-            from Ecom 300 level and above'", "need 8 credits from COMP courses 300 level and above except COMP 396".
-            When there is a big list of courses (generally from a block), then you can directly refer 
-            to block's name. For example: "need 6 more credits from block A". Since, the structure is recursive 
-            makes sure we do not repeat notes.
-        """)
-    
-    status: Status= Field(description="If all the requirements of this block has been fulfilled then status is FULFILLED otherwise UNFULFILLED.")  
-    courses: List[Tuple[str,str,str]]  = Field(default_factory=list, description="Courses fulfilling this block's requirements. Example: [('MATH','223','3'),('COMP','206','4'))]")
-    blocks:  Optional[List[AgentBlockReport]] = Field(default_factory=list, description="Only PROGRAM, and COMPLEMENTARY blocks can further have nested blocks.")
-    
-    def to_dict(self):
-        """Convert this report (and all nested reports) into a plain dict."""
-        return {
-            "name": self.name,
-            "minimum_credit": self.minimum_credit,
-            "received_credit": self.received_credit,
-            "block_type": self.block_type.value,   # Enum → string
-            "notes": self.notes,
-            "status": self.status.value,           # Enum → string
-            "courses": self.courses,
-            "blocks": [b.to_dict() for b in self.blocks],  # recursive
-        }
-
+from report import *
+from hedging import *
+from response_cache import ResponseCache, open_cache, make_key
+from replay import get_traffic_store
+from stream_parser import IncrementalReportParser
+from rules import evaluate_best_effort, evaluate_program, used_courses
+from incremental import IncrementalPlan
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, wait
+import asyncio
 AGENT_INSTRUCTIONS="""
 You are a degree audit agent. A degree consists of multiple Programs. A Program consists of 
 Blocks (Blocks of requirements). Each Block can be of 4 types; PROGRAM, REQUIRED, COMPLEMENTARY, CUSTOM. 
@@ -138,20 +66,135 @@ class TaskStatus:
 class AgentException(Exception):
     pass
 
+
+@dataclass
+class AgentConfig:
+    """
+    Configuration for the audit agent's LLM calls.
+
+    Attributes:
+        model: Model used for the audit (default: grok-4-fast-reasoning)
+        max_tokens: Maximum tokens for one report (default: 10000)
+        temperature: Sampling temperature (default: 0.0)
+        top_p: Nucleus sampling parameter (default: 1.0)
+        max_retries: Attempts per program before the agent fails (default: 3)
+        hedge: Hedging and per-request deadline settings (default: HedgeConfig())
+        cache_dir: Directory of the on-disk response cache, None to disable (default: None)
+        cache_max_bytes: Size after which cached responses are evicted (default: 256 MiB)
+        cache_read_only: If True, the cache is consulted but never written (default: False)
+        stream: If True, reports are streamed and nested blocks are emitted as they close (default: False)
+        local_rules: If True, programs whose rules all compile are audited without the LLM (default: False)
+        fetch_share: Fraction of an audit's remaining deadline that program fetching may use (default: 0.5)
+        min_llm_seconds: Under a deadline, programs are evaluated locally instead once less time than
+            this (or than the median of recent LLM calls, if longer) is left (default: 5)
+    """
+    model: str = "grok-4-fast-reasoning" #grok-4-latest grok-4-fast-reasoning grok-3-mini
+    max_tokens: int = 10000
+    temperature: float = 0.0
+    top_p: float = 1.0
+    max_retries: int = 3
+    hedge: HedgeConfig = field(default_factory=HedgeConfig)
+    cache_dir: Optional[str] = None
+    cache_max_bytes: int = 256 * 1024 * 1024
+    cache_read_only: bool = False
+    stream: bool = False
+    local_rules: bool = False
+    fetch_share: float = 0.5
+    min_llm_seconds: float = 5.0
+
+    def sampling_params(self) -> Dict[str, object]:
+        return {
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+        }
+
+    @classmethod
+    def from_env(cls) -> "AgentConfig":
+        """
+        Build a config from environment variables.
+
+        LLM_HEDGE=1 enables hedging, LLM_HEDGE_PERCENTILE sets the percentile
+        and LLM_REQUEST_DEADLINE sets the per-request deadline in seconds.
+        LLM_CACHE_DIR enables the response cache, LLM_CACHE_MAX_MB bounds it
+        and LLM_CACHE_READONLY=1 makes it read-only. LLM_STREAM=1 turns on
+        streaming and LOCAL_RULES=1 turns on local evaluation.
+        """
+        deadline = os.getenv("LLM_REQUEST_DEADLINE")
+        return cls(
+            hedge=HedgeConfig(
+                enabled=os.getenv("LLM_HEDGE", "0") == "1",
+                percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+                deadline=float(deadline) if deadline else None,
+            ),
+            cache_dir=os.getenv("LLM_CACHE_DIR") or None,
+            cache_max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            cache_read_only=os.getenv("LLM_CACHE_READONLY", "0") == "1",
+            stream=os.getenv("LLM_STREAM", "0") == "1",
+            local_rules=os.getenv("LOCAL_RULES", "0") == "1",
+        )
+
+
+def agent_fetch_config() -> FetchConfig:
+    """Fetch settings for audits, also used for fetches shared by a batch."""
+    return FetchConfig(
+        max_retries=2,
+        max_workers=3,
+        task_timeout=300,
+        poll_interval=5,
+        shared_ttl=float(os.getenv("PROGRAM_CACHE_TTL", "3600")),
+    )
+
+
 class Agent:
     controller: "AgentController"
     programs: List[Block] 
-    transcript: Transcript 
+    transcript: TranscriptSnapshot
+    allocations: AllocationOverlay
     current_block_idx:int
     reports: List[AgentBlockReport]
+    failures: List[ProgramFailure]
+    degraded: List[ProgramDegradation]
     status: TaskStatus
-    def __init__(self,controller:"AgentController"):
+    def __init__(
+        self,
+        controller:"AgentController",
+        config: Optional[AgentConfig] = None,
+        on_event: Optional[Callable[[dict], None]] = None,
+    ):
         self.controller = controller
-        self.transcript = controller.get_context().transcript
+        self.config = config or AgentConfig()
+        self.on_event = on_event
+        self._events_lock = Lock()
+        self._stream_owner = None
+        # Audits share the immutable snapshot; allocations are per audit
+        self.transcript = controller.get_context().transcript.snapshot()
+        self.allocations = AllocationOverlay(self.transcript)
         self.logger = get_logger() 
         self.reports = []
-        self.max_retries = 3
+        self.failures: List[ProgramFailure] = []
+        self.degraded: List[ProgramDegradation] = []
+        # End-to-end budget of the audit, None for no limit
+        self.deadline: Optional[Deadline] = controller.deadline
+        self.max_retries = self.config.max_retries
+        self.hedger = HedgedCaller(self.config.model, self.config.hedge)
+        self.cache: Optional[ResponseCache] = None
+        if self.config.cache_dir:
+            self.cache = open_cache(
+                self.config.cache_dir,
+                max_bytes=self.config.cache_max_bytes,
+                read_only=self.config.cache_read_only,
+            )
         self.programs = []
+        # Program Blocks by the title they were fetched for; programs and
+        # program_titles are in audit order, report_titles matches reports
+        self.fetched: Dict[str, Block] = {}
+        # Titles audited from a cached copy because fetching ran out of time
+        self.stale_titles: Set[str] = set()
+        self.program_titles: List[str] = []
+        self.report_titles: List[str] = []
+        # Set for incremental re-audits; programs may then be preset too
+        self.plan: Optional[IncrementalPlan] = None
         self.current_block_idx = 0
         self.status = TaskStatus.IDLE
 
@@ -161,29 +204,88 @@ class Agent:
         #     max_workers=1
         # ))
 
-        config = FetchConfig(
-            max_retries=2,
-            max_workers=3,
-            task_timeout=300,
-            poll_interval=5
-        )
-        
-        self.fetcher = ProgramFetcher(config=config)
+        self.fetcher = ProgramFetcher(config=agent_fetch_config())
         
     
 
-    def on_fetch_complete(self,programs, failed):
-        self.programs = programs
-        print([program.to_dict() for program in programs])
-        if failed:
-            raise ValueError("Fetch Failed")
+    def on_fetch_complete(self, programs, failed, errors: Optional[Dict[str, str]] = None):
+        self.logger.info(f"[Agent] fetched {[program.name for program in programs]}")
+        # A failed fetch only loses that program; the others are still audited
+        for title in failed:
+            error = (errors or {}).get(title) or "Fetch failed"
+            self.logger.error(f"[Agent] could not fetch '{title}': {error}")
+            self.failures.append(ProgramFailure(program=title, stage="fetch", error=error))
+            self._emit({"event": "failed", "program": title, "stage": "fetch", "error": error})
 
-    def init_fetch(self):    
-        thread = self.fetcher.fetch_programs_async(
-            self.transcript.get_program_titles(),
-            on_complete=self.on_fetch_complete
-        )
-        thread.join()
+    def preset_programs(self, fetched: Dict[str, Block], errors: Optional[Dict[str, str]] = None):
+        """Use programs fetched elsewhere (by title); titles in errors are not fetched again."""
+        self.fetched.update(fetched)
+        if errors:
+            self.on_fetch_complete([], list(errors), errors)
+
+    def missing_titles(self) -> List[str]:
+        """Program titles neither fetched nor failed yet."""
+        failed = {f.program for f in self.failures if f.stage == "fetch"}
+        return [t for t in self.transcript.get_program_titles() if t not in self.fetched and t not in failed]
+
+    def _fetch_one(self, title: str) -> FetchResult:
+        try:
+            return self.fetcher.fetch_single_program(title, deadline=self.deadline)
+        except Exception as e:
+            return FetchResult(program_title=title, success=False, error=str(e))
+
+    def _fetch_all(self, titles: List[str]) -> List[FetchResult]:
+        """
+        Fetch titles concurrently. Under a deadline, fetches still running
+        after the fetch share of it are abandoned and replaced by a cached
+        copy of the program, if there is one.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.fetcher.config.max_workers)
+        futures = {pool.submit(self._fetch_one, title): title for title in titles}
+        timeout = None if self.deadline is None else self.deadline.remaining() * self.config.fetch_share
+        wait(futures, timeout=timeout)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        results = []
+        for future, title in futures.items():
+            if future.done() and not future.cancelled():
+                result = future.result()
+                if result.success or self.deadline is None or not self.deadline.expired:
+                    results.append(result)
+                    continue
+            cached = self.fetcher.cached_program(title)
+            if cached is None:
+                results.append(FetchResult(program_title=title, success=False, error="Deadline exceeded while fetching"))
+                continue
+            self.logger.warning(f"[Agent] '{title}' not fetched in time, auditing a cached copy")
+            self.stale_titles.add(title)
+            self._degrade(title, "fetch")
+            results.append(FetchResult(program_title=title, success=True, program=cached))
+        return results
+
+    def init_fetch(self):
+        titles = self.missing_titles()
+        if titles:
+            if self.deadline is None:
+                with ThreadPoolExecutor(max_workers=self.fetcher.config.max_workers) as pool:
+                    results = list(pool.map(self._fetch_one, titles))
+            else:
+                results = self._fetch_all(titles)
+            self.fetched.update((r.program_title, r.program) for r in results if r.success)
+            self.on_fetch_complete(
+                [r.program for r in results if r.success],
+                [r.program_title for r in results if not r.success],
+                {r.program_title: r.error for r in results if not r.success},
+            )
+        # Fetches finish in any order; audit in the order the user asked for
+        # so that prompts (and therefore cache and replay keys) are stable.
+        self.program_titles = [t for t in self.transcript.get_program_titles() if t in self.fetched]
+        self.programs = [self.fetched[t] for t in self.program_titles]
+
+    def get_current_title(self) -> Optional[str]:
+        if self.current_block_idx == -1:
+            return None
+        return self.program_titles[self.current_block_idx]
 
     def get_current_program_block(self)->Block:
         if self.current_block_idx == -1:
@@ -201,13 +303,7 @@ class Agent:
             self.current_block_idx = -1
   
     def get_usable_courses_serializable(self):
-        result = []
-        for course in self.transcript:
-            if course.is_usable():
-                d = course.to_dict_full()
-                d.pop("done", None)  # safely remove key if it exists
-                result.append(d)
-        return result
+        return self.allocations.usable_courses_serializable()
     
 
     def has_more_programs(self) -> bool:
@@ -224,10 +320,16 @@ class Agent:
             self.status = TaskStatus.ACTIVE
             program = self.get_current_program_block()
             self._process(program)
-            if self.status == TaskStatus.FAILED:
-                raise AgentException("[Agent]: An exception occurred")
+            # A failed program is recorded in self.failures; carry on
             self.next_program_block()
         
+        return self._finish()
+
+    def _finish(self) -> List[AgentBlockReport]:
+        if self.failures and not self.reports:
+            self.status = TaskStatus.FAILED
+            details = "; ".join(f"{f.program}: {f.error}" for f in self.failures)
+            raise AgentException(f"[Agent]: No program could be audited ({details})")
         self.status = TaskStatus.COMPLETED
         return self.reports
 
@@ -251,43 +353,302 @@ class Agent:
     #     self.status = TaskStatus.COMPLETED
     #     return self.reports
         
+    def _build_messages(self, program) -> List[Tuple[str, str]]:
+        return [
+            ("system", AGENT_INSTRUCTIONS),
+            ("user", json.dumps( {
+                    "program_details":program.to_dict(),
+                    "transcript" : self.get_usable_courses_serializable(),
+                    "reports": [report.to_dict() for report in self.reports]
+                },
+                indent=1
+                )),
+        ]
+
+    def _emit(self, event: dict):
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def _request_report(self, messages: List[Tuple[str, str]], program_name: str) -> AgentBlockReport:
+        request = {
+            "model": self.config.model,
+            "params": self.config.sampling_params(),
+            "messages": [[role, content] for role, content in messages],
+        }
+        parse = self._stream_report if self.config.stream else self._parse_report
+        data = get_traffic_store().exchange(
+            "llm", request,
+            lambda: parse(messages, program_name).model_dump(mode="json"),
+        )
+        return AgentBlockReport.model_validate(data)
+
+    def _create_chat(self, messages: List[Tuple[str, str]], **kwargs):
+        chat = self.controller.client.chat.create(
+            model=self.config.model,
+            # reasoning_effort = "low",
+            **self.config.sampling_params(),
+            **kwargs)
+    
+        for role, content in messages:
+            chat.append(system(content) if role == "system" else user(content))
+        return chat
+
+    def _parse_report(self, messages: List[Tuple[str, str]], program_name: str) -> AgentBlockReport:
+        chat = self._create_chat(messages)
+        response, result = chat.parse(AgentBlockReport)
+        assert isinstance(result, AgentBlockReport)
+        # self.logger.info(response)
+        return result
+
+    def _block_forwarder(self, program_name: str) -> Callable:
+        """
+        Callback forwarding streamed blocks of one attempt as "block" events.
+
+        When a hedge is in flight both attempts stream; only the first one to
+        produce a block forwards its blocks, the other is parsed silently.
+        Block events are previews, the final "report" event is authoritative.
+        """
+        token = object()
+
+        def on_block(path, block):
+            with self._events_lock:
+                if self._stream_owner is None:
+                    self._stream_owner = token
+                if self._stream_owner is not token:
+                    return
+            self._emit({
+                "event": "block",
+                "program": program_name,
+                "path": list(path),
+                "block": block.to_dict(),
+            })
+        return on_block
+
+    def _stream_report(self, messages: List[Tuple[str, str]], program_name: str) -> AgentBlockReport:
+        """Stream the report and emit each nested block as soon as it closes."""
+        chat = self._create_chat(messages, response_format=AgentBlockReport)
+        parser = IncrementalReportParser(AgentBlockReport, on_block=self._block_forwarder(program_name))
+        stream = chat.stream()
+        try:
+            for response, chunk in stream:
+                parser.feed(chunk.content)
+                if parser.done:
+                    break
+        finally:
+            stream.close()
+        return parser.result()
+
+    def _lookup(self, program) -> Tuple[List[Tuple[str, str]], Optional[str], Optional[AgentBlockReport]]:
+        """Build the prompt for program and check the response cache."""
+        messages = self._build_messages(program)
+        if self.cache is None:
+            return messages, None, None
+        key = make_key(self.config.model, self.config.sampling_params(), messages)
+        cached = self.cache.get(key, AgentBlockReport)
+        if cached is not None:
+            self.logger.info(f"[Agent] cache hit for '{program.name}'")
+        return messages, key, cached
+
+    def _reuse(self, program) -> Optional[AgentBlockReport]:
+        """The previous audit's report for program, if the changes cannot affect it."""
+        if self.plan is None:
+            return None
+        result = self.plan.reuse(self.get_current_title(), program, self.reports)
+        if result is not None:
+            self.logger.info(f"[Agent] '{program.name}' reused from the previous audit")
+        return result
+
+    def _evaluate_locally(self, program) -> Optional[AgentBlockReport]:
+        """Audit program from its compiled rules, None if it needs the LLM."""
+        if not self.config.local_rules:
+            return None
+        result = evaluate_program(program, self.transcript, used_courses(self.reports))
+        if result is not None:
+            self.logger.info(f"[Agent] '{program.name}' evaluated locally")
+        return result
+
+    def _degrade(self, title: str, reason: str, blocks: Sequence[str] = ()):
+        """Record a shortcut taken for title; a program has one entry, whatever the shortcuts."""
+        entry = next((d for d in self.degraded if d.program == title), None)
+        if entry is None:
+            entry = ProgramDegradation(program=title)
+            self.degraded.append(entry)
+        if reason not in entry.reasons:
+            entry.reasons.append(reason)
+        entry.blocks.extend(block for block in blocks if block not in entry.blocks)
+
+    def _emit_degraded(self, title: str):
+        """The "degraded" event of title, sent once its shortcuts are all known."""
+        entry = next((d for d in self.degraded if d.program == title), None)
+        if entry is not None:
+            self._emit({"event": "degraded", "program": title, "reasons": list(entry.reasons), "blocks": list(entry.blocks)})
+
+    def _llm_budget(self) -> Optional[float]:
+        """
+        Seconds the next LLM call may take, None without a deadline, or 0
+        if too little time is left to expect an answer.
+        """
+        if self.deadline is None:
+            return None
+        remaining = self.deadline.remaining()
+        expected = max(self.config.min_llm_seconds, self.hedger.tracker.percentile(50) or 0.0)
+        return remaining if remaining >= expected else 0.0
+
+    def _evaluate_degraded(self, program) -> AgentBlockReport:
+        """Audit program locally, whatever its rules, because the deadline is close."""
+        result, blocks = evaluate_best_effort(program, self.transcript, used_courses(self.reports))
+        self.logger.warning(f"[Agent] '{program.name}' evaluated locally to meet the deadline")
+        self._degrade(self.get_current_title(), "audit", blocks)
+        return result
+
+    def _call_deadline(self, budget: Optional[float]) -> Optional[float]:
+        """Deadline of one LLM call: the per-request one, capped by the audit's budget."""
+        if budget is None:
+            return None
+        request = self.config.hedge.deadline
+        return budget if request is None else min(request, budget)
+
+    def _out_of_time(self) -> bool:
+        """True if a failed LLM attempt left too little of the deadline for another one."""
+        return self.deadline is not None and self._llm_budget() == 0
+
+    def _accept(self, program, key: Optional[str], result: AgentBlockReport, store: bool = True):
+        if store and key is not None:
+            self.cache.put(key, result)
+        self.reports.append(result)
+        self.report_titles.append(self.get_current_title())
+        self._emit_degraded(self.get_current_title())
+        self._emit({"event": "report", "program": program.name, "report": result.to_dict()})
+        self.status = TaskStatus.COMPLETED
+
+    def _attempt_failed(self, program, attempt: int, e: Exception) -> bool:
+        """Record a failed attempt; returns True once no retries are left."""
+        self.logger.error(f"[Agent]Unexpected error on attempt: {str(e)}")
+        if attempt == self.max_retries:
+            self.failures.append(ProgramFailure(program=self.get_current_title(), stage="audit", error=str(e)))
+            self._emit_degraded(self.get_current_title())
+            self._emit({"event": "failed", "program": program.name, "stage": "audit", "error": str(e)})
+            self.status = TaskStatus.FAILED
+            return True
+        self._emit({"event": "retry", "program": program.name, "attempt": attempt, "error": str(e)})
+        return False
+
     def _process(self,program):
+        local = self._reuse(program) or self._evaluate_locally(program)
+        if local is not None:
+            self._accept(program, None, local)
+            return
+
+        messages, key, cached = self._lookup(program)
+        if cached is not None:
+            self._accept(program, key, cached, store=False)
+            return
+
         for attempt in range(1, self.max_retries + 1):
-            try:
-                chat = self.controller.client.chat.create(
-                    model="grok-4-fast-reasoning", #grok-4-latest grok-4-fast-reasoning grok-3-mini
-                    # reasoning_effort = "low",
-                    max_tokens=10000,
-                    temperature=0.0,
-                    top_p= 1.0)
-            
-                chat.append(system(AGENT_INSTRUCTIONS))
-            
-                chat.append(
-                    user(
-                        json.dumps( {
-                                "program_details":program.to_dict(),
-                                "transcript" : self.get_usable_courses_serializable(),
-                                "reports": [report.to_dict() for report in self.reports]
-                            },
-                            indent=1
-                            )
-                        )
-                    )
-                response, result = chat.parse(AgentBlockReport)
-                assert isinstance(result, AgentBlockReport)
-                # self.logger.info(response)
-                self.reports.append(result)
-                self.status = TaskStatus.COMPLETED
+            budget = self._llm_budget()
+            if budget == 0:
+                self._accept(program, None, self._evaluate_degraded(program))
                 return
+            self._stream_owner = None
+            try:
+                result = self.hedger.call(
+                    lambda: self._request_report(messages, program.name),
+                    deadline=self._call_deadline(budget),
+                )
             except Exception as e:
-                self.logger.error(f"[Agent]Unexpected error on attempt: {str(e)}")
-                if attempt == self.max_retries:
-                    self.status = TaskStatus.FAILED
+                if self._out_of_time():
+                    self._accept(program, None, self._evaluate_degraded(program))
+                    return
+                if self._attempt_failed(program, attempt, e):
                     return
                 continue
+            self._accept(program, key, result)
+            return
 
 
+class AsyncAgent(Agent):
+    """
+    Agent whose LLM calls are awaited on an xai_sdk AsyncClient.
 
-            
-        
+    An in-flight audit holds no thread while it waits on the model. Program
+    fetching still runs on the fetcher's worker threads.
+    """
+
+    async def start(self):
+        if self.missing_titles():
+            await asyncio.to_thread(self.init_fetch)
+        else:
+            self.init_fetch()
+
+        while self.has_more_programs():
+            self.status = TaskStatus.ACTIVE
+            program = self.get_current_program_block()
+            await self._process(program)
+            self.next_program_block()
+
+        return self._finish()
+
+    async def _request_report(self, messages: List[Tuple[str, str]], program_name: str) -> AgentBlockReport:
+        request = {
+            "model": self.config.model,
+            "params": self.config.sampling_params(),
+            "messages": [[role, content] for role, content in messages],
+        }
+        parse = self._stream_report if self.config.stream else self._parse_report
+
+        async def perform():
+            return (await parse(messages, program_name)).model_dump(mode="json")
+
+        data = await get_traffic_store().exchange_async("llm", request, perform)
+        return AgentBlockReport.model_validate(data)
+
+    async def _parse_report(self, messages: List[Tuple[str, str]], program_name: str) -> AgentBlockReport:
+        chat = self._create_chat(messages)
+        response, result = await chat.parse(AgentBlockReport)
+        assert isinstance(result, AgentBlockReport)
+        return result
+
+    async def _stream_report(self, messages: List[Tuple[str, str]], program_name: str) -> AgentBlockReport:
+        chat = self._create_chat(messages, response_format=AgentBlockReport)
+        parser = IncrementalReportParser(AgentBlockReport, on_block=self._block_forwarder(program_name))
+        stream = chat.stream()
+        try:
+            async for response, chunk in stream:
+                parser.feed(chunk.content)
+                if parser.done:
+                    break
+        finally:
+            await stream.aclose()
+        return parser.result()
+
+    async def _process(self, program):
+        local = self._reuse(program) or self._evaluate_locally(program)
+        if local is not None:
+            self._accept(program, None, local)
+            return
+
+        messages, key, cached = self._lookup(program)
+        if cached is not None:
+            self._accept(program, key, cached, store=False)
+            return
+
+        for attempt in range(1, self.max_retries + 1):
+            budget = self._llm_budget()
+            if budget == 0:
+                self._accept(program, None, self._evaluate_degraded(program))
+                return
+            self._stream_owner = None
+            try:
+                result = await self.hedger.call_async(
+                    lambda: self._request_report(messages, program.name),
+                    deadline=self._call_deadline(budget),
+                )
+            except Exception as e:
+                if self._out_of_time():
+                    self._accept(program, None, self._evaluate_degraded(program))
+                    return
+                if self._attempt_failed(program, attempt, e):
+                    return
+                continue
+            self._accept(program, key, result)
+            return
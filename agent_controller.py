@@ -1,10 +1,15 @@
 import os
 import json
+import hashlib
 from transcript import *
 from dotenv import load_dotenv
-from xai_sdk import Client
+import asyncio
+from xai_sdk import Client, AsyncClient
 from agent import *
 from common import *
+from replay import get_traffic_store
+from incremental import IncrementalPlan, changed_courses, get_audit_store
+from admission import BATCH, INTERACTIVE, get_scheduler
 
 
 load_dotenv()
@@ -17,26 +22,156 @@ class AgentController:
     agent: Agent
     context: Context
 
-    def __init__(self, transcript: Transcript):
-        self.client = Client(    
-            api_key=os.getenv("XAI_API_KEY"),
-            timeout=3600, # Override default timeout with longer timeout for reasoning models
-        )
+    def __init__(
+        self,
+        transcript: Transcript,
+        config: Optional[AgentConfig] = None,
+        on_event: Optional[Callable[[dict], None]] = None,
+        remember: bool = True,
+        deadline: Optional[Deadline] = None,
+        lane: str = INTERACTIVE,
+    ):
+        # Replayed audits never reach the LLM, so they need no API key
+        self.client = None if get_traffic_store().replaying else self._create_client()
         self.logger = get_logger(__name__)  
         self.reports = []
+        self.failures: List[ProgramFailure] = []
+        self.degraded: List[ProgramDegradation] = []
+        self.deadline = deadline
+        # Admission lane of async audits: INTERACTIVE or BATCH
+        self.lane = lane
+        self.audit_id: Optional[str] = None
+        self.etag: Optional[str] = None
+        self.remember = remember
         self.context = Context(transcript)
+        self.config = config or AgentConfig.from_env()
+
+        self.agent = self._create_agent(on_event)
 
-        self.agent = Agent(self)
+    def _create_client(self):
+        return Client(    
+            api_key=os.getenv("XAI_API_KEY"),
+            timeout=3600, # Override default timeout with longer timeout for reasoning models
+        )
+
+    def _create_agent(self, on_event: Optional[Callable[[dict], None]]) -> Agent:
+        return Agent(self, self.config, on_event=on_event)
 
     def get_context(self):
         return self.context
 
+    def reuse(
+        self,
+        snapshot: TranscriptSnapshot,
+        reports: List[AgentBlockReport],
+        programs: Optional[Dict[str, Block]] = None,
+        titles: Optional[List[str]] = None,
+    ):
+        """
+        Make this an incremental re-audit of a previous one.
+
+        Programs whose reports the changes since snapshot cannot affect are
+        reused, and programs that failed before are audited again. Only
+        titles missing from programs (the previous audit's Blocks by title)
+        are fetched. titles gives the program title of each report.
+        """
+        changed = changed_courses(snapshot, self.agent.transcript)
+        self.agent.plan = IncrementalPlan(reports, changed, titles)
+        self.agent.preset_programs(programs or {})
+        self.logger.info(f"[AgentController] incremental audit, {len(changed)} changed course(s)")
+
+    def _etag(self) -> Optional[str]:
+        """
+        Weak ETag of the reports: the transcript's fingerprint, the
+        versions of the programs audited and a digest of the reports. Partial
+        and degraded audits have none.
+        """
+        if self.failures or self.degraded or not self.reports:
+            return None
+        versions = [
+            ProgramCatalog.content_version(self.agent.fetched[title].model_dump(mode="json"))
+            for title in self.agent.report_titles
+            if title in self.agent.fetched
+        ]
+        programs = hashlib.sha256("|".join(versions).encode("utf-8")).hexdigest()
+        return f'"{self.agent.transcript.fingerprint()[:16]}-{programs[:8]}-{reports_digest(self.reports)[:16]}"'
+
+    def _remember(self):
+        """
+        Store the finished audit so it can be re-audited incrementally.
+
+        Degraded reports and cached program copies are left out, so that
+        incremental audits and retries audit those programs properly.
+        """
+        self.etag = self._etag()
+        if not self.remember:
+            return
+        degraded = {d.program for d in self.degraded}
+        kept = [(t, r) for t, r in zip(self.agent.report_titles, self.reports) if t not in degraded]
+        programs = {t: p for t, p in self.agent.fetched.items() if t not in self.agent.stale_titles}
+        self.audit_id = get_audit_store().put(
+            self.agent.transcript, programs, [r for _, r in kept], [t for t, _ in kept], self.etag
+        )
+
     def start(self):
-        self.reports = self.agent.start() 
+        try:
+            self.reports = self.agent.start() 
+        finally:
+            self.failures = self.agent.failures
+            self.degraded = self.agent.degraded
+        self._remember()
 
     def get_report_serializable(self):
-        self.logger.info(json.dumps([report.to_dict() for report in self.reports],indent=2))
-        return [report.to_dict() for report in self.reports]
+        reports = [report.to_dict() for report in self.reports]
+        log_payload(self.logger, "[AgentController] reports", reports)
+        return reports
+
+    def get_report_json(self, indent: Optional[int] = None) -> bytes:
+        """The /audit response body, {"reports": [...]} plus failures, degraded and audit_id, encoded in one pass."""
+        body = encode_reports(
+            self.reports, indent=indent, audit_id=self.audit_id, failures=self.failures, degraded=self.degraded
+        )
+        log_payload(self.logger, "[AgentController] reports", body)
+        return body
+
+    def get_delta_json(self, base: List[AgentBlockReport], base_etag: str, indent: Optional[int] = None) -> bytes:
+        """The /audit response body relative to base, reports served earlier with base_etag."""
+        body = encode_delta(
+            self.reports, base, base_etag,
+            indent=indent, audit_id=self.audit_id, failures=self.failures, degraded=self.degraded,
+        )
+        log_payload(self.logger, "[AgentController] delta", body)
+        return body
+
+
+class AsyncAgentController(AgentController):
+    """
+    AgentController on the SDK's AsyncClient.
+
+    start() is a coroutine, so one event loop can run many audits at once;
+    they are bounded by the admission scheduler (see admission.py) rather
+    than by thread count, in the lane given to the controller.
+    """
+    client: AsyncClient
+    agent: AsyncAgent
+
+    def _create_client(self):
+        return AsyncClient(
+            api_key=os.getenv("XAI_API_KEY"),
+            timeout=3600,
+        )
+
+    def _create_agent(self, on_event: Optional[Callable[[dict], None]]) -> AsyncAgent:
+        return AsyncAgent(self, self.config, on_event=on_event)
+
+    async def start(self):
+        async with get_scheduler().slot(self.lane):
+            try:
+                self.reports = await self.agent.start()
+            finally:
+                self.failures = self.agent.failures
+                self.degraded = self.agent.degraded
+        self._remember()
     
 _TEST_TRANSCRIPT = (
     Transcript()
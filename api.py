@@ -1,13 +1,53 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from agent_controller import AgentController
-from transcript import Transcript
+import os
+import json
+import gzip
+import hashlib
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Set, Tuple, Union
+from transcript import CourseRecord, Transcript
+from title_index import TitleIndex, normalise_title
+from course_db import get_course_db
+from transcript_input import CourseInput, InvalidTranscript, TranscriptInput
+from transcript_input import build_records as _build_records, build_transcript as _build_transcript, course_code as _parse_course_code
+from admission import INTERACTIVE, get_scheduler
+from coalesce import Coalescer, request_key
+from hedging import Deadline
 from fastapi.middleware.cors import CORSMiddleware
+
+
+@lru_cache(maxsize=None)
+def _pipeline():
+    """
+    The audit pipeline (agent_controller and everything it pulls in: the LLM
+    SDK, fetcher and program catalog), imported on first use so the app
+    starts serving /health without it.
+    """
+    import agent_controller
+    return agent_controller
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # API_WARMUP=1 (default) loads the pipeline in the background right after
+    # startup instead of on the first audit
+    if os.getenv("API_WARMUP", "1") == "1":
+        threading.Thread(target=_pipeline, name="warmup", daemon=True).start()
+    yield
+
+
 app = FastAPI(
     title="Degree Audit API",
     description="REST API for generating degree audit reports from transcripts",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -15,49 +55,68 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],        # GET, POST, PUT, DELETE, etc.
     allow_headers=["*"],        # Authorization, Content-Type, etc.
+    expose_headers=["ETag"],    # read by the web client for If-None-Match and delta_from
 )
 
 
-class CourseInput(BaseModel):
+class ReportResponse(BaseModel):
     """
-    Input model for a single course in the transcript.
+    Response model for the audit report.
     
     Attributes:
-        subject_code: Department/subject code (e.g., "COMP", "MATH", "ECON", "PHYS")
-        course_code: Course number as a string (must be numeric, e.g., "206", "133", "350")
-        grade: Letter grade received (e.g., "A", "A-", "B+", "B", "B-", "C+", "C", "F")
-        credit: Number of credits earned. Use 0 for failed courses (grade "F")
+        reports: List of program reports, one for each program in the request.
+                Each report is a hierarchical AgentBlockReport structure showing
+                requirement fulfillment status, courses assigned to blocks, and
+                notes on remaining requirements.
+        failures: Programs that could not be fetched or audited, each with
+                 its program title, stage ("fetch" or "audit") and error
+        degraded: Programs audited on a shortcut to meet the deadline, each
+                 with its program title, reasons ("fetch", "audit") and the
+                 blocks whose result is approximate
+        audit_id: Id of the stored audit, for POST /audit/incremental
     """
-    subject_code: str = Field(..., description="Subject code (e.g., 'COMP', 'MATH', 'ECON')")
-    course_code: str = Field(..., description="Course code as a string (must be numeric, e.g., '206', '133', '350')")
-    grade: str = Field(..., description="Grade received (e.g., 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'F')")
-    credit: int = Field(..., description="Number of credits for the course. Use 0 for failed courses.")
+    reports: List[dict] = Field(..., description="List of program audit reports (AgentBlockReport structures)")
+    failures: List[dict] = Field(default_factory=list, description="Programs that could not be audited")
+    degraded: List[dict] = Field(default_factory=list, description="Programs audited on a shortcut to meet the deadline")
+    audit_id: Optional[str] = Field(None, description="Id to pass to /audit/incremental")
 
 
-class TranscriptInput(BaseModel):
+class BatchItemInput(TranscriptInput):
     """
-    Input model for transcript data containing programs and courses.
-    
+    One line of a /audit/batch body.
+
     Attributes:
-        program_titles: List of program names to audit against. Must match exact program names
-                       as they appear in the system (e.g., "Computer Science Major Concentration (B.A.)")
-        courses: List of all courses the student has taken
+        id: Caller's identifier for the transcript (e.g. a student number),
+            echoed back with its result
     """
-    program_titles: List[str] = Field(..., description="List of program titles to audit against")
-    courses: List[CourseInput] = Field(..., description="List of courses taken by the student")
+    id: Optional[Union[str, int]] = Field(None, description="Identifier echoed back with the result")
 
 
-class ReportResponse(BaseModel):
+class CourseRefInput(BaseModel):
+    """A course by subject and code only, for removals."""
+    subject_code: str = Field(..., description="Subject code (e.g., 'COMP')")
+    course_code: str = Field(..., description="Course code (e.g., '206')")
+
+
+class IncrementalInput(BaseModel):
     """
-    Response model for the audit report.
-    
+    Input model for an incremental re-audit: a previous audit and a course diff.
+
     Attributes:
-        reports: List of program reports, one for each program in the request.
-                Each report is a hierarchical AgentBlockReport structure showing
-                requirement fulfillment status, courses assigned to blocks, and
-                notes on remaining requirements.
+        audit_id: Id returned by a previous audit. If it is unknown or has
+                  expired, the previous transcript and reports are used instead
+        transcript: The previously audited transcript (when there is no audit_id)
+        reports: The previous reports (when there is no audit_id)
+        added: Courses to add
+        removed: Courses to remove
+        changed: Courses whose grade or credit changed
     """
-    reports: List[dict] = Field(..., description="List of program audit reports (AgentBlockReport structures)")
+    audit_id: Optional[str] = Field(None, description="Id returned by a previous audit")
+    transcript: Optional[TranscriptInput] = Field(None, description="Previous transcript, if there is no audit_id")
+    reports: Optional[List[dict]] = Field(None, description="Previous reports, if there is no audit_id")
+    added: List[CourseInput] = Field(default_factory=list, description="Courses to add")
+    removed: List[CourseRefInput] = Field(default_factory=list, description="Courses to remove")
+    changed: List[CourseInput] = Field(default_factory=list, description="Courses with a new grade or credit")
 
 
 @app.get("/")
@@ -72,48 +131,483 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """In-process counters for the LLM pipeline"""
+    from hedging import HEDGE_METRICS
+    from response_cache import cache_stats
+    from shared_cache import get_shared_cache
+    shared = get_shared_cache()
+    return {
+        "hedging": HEDGE_METRICS.snapshot(),
+        "response_cache": cache_stats(),
+        "coalescing": _coalescer.stats(),
+        "admission": get_scheduler().stats(),
+        "shared_cache": shared.stats() if shared is not None else None,
+    }
+
+
+_titles: Optional[TitleIndex] = None
+
+
+def _load_titles() -> TitleIndex:
+    # Titles the fetcher can look up, i.e. the ones /audit accepts
+    global _titles
+    if _titles is None:
+        from fetcher import ProgramFetcher
+        _titles = TitleIndex(ProgramFetcher.PROGRAM_CATALOG)
+    return _titles
+
+
+def _opaque_tag(tag: str) -> str:
+    """An entity tag without its weak indicator; If-None-Match compares tags weakly."""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match", "")
+    return header.strip() == "*" or _opaque_tag(etag) in (_opaque_tag(tag) for tag in header.split(","))
+
+
+@app.get("/programs")
+async def search_programs(
+    request: Request,
+    q: str = "",
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    Program titles matching q (typos tolerated), best first, for
+    autocomplete. A result with "exact": true is the title /audit expects.
+    Responses carry a strong ETag and honour If-None-Match.
+    """
+    index = _titles or await asyncio.to_thread(_load_titles)
+    query_hash = hashlib.sha256(f"{normalise_title(q)}|{limit}".encode("utf-8")).hexdigest()[:12]
+    etag = f'"{index.etag}-{query_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    results = [
+        {"title": match.title, "score": match.score, "exact": match.exact}
+        for match in index.search(q, limit)
+    ]
+    body = json.dumps({"results": results}, separators=(",", ":")).encode("utf-8")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@contextmanager
+def _bad_request():
+    """Turns InvalidTranscript into a 400 response."""
+    try:
+        yield
+    except InvalidTranscript as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _course_code(course) -> int:
+    with _bad_request():
+        return _parse_course_code(course)
+
+
+def build_transcript(transcript_input: TranscriptInput) -> Transcript:
+    with _bad_request():
+        return _build_transcript(transcript_input)
+
+
+def build_records(courses: List[CourseInput]) -> List[CourseRecord]:
+    """Validated CourseRecords for the courses of an incremental diff."""
+    with _bad_request():
+        return _build_records(courses)
+
+
+@app.get("/courses/{subject_code}/{course_code}")
+async def get_course(subject_code: str, course_code: str):
+    """Title, credits and equivalent courses from the local course database"""
+    db = get_course_db()
+    info = db.get(subject_code, course_code)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Unknown course {subject_code} {course_code}")
+    equivalents = sorted(db.equivalents(subject_code, course_code) - {info.key})
+    return {
+        "subject_code": info.subject_code,
+        "course_code": info.course_code,
+        "title": info.title,
+        "credit": info.credits,
+        "equivalents": [f"{subject} {code}" for subject, code in equivalents],
+    }
+
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+
+def json_response(request: Request, body: bytes, headers: Optional[dict] = None) -> Response:
+    """
+    Raw JSON response for an already-encoded body.
+
+    The body is gzip-compressed when the client accepts it, it is large
+    enough, and RESPONSE_GZIP is not 0.
+    """
+    headers = {"Vary": "Accept-Encoding", **(headers or {})}
+    if (
+        len(body) >= GZIP_MIN_BYTES
+        and os.getenv("RESPONSE_GZIP", "1") == "1"
+        and "gzip" in request.headers.get("accept-encoding", "")
+    ):
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _etag_headers(etag: str) -> dict:
+    # Weak: the same reports go out gzip-compressed or not, in full or as a
+    # delta, and these bodies are not byte-for-byte the same. Clients may
+    # keep the reports but must revalidate before reusing them
+    return {"ETag": f"W/{etag}", "Cache-Control": "private, no-cache"}
+
+
+async def not_modified(request: Request, transcript: Transcript) -> Optional[Response]:
+    """
+    304 if If-None-Match names an audit stored by this worker for the same
+    transcript, without running the audit again. Stored audits stand for
+    their programs' versions until they expire (AUDIT_STORE_TTL), as they do
+    for /audit/incremental.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    from incremental import get_audit_store
+    store = get_audit_store()
+    fingerprint = transcript.snapshot().fingerprint()
+    for etag in (_opaque_tag(tag) for tag in header.split(",")):
+        record = await store.find_async(etag)
+        if record is not None and record.snapshot.fingerprint() == fingerprint:
+            return Response(status_code=304, headers=_etag_headers(etag))
+    return None
+
+
+async def report_response(request: Request, controller, pretty: bool, delta_from: Optional[str]) -> Response:
+    """
+    The finished audit as a response: 304 if the client already has these
+    reports (If-None-Match), only the blocks that changed if it sent the
+    ETag of reports it has (delta_from), else the full body.
+    """
+    indent = 2 if pretty else None
+    etag = controller.etag
+    if etag is None:
+        return json_response(request, controller.get_report_json(indent=indent))
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=_etag_headers(etag))
+    base = None
+    if delta_from:
+        from incremental import get_audit_store
+        base = await get_audit_store().find_async(_opaque_tag(delta_from))
+    if base is not None:
+        body = controller.get_delta_json(base.reports, delta_from, indent=indent)
+    else:
+        body = controller.get_report_json(indent=indent)
+    return json_response(request, body, _etag_headers(etag))
+
+
+DEADLINE_QUERY = Query(None, gt=0, description="Seconds the audit may take (default: AUDIT_DEADLINE, if set)")
+
+
+def audit_deadline(seconds: Optional[float]) -> Optional[Deadline]:
+    """The audit's deadline, starting now: ?deadline=, else AUDIT_DEADLINE, else none."""
+    if seconds is None:
+        seconds = float(os.getenv("AUDIT_DEADLINE") or 0) or None
+    return Deadline(seconds) if seconds else None
+
+
+# Identical audits running at the same time share one pipeline run
+_coalescer = Coalescer()
+
+
+async def coalesced(key: str, audit):
+    """
+    Controller returned by audit(), or by the identical audit already
+    running under key. AUDIT_COALESCE=0 runs every request on its own.
+    """
+    if os.getenv("AUDIT_COALESCE", "1") != "1":
+        return await audit()
+    return await _coalescer.run(key, audit)
+
+
 @app.post("/audit", response_model=ReportResponse)
-async def generate_audit_report(transcript_input: TranscriptInput):
+async def generate_audit_report(
+    transcript_input: TranscriptInput,
+    request: Request,
+    pretty: bool = False,
+    delta_from: Optional[str] = None,
+    deadline: Optional[float] = DEADLINE_QUERY,
+):
+    """
+    Audit a transcript. The reports are encoded to JSON once and returned
+    as-is (compact unless ?pretty=true), without re-validation against
+    ReportResponse.
+
+    Responses carry a weak ETag. If-None-Match with it gets a 304, and
+    ?delta_from=<ETag> returns only the blocks that differ from the reports
+    served with that ETag.
+
+    With ?deadline=<seconds>, programs that cannot be fetched or audited in
+    time are audited from a cached copy or evaluated locally instead, and
+    listed in "degraded".
+    """
+    budget = audit_deadline(deadline)
     try:
-        # Create Transcript object from input
-        transcript = Transcript()
-        
-        # Add programs
-        for program_title in transcript_input.program_titles:
-            transcript.add_program(program_title)
-        
-        # Add courses
-        for course in transcript_input.courses:
-            # Note: add_course type hint says int, but Course.__init__ expects str
-            # The test passes strings, so we pass as string to match Course's expectation
-            # Converting to int first to satisfy the type hint, though Course will receive it as int
-            # and store it (Python is dynamically typed, so this works)
-            try:
-                course_code_int = int(course.course_code)
-            except (ValueError, TypeError):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Invalid course_code '{course.course_code}'. Course codes must be numeric."
-                )
-            transcript.add_course(
-                subject_code=course.subject_code,
-                course_code=course_code_int,
-                grade=course.grade,
-                credit=course.credit
-            )
+        transcript = build_transcript(transcript_input)
+        unchanged = await not_modified(request, transcript)
+        if unchanged is not None:
+            return unchanged
+        pipeline = await asyncio.to_thread(_pipeline)
         
         # Create controller and generate report
-        controller = AgentController(transcript)
-        controller.start()
-        
-        reports = controller.get_report_serializable()
+        async def audit():
+            controller = pipeline.AsyncAgentController(transcript, deadline=budget)
+            await controller.start()
+            return controller
+
+        key = request_key("audit", transcript.snapshot().fingerprint(), str(budget and budget.seconds))
+        controller = await coalesced(key, audit)
         
-        return ReportResponse(reports=reports)
+        return await report_response(request, controller, pretty, delta_from)
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating audit report: {str(e)}")
+
+
+@app.post("/audit/incremental", response_model=ReportResponse)
+async def incremental_audit_report(
+    incremental_input: IncrementalInput,
+    request: Request,
+    pretty: bool = False,
+    delta_from: Optional[str] = None,
+    deadline: Optional[float] = DEADLINE_QUERY,
+):
+    """
+    Re-audit after a few course changes. Programs the changes cannot affect
+    keep their previous report; the others are audited again. Returns the
+    same body as /audit, with a new audit_id, and honours If-None-Match,
+    delta_from and deadline like /audit.
+    """
+    budget = audit_deadline(deadline)
+    try:
+        pipeline = await asyncio.to_thread(_pipeline)
+        from incremental import apply_diff, get_audit_store
+
+        record = await get_audit_store().get_async(incremental_input.audit_id) if incremental_input.audit_id else None
+        if record is not None:
+            snapshot, reports, programs, titles = record.snapshot, record.reports, record.programs, record.titles
+        elif incremental_input.transcript is not None and incremental_input.reports is not None:
+            snapshot = build_transcript(incremental_input.transcript).snapshot()
+            reports = [pipeline.AgentBlockReport.model_validate(r) for r in incremental_input.reports]
+            programs = {}
+            # Without failures, the reports follow the transcript's program titles
+            titles = incremental_input.transcript.program_titles
+            if len(titles) != len(reports):
+                titles = None
+        else:
+            raise HTTPException(
+                status_code=404,
+                detail="Unknown or expired audit_id. Send the previous transcript and reports instead."
+            )
+
+        transcript = apply_diff(
+            snapshot,
+            added=build_records(incremental_input.added),
+            removed=[(c.subject_code, _course_code(c)) for c in incremental_input.removed],
+            changed=build_records(incremental_input.changed),
+        )
+        unchanged = await not_modified(request, transcript)
+        if unchanged is not None:
+            return unchanged
+        controller = pipeline.AsyncAgentController(transcript, deadline=budget)
+        controller.reuse(snapshot, reports, programs, titles)
+        await controller.start()
+
+        return await report_response(request, controller, pretty, delta_from)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating audit report: {str(e)}")
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator also reads the request body.
+
+    Starlette's version watches for a disconnect by calling receive() while
+    streaming (on ASGI servers before spec 2.4), which would swallow request
+    body chunks. Here only the body iterator receives; a disconnect surfaces
+    as ClientDisconnect from request.stream() or as a failed send.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+
+@app.post("/audit/{audit_id}/retry", response_model=ReportResponse)
+async def retry_audit_report(
+    audit_id: str,
+    request: Request,
+    pretty: bool = False,
+    delta_from: Optional[str] = None,
+    deadline: Optional[float] = DEADLINE_QUERY,
+):
+    """
+    Audit again only the programs that failed (see "failures") or were
+    degraded (see "degraded") in a stored audit; the other programs keep
+    their reports and are not fetched again. Returns the same body as
+    /audit, with a new audit_id, and honours If-None-Match, delta_from and
+    deadline like /audit.
+    """
+    budget = audit_deadline(deadline)
+    try:
+        pipeline = await asyncio.to_thread(_pipeline)
+        from incremental import apply_diff, get_audit_store
+
+        record = await get_audit_store().get_async(audit_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired audit_id")
+
+        async def audit():
+            controller = pipeline.AsyncAgentController(apply_diff(record.snapshot), deadline=budget)
+            controller.reuse(record.snapshot, record.reports, record.programs, record.titles)
+            await controller.start()
+            return controller
+
+        controller = await coalesced(request_key("retry", audit_id, str(budget and budget.seconds)), audit)
+
+        return await report_response(request, controller, pretty, delta_from)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating audit report: {str(e)}")
 
 
+@app.post("/audit/batch")
+async def batch_audit_report(request: Request):
+    """
+    Audit many transcripts. The body is newline-delimited JSON, one /audit
+    request body per line (optionally with an "id"); it is read as it
+    arrives. Results are streamed back as NDJSON in completion order:
+    "result" (index, id, reports) or "error" (index, id, detail) per line,
+    then a final "done" with the item and error counts.
+    """
+    pipeline = await asyncio.to_thread(_pipeline)
+    import batch
+
+    workers = int(os.getenv("BATCH_WORKERS", "8"))
+    programs = batch.SharedPrograms(pipeline.ProgramFetcher(pipeline.agent_fetch_config()), lane=pipeline.BATCH)
+
+    async def audit(index: int, line: bytes) -> Tuple[bytes, bool]:
+        item_id = None
+        try:
+            if not line:
+                raise HTTPException(status_code=400, detail=f"Line longer than {batch.MAX_LINE_BYTES} bytes")
+            item = BatchItemInput.model_validate_json(line)
+            item_id = item.id
+            transcript = build_transcript(item)
+            controller = pipeline.AsyncAgentController(transcript, remember=False, lane=pipeline.BATCH)
+            controller.agent.preset_programs(*await programs.get_many(transcript.get_program_titles()))
+            await controller.start()
+            return batch.encode_result(index, item_id, controller.reports, failures=controller.failures), True
+        except ValidationError as e:
+            return batch.encode_error(index, item_id, f"Invalid transcript: {e.errors(include_url=False)}"), False
+        except HTTPException as e:
+            return batch.encode_error(index, item_id, str(e.detail)), False
+        except Exception as e:
+            return batch.encode_error(index, item_id, f"Error generating audit report: {str(e)}"), False
+
+    async def body():
+        try:
+            async for line in batch.fan_out(batch.read_lines(request.stream()), audit, workers):
+                yield line
+        finally:
+            programs.close()
+
+    return DuplexStreamingResponse(body(), media_type="application/x-ndjson")
+
+
+# /audit/stream runs the sync pipeline, which streams the model's output, on
+# these threads once the audit is admitted to the interactive lane
+_stream_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("STREAM_WORKERS", "32")), thread_name_prefix="audit-stream"
+)
+# Running stream audits, referenced until they end so they are not collected
+_stream_tasks: Set["asyncio.Task[None]"] = set()
+
+
+@app.post("/audit/stream")
+async def stream_audit_report(transcript_input: TranscriptInput, deadline: Optional[float] = DEADLINE_QUERY):
+    """
+    Same audit as /audit, streamed as newline-delimited JSON events.
+
+    Events: "block" (a nested block preview, as soon as the model closes it),
+    "report" (a finished program report), "retry", "failed", "degraded",
+    "error" and a final "done".
+    """
+    budget = audit_deadline(deadline)
+    transcript = build_transcript(transcript_input)
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue[Optional[dict]]" = asyncio.Queue()
+
+    pipeline = await asyncio.to_thread(_pipeline)
+    config = pipeline.AgentConfig.from_env()
+    config.stream = True
+
+    def put(event: Optional[dict]):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def run():
+        try:
+            controller = pipeline.AgentController(transcript, config=config, on_event=put, deadline=budget)
+            controller.start()
+            put({"event": "done"})
+        except Exception as e:
+            put({"event": "error", "detail": f"Error generating audit report: {str(e)}"})
+
+    started = False
+
+    async def audit():
+        nonlocal started
+        try:
+            async with get_scheduler().slot(INTERACTIVE):
+                # The sync audit cannot be interrupted once started, so it
+                # keeps its slot until it ends even if the client has left
+                started = True
+                await loop.run_in_executor(_stream_executor, run)
+        finally:
+            put(None)
+
+    task = asyncio.create_task(audit())
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+
+    async def body():
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    return
+                yield json.dumps(event) + "\n"
+        finally:
+            # A client that leaves while the audit is still queued gives up its place
+            if not started:
+                task.cancel()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
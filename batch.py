@@ -0,0 +1,241 @@
+"""
+Streaming batch audits (POST /audit/batch).
+
+The request body is read as it arrives, one JSON line per transcript; a
+fixed number of workers audit the lines and results are written back as
+NDJSON as soon as each one finishes. Both sides go through bounded queues,
+so a worker process holds at most a few dozen transcripts and results
+however large the cohort is.
+
+Every item in a batch audits against the same few programs, so programs
+are fetched through SharedPrograms: each title is fetched once for the
+whole batch, and items needing a title that is still being fetched wait
+for that fetch instead of starting their own.
+
+Audits and fetches of a batch run in the scheduler's "batch" lane (see
+admission.py), so they queue behind their lane's limit instead of taking
+capacity from interactive audits.
+"""
+import asyncio
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from typing_extensions import NotRequired, TypedDict
+from pydantic import TypeAdapter
+from program import Block
+from report import AgentBlockReport, ProgramFailure
+from fetcher import ProgramFetcher, ProgramFetchError
+from admission import get_scheduler
+from common import get_logger
+
+logger = get_logger(__name__)
+
+# Lines longer than this are reported as errors instead of being buffered
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class SharedPrograms:
+    """
+    Single-flight program cache for one batch.
+
+    Args:
+        fetcher: Fetcher used for cache misses
+        max_fetches: Maximum titles fetched at once
+        lane: Admission lane each fetch also takes a slot in, None for none
+    """
+
+    def __init__(self, fetcher: ProgramFetcher, max_fetches: int = 3, lane: Optional[str] = None):
+        self.fetcher = fetcher
+        self.lane = lane
+        self._fetches: Dict[str, "asyncio.Future[Block]"] = {}
+        self._slots = asyncio.Semaphore(max_fetches)
+
+    async def _fetch(self, title: str) -> Block:
+        admission = get_scheduler().slot(self.lane) if self.lane is not None else nullcontext()
+        async with self._slots, admission:
+            result = await asyncio.to_thread(self.fetcher.fetch_single_program, title)
+        if not result.success:
+            raise ProgramFetchError(f"Failed to fetch '{title}': {result.error}")
+        return result.program
+
+    async def get(self, title: str) -> Block:
+        """The program for title; failures are cached for the batch too."""
+        fetch = self._fetches.get(title)
+        if fetch is None:
+            fetch = self._fetches[title] = asyncio.ensure_future(self._fetch(title))
+        # One waiter being cancelled must not cancel the shared fetch
+        return await asyncio.shield(fetch)
+
+    async def get_many(self, titles: Iterable[str]) -> Tuple[Dict[str, Block], Dict[str, str]]:
+        """Programs by title, and errors by title for those that failed."""
+        titles = list(titles)
+        results = await asyncio.gather(*(self.get(title) for title in titles), return_exceptions=True)
+        programs, errors = {}, {}
+        for title, result in zip(titles, results):
+            if isinstance(result, BaseException):
+                errors[title] = str(result)
+            else:
+                programs[title] = result
+        return programs, errors
+
+    def close(self):
+        for fetch in self._fetches.values():
+            if not fetch.done():
+                fetch.cancel()
+            elif not fetch.cancelled():
+                fetch.exception()  # retrieved, so unused failures are not logged as such
+
+
+async def read_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[bytes]:
+    """
+    Split a byte stream into non-empty lines.
+
+    A line longer than max_line_bytes is yielded as b"" (its content is
+    dropped) so that it still gets an index and an error result.
+    """
+    buffer = bytearray()
+    overflow = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                if not overflow:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        overflow = True
+                break
+            if overflow:
+                yield b""
+            else:
+                buffer += chunk[start:end]
+                line = bytes(buffer).strip()
+                if line:
+                    yield line
+            buffer.clear()
+            overflow = False
+            start = end + 1
+    if overflow:
+        yield b""
+    elif buffer.strip():
+        yield bytes(buffer).strip()
+
+
+async def fan_out(
+    lines: AsyncIterator[bytes],
+    handle: Callable[[int, bytes], Awaitable[Tuple[bytes, bool]]],
+    workers: int = 8,
+) -> AsyncIterator[bytes]:
+    """
+    Run handle(index, line) for every line on a pool of workers.
+
+    Yields handle's results (one encoded NDJSON line each) in completion
+    order, followed by a "done" summary. If the consumer stops early (the
+    client went away), everything still running is cancelled.
+
+    Args:
+        lines: Input lines
+        handle: Coroutine auditing one line; returns its encoded result and
+            whether it succeeded
+        workers: Maximum lines handled at once
+    """
+    pending: "asyncio.Queue[Optional[Tuple[int, bytes]]]" = asyncio.Queue(maxsize=workers * 2)
+    results: "asyncio.Queue[Optional[Tuple[bytes, bool]]]" = asyncio.Queue(maxsize=workers * 2)
+    count = 0
+
+    async def read():
+        nonlocal count
+        try:
+            async for line in lines:
+                await pending.put((count, line))
+                count += 1
+        finally:
+            for _ in range(workers):
+                await pending.put(None)
+
+    async def work():
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            try:
+                result = await handle(*item)
+            except Exception as e:
+                logger.exception(f"[batch] item {item[0]} failed")
+                result = encode_error(item[0], None, str(e)), False
+            await results.put(result)
+
+    async def finish():
+        await asyncio.gather(*pool)
+        await results.put(None)
+
+    reader = asyncio.ensure_future(read())
+    pool = [asyncio.ensure_future(work()) for _ in range(workers)]
+    closer = asyncio.ensure_future(finish())
+    errors = 0
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            line, ok = result
+            errors += not ok
+            yield line
+        await reader  # re-raises a failure reading the input
+        yield encode_done(count, errors)
+    finally:
+        for task in (reader, closer, *pool):
+            task.cancel()
+
+
+class _BatchResult(TypedDict):
+    event: str
+    index: NotRequired[int]
+    id: NotRequired[Any]
+    reports: NotRequired[List[AgentBlockReport]]
+    failures: NotRequired[List[ProgramFailure]]
+    audit_id: NotRequired[str]
+    detail: NotRequired[str]
+    items: NotRequired[int]
+    errors: NotRequired[int]
+    key: NotRequired[str]
+
+
+_BATCH_RESULT = TypeAdapter(_BatchResult)
+
+
+def _encode(body: _BatchResult) -> bytes:
+    return _BATCH_RESULT.dump_json(body) + b"\n"
+
+
+def encode_result(
+    index: int,
+    item_id: Any,
+    reports: List[AgentBlockReport],
+    audit_id: Optional[str] = None,
+    key: Optional[str] = None,
+    failures: Sequence[ProgramFailure] = (),
+) -> bytes:
+    body: _BatchResult = {"event": "result", "index": index, "reports": reports}
+    if failures:
+        body["failures"] = list(failures)
+    if item_id is not None:
+        body["id"] = item_id
+    if audit_id is not None:
+        body["audit_id"] = audit_id
+    if key is not None:
+        body["key"] = key
+    return _encode(body)
+
+
+def encode_error(index: int, item_id: Any, detail: str, key: Optional[str] = None) -> bytes:
+    body: _BatchResult = {"event": "error", "index": index, "detail": detail}
+    if item_id is not None:
+        body["id"] = item_id
+    if key is not None:
+        body["key"] = key
+    return _encode(body)
+
+
+def encode_done(items: int, errors: int) -> bytes:
+    return _encode({"event": "done", "items": items, "errors": errors})
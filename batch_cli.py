@@ -0,0 +1,247 @@
+"""
+Offline batch audits, without the HTTP API.
+
+    python batch_cli.py cohort.jsonl -o results.jsonl -w 8
+    python batch_cli.py cohort.csv -o results.jsonl       # rerun to resume
+
+Input is either JSONL, one /audit request body per line with an optional
+"id", or CSV with one row per course:
+
+    id,program_titles,subject_code,course_code,grade,credit
+    260000001,Computer Science Major Concentration (B.A.),COMP,206,B+,3
+
+A CSV student's rows must be consecutive; program_titles holds one or more
+titles separated by ";" and may be left empty after the student's first
+row. An empty credit is looked up in the course database.
+
+Transcripts are audited by AgentControllers on a process pool, each program
+title being fetched once in the parent and shipped to the workers. Results
+are appended to the output (the same lines as POST /audit/batch) as soon as
+they finish, and the output doubles as the checkpoint: on a rerun, items
+whose id (or line number, for JSONL without ids) already has a result are
+skipped, and a line cut short by a crash is dropped.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from transcript import Transcript
+from program import Block
+from transcript_input import InvalidTranscript, TranscriptInput, build_transcript as _build_transcript
+from batch import encode_error, encode_result
+
+# (key, index, transcript data) where key identifies the item across runs
+Item = Tuple[str, int, dict]
+
+
+def read_jsonl(path: str) -> Iterator[Item]:
+    with open(path, "r", encoding="utf-8") as f:
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                data = {"error": f"Invalid JSON: {e}"}
+            if not isinstance(data, dict):
+                data = {"error": "Expected a JSON object"}
+            item_id = data.get("id")
+            yield (str(item_id) if item_id is not None else f"#{index}"), index, data
+            index += 1
+
+
+def read_csv(path: str) -> Iterator[Item]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        current: Optional[dict] = None
+        index = 0
+        for row in csv.DictReader(f):
+            student = (row.get("id") or "").strip()
+            if current is None or student != current["id"]:
+                if current is not None:
+                    yield current["id"], index, current
+                    index += 1
+                current = {"id": student, "program_titles": [], "courses": []}
+            for title in (row.get("program_titles") or "").split(";"):
+                title = title.strip()
+                if title and title not in current["program_titles"]:
+                    current["program_titles"].append(title)
+            if row.get("subject_code"):
+                credit = (row.get("credit") or "").strip()
+                current["courses"].append({
+                    "subject_code": row["subject_code"].strip(),
+                    "course_code": (row.get("course_code") or "").strip(),
+                    "grade": (row.get("grade") or "").strip(),
+                    "credit": int(credit) if credit.isdigit() else None,
+                })
+        if current is not None:
+            yield current["id"], index, current
+
+
+def read_items(path: str) -> Iterator[Item]:
+    return read_csv(path) if path.lower().endswith(".csv") else read_jsonl(path)
+
+
+def build_transcript(data: dict) -> Transcript:
+    """Transcript for one input item, validated like the API does."""
+    if "error" in data:
+        raise ValueError(data["error"])
+    if not data.get("program_titles"):
+        raise ValueError("No program_titles")
+    return _build_transcript(TranscriptInput.model_validate(data))
+
+
+def finished_keys(path: str, retry_errors: bool = False) -> Set[str]:
+    """
+    Keys of items that already have a result in path.
+
+    A trailing line without a newline (the run was killed while writing
+    it) is truncated away so the file can be appended to.
+    """
+    keys: Set[str] = set()
+    if not os.path.exists(path):
+        return keys
+    with open(path, "rb+") as f:
+        good = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            good += len(line)
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if retry_errors and (result.get("event") == "error" or result.get("failures")):
+                continue
+            if "key" in result:
+                keys.add(result["key"])
+        f.truncate(good)
+    return keys
+
+
+def _audit(key: str, index: int, data: dict, programs: Dict[str, Block], errors: Dict[str, str]) -> Tuple[bytes, bool]:
+    """Runs in a worker process; returns the encoded result and whether it succeeded."""
+    from agent_controller import AgentController
+    item_id = data.get("id")
+    try:
+        transcript = build_transcript(data)
+        controller = AgentController(transcript, remember=False)
+        controller.agent.preset_programs(programs, errors)
+        controller.start()
+        return encode_result(index, item_id, controller.reports, key=key, failures=controller.failures), True
+    except ValidationError as e:
+        return encode_error(index, item_id, f"Invalid transcript: {e.errors(include_url=False)}", key=key), False
+    except InvalidTranscript as e:
+        return encode_error(index, item_id, str(e), key=key), False
+    except Exception as e:
+        return encode_error(index, item_id, f"Error generating audit report: {str(e)}", key=key), False
+
+
+class ProgramCache:
+    """Program Blocks by title, each fetched once per run in the parent."""
+
+    def __init__(self):
+        self._programs: Dict[str, Block] = {}
+        self._failed: Dict[str, str] = {}
+        self._fetcher = None
+
+    def get_many(self, titles: List[str]) -> Tuple[Dict[str, Block], Dict[str, str]]:
+        """Programs by title, and errors by title for those that failed."""
+        programs, errors = {}, {}
+        for title in titles:
+            if title not in self._programs and title not in self._failed:
+                self._fetch(title)
+            if title in self._failed:
+                errors[title] = self._failed[title]
+            else:
+                programs[title] = self._programs[title]
+        return programs, errors
+
+    def _fetch(self, title: str):
+        if self._fetcher is None:
+            from agent import ProgramFetcher, agent_fetch_config
+            self._fetcher = ProgramFetcher(agent_fetch_config())
+        result = self._fetcher.fetch_single_program(title)
+        if result.success:
+            self._programs[title] = result.program
+        else:
+            self._failed[title] = f"Failed to fetch '{title}': {result.error}"
+
+
+def run(
+    input_path: str,
+    output_path: str,
+    workers: int = 4,
+    retry_errors: bool = False,
+    limit: Optional[int] = None,
+) -> Tuple[int, int, int]:
+    """
+    Audit every unfinished item of input_path into output_path.
+
+    Returns:
+        (audited, failed, skipped) counts
+    """
+    done = finished_keys(output_path, retry_errors)
+    programs = ProgramCache()
+    audited = failed = skipped = 0
+    in_flight: Dict[Future, str] = {}
+
+    with open(output_path, "ab") as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        def collect(block: bool):
+            nonlocal audited, failed
+            finished, _ = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in finished:
+                in_flight.pop(future)
+                line, ok = future.result()
+                out.write(line)
+                out.flush()
+                audited += 1
+                failed += not ok
+
+        try:
+            for key, index, data in read_items(input_path):
+                if key in done:
+                    skipped += 1
+                    continue
+                if limit is not None and audited + len(in_flight) >= limit:
+                    break
+                blocks, errors = programs.get_many(data.get("program_titles") or [])
+                # Keep memory bounded: at most two items per worker in flight
+                while len(in_flight) >= workers * 2:
+                    collect(block=True)
+                in_flight[pool.submit(_audit, key, index, data, blocks, errors)] = key
+                collect(block=False)
+            while in_flight:
+                collect(block=True)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return audited, failed, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit a JSONL or CSV export of transcripts offline")
+    parser.add_argument("input", help="JSONL (one /audit body per line) or CSV (one row per course) file")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results; also the checkpoint for resuming")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Worker processes (default: 4)")
+    parser.add_argument("--retry-errors", action="store_true", help="Audit items whose earlier result was an error or had failed programs again")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many audits")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        audited, failed, skipped = run(args.input, args.output, args.workers, args.retry_errors, args.limit)
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun to resume from {args.output}", file=sys.stderr)
+        sys.exit(130)
+    elapsed = time.perf_counter() - start
+    print(f"{audited} audited ({failed} failed), {skipped} already done, in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
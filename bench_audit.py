@@ -0,0 +1,63 @@
+"""
+Offline audit benchmark.
+
+Runs the full AgentController.start path against recorded fixtures, so it
+needs no API keys or network:
+
+    REPLAY_MODE=record python agent_controller.py         # once, online
+    REPLAY_MODE=replay REPLAY_LATENCY_SCALE=0 python bench_audit.py -n 50 -c 8
+    REPLAY_MODE=replay python bench_audit.py --profile    # with original latencies
+"""
+import os
+import time
+import argparse
+import cProfile
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("REPLAY_MODE", "replay")
+
+from agent_controller import AgentController, _TEST_TRANSCRIPT
+
+
+def run_once(_) -> float:
+    start = time.perf_counter()
+    controller = AgentController(_TEST_TRANSCRIPT)
+    controller.start()
+    controller.get_report_serializable()
+    return time.perf_counter() - start
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p / 100.0 * len(samples)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--audits", type=int, default=10, help="number of audits to run")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="audits run in parallel")
+    parser.add_argument("--profile", action="store_true", help="print a cProfile summary")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = list(executor.map(run_once, range(args.audits)))
+    elapsed = time.perf_counter() - start
+
+    if profiler:
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+    print(f"audits={args.audits} concurrency={args.concurrency} wall={elapsed:.2f}s "
+          f"throughput={args.audits / elapsed:.2f}/s")
+    print(f"p50={percentile(latencies, 50):.3f}s p95={percentile(latencies, 95):.3f}s "
+          f"max={max(latencies):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
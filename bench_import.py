@@ -0,0 +1,84 @@
+"""
+Import-time benchmark.
+
+Imports a module in fresh interpreters and reports the wall time and the
+slowest imports (from python -X importtime), so cold-start regressions in
+the API entry point show up before they reach a deploy:
+
+    python bench_import.py                      # import api, 5 runs
+    python bench_import.py -m agent_controller -n 10 --top 20
+    python bench_import.py --max-ms 400         # exit 1 if the median is slower
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_once(module: str) -> Tuple[float, Dict[str, int]]:
+    """Import module in a fresh interpreter; returns (seconds, cumulative us per module)."""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+        # Keep warm-up threads and network clients out of the measurement
+        env={**os.environ, "API_WARMUP": "0"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    cumulative: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total)
+    return float(result.stdout.strip().splitlines()[-1]), cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-m", "--module", default="api", help="module to import (default: api)")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="fresh interpreters to run")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--max-ms", type=float, help="fail if the median import time exceeds this")
+    args = parser.parse_args()
+
+    times: List[float] = []
+    slowest: Dict[str, List[int]] = {}
+    for _ in range(args.runs):
+        seconds, cumulative = import_once(args.module)
+        times.append(seconds)
+        for name, us in cumulative.items():
+            slowest.setdefault(name, []).append(us)
+
+    median_ms = statistics.median(times) * 1000
+    print(f"import {args.module}: median={median_ms:.1f}ms min={min(times) * 1000:.1f}ms "
+          f"max={max(times) * 1000:.1f}ms runs={args.runs}")
+
+    # Only top-level (non-dotted) project modules and packages, by median cumulative time
+    ranked = sorted(
+        ((statistics.median(us), name) for name, us in slowest.items() if "." not in name),
+        reverse=True,
+    )
+    for us, name in ranked[:args.top]:
+        print(f"  {us / 1000:8.1f}ms  {name}")
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"median import time {median_ms:.1f}ms exceeds {args.max_ms:.1f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
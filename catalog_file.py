@@ -0,0 +1,191 @@
+"""
+Compiled program catalog file.
+
+The catalogue is written once to a single binary file, which workers then
+memory-map read-only. Every uvicorn worker on a host shares the same page
+cache pages, and a program is decoded only when it is first asked for.
+
+Layout (all integers little-endian):
+
+    header   magic "PCAT", u16 format version, u16 reserved,
+             u64 index offset, u64 index length
+    data     one compact UTF-8 JSON document per program, back to back
+    index    JSON: {"programs": {name: [offset, length, version]},
+                    "courses": {"SUBJ CODE": [[program, [block path...]], ...]}}
+
+Build from the bundled catalogue, JSON files, or the browser agent:
+
+    python catalog_file.py -o programs.pcat
+    python catalog_file.py -o programs.pcat --json extra.json
+    python catalog_file.py -o programs.pcat --fetch "Computer Science Major Concentration (B.A.)"
+"""
+import os
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from transcript import CourseKey, course_key
+
+MAGIC = b"PCAT"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHHQQ")
+
+
+class CatalogFileError(ValueError):
+    """raised when a catalog file is missing, truncated or of another format"""
+    pass
+
+
+def _course_label(key: CourseKey) -> str:
+    return f"{key[0]} {key[1]}"
+
+
+class CompiledCatalog:
+    """
+    Read-only view of a compiled catalog file.
+
+    Only the index is parsed when the file is opened; program data stays in
+    the mapping until raw() is called for that program.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise CatalogFileError(f"Cannot open catalog file {path}: {e}") from e
+
+        if len(self._map) < _HEADER.size:
+            raise CatalogFileError(f"{path} is not a catalog file")
+        magic, version, _, index_offset, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise CatalogFileError(f"{path} is not a catalog file")
+        if version != FORMAT_VERSION:
+            raise CatalogFileError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        if index_offset + index_length > len(self._map):
+            raise CatalogFileError(f"{path} is truncated")
+
+        index = json.loads(self._map[index_offset:index_offset + index_length])
+        self._programs: Dict[str, Tuple[int, int, str]] = {
+            name: tuple(location) for name, location in index["programs"].items()
+        }
+        self._courses: Dict[str, List[Tuple[str, Tuple[str, ...]]]] = index["courses"]
+        self._lock = Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._programs
+
+    def __len__(self) -> int:
+        return len(self._programs)
+
+    def names(self) -> List[str]:
+        return list(self._programs)
+
+    def version(self, name: str) -> str:
+        return self._programs[name][2]
+
+    def raw(self, name: str) -> dict:
+        """Decode one program's data from the mapping."""
+        offset, length, _ = self._programs[name]
+        with self._lock:
+            data = self._map[offset:offset + length]
+        return json.loads(data)
+
+    def course_refs(self, key: CourseKey) -> List[Tuple[str, Tuple[str, ...]]]:
+        """(program, block path) of every block listing the course."""
+        return [(program, tuple(path)) for program, path in self._courses.get(_course_label(key), ())]
+
+    def close(self):
+        self._map.close()
+
+
+def write_catalog(path: str, programs: Iterable[dict]):
+    """
+    Write programs to a compiled catalog file.
+
+    The file is written next to path and renamed into place, so workers
+    that already mapped the old file keep a consistent view.
+    """
+    from program import ProgramCatalog, _listed_courses
+
+    locations: Dict[str, list] = {}
+    courses: Dict[str, list] = {}
+    chunks: List[bytes] = []
+    offset = _HEADER.size
+
+    for program in programs:
+        name = program["name"]
+        data = json.dumps(program, separators=(",", ":"), default=str).encode("utf-8")
+        # Same version label ProgramCatalog would give the program
+        locations[name] = [offset, len(data), ProgramCatalog.content_version(program)]
+        chunks.append(data)
+        offset += len(data)
+
+        def walk(block: dict, block_path: Tuple[str, ...]):
+            for key in _listed_courses(block.get("courses")):
+                refs = courses.setdefault(_course_label(key), [])
+                ref = [name, list(block_path)]
+                if ref not in refs:
+                    refs.append(ref)
+            for child in block.get("blocks", []) or []:
+                walk(child, block_path + (child.get("name", ""),))
+
+        walk(program, ())
+
+    index = json.dumps({"programs": locations, "courses": courses}, separators=(",", ":")).encode("utf-8")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, offset, len(index)))
+        for chunk in chunks:
+            f.write(chunk)
+        f.write(index)
+    os.replace(tmp, path)
+
+
+def _load_json(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def _fetch(titles: List[str]) -> List[dict]:
+    from fetcher import ProgramFetcher
+
+    results: Dict[str, object] = {}
+
+    def on_complete(programs, failed):
+        results["programs"], results["failed"] = programs, failed
+
+    ProgramFetcher().fetch_programs_async(titles, on_complete=on_complete).join()
+    if results.get("failed"):
+        raise CatalogFileError(f"Failed to fetch: {results['failed']}")
+    return [program.model_dump(mode="json") for program in results.get("programs", [])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a compiled program catalog file")
+    parser.add_argument("-o", "--output", required=True, help="Catalog file to write")
+    parser.add_argument("--json", nargs="*", default=[], help="JSON files holding a program or a list of programs")
+    parser.add_argument("--fetch", nargs="*", default=[], help="Program titles to fetch with the browser agent")
+    parser.add_argument("--no-bundled", action="store_true", help="Leave out the programs bundled in program_data.py")
+    args = parser.parse_args()
+
+    programs: Dict[str, dict] = {}
+    if not args.no_bundled:
+        from program_data import PROGRAMS
+        programs.update((p["name"], p) for p in PROGRAMS)
+    for path in args.json:
+        programs.update((p["name"], p) for p in _load_json(path))
+    if args.fetch:
+        programs.update((p["name"], p) for p in _fetch(args.fetch))
+
+    write_catalog(args.output, programs.values())
+    print(f"Wrote {len(programs)} programs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
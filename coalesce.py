@@ -0,0 +1,74 @@
+"""
+Coalescing of identical in-flight audits.
+
+Double-clicks, client retries and page refreshes send the same /audit body
+within seconds of each other. Requests are keyed by a canonical hash of
+what is audited (the transcript snapshot's fingerprint, which already
+normalises course codes and retakes); while an audit for a key is running,
+further requests for that key wait for its result instead of starting their
+own fetches and LLM calls.
+
+Only running audits are shared: once an audit finishes (or fails) its key
+is released, so the next request starts a fresh one.
+"""
+import hashlib
+import asyncio
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class CoalesceStats:
+    started: int = 0
+    coalesced: int = 0
+
+
+def request_key(kind: str, *parts: str) -> str:
+    """Hex sha256 of an endpoint name and the canonical parts of its request."""
+    return hashlib.sha256("|".join((kind,) + parts).encode("utf-8")).hexdigest()
+
+
+class Coalescer:
+    """
+    Single-flight runner for one event loop.
+
+    A caller that goes away does not cancel the shared audit: the others
+    still wait for it, and a finished audit is stored for /audit/incremental
+    either way.
+    """
+
+    def __init__(self):
+        self._running: Dict[str, "asyncio.Future"] = {}
+        self._lock = Lock()
+        self._stats = CoalesceStats()
+
+    async def run(self, key: str, start: Callable[[], Awaitable[T]]) -> T:
+        """The result of start(), or of the audit already running for key."""
+        running = self._running.get(key)
+        if running is None:
+            running = self._running[key] = asyncio.ensure_future(start())
+            running.add_done_callback(lambda done: self._release(key, done))
+            self._incr("started")
+        else:
+            self._incr("coalesced")
+        return await asyncio.shield(running)
+
+    def _release(self, key: str, done: "asyncio.Future"):
+        if self._running.get(key) is done:
+            del self._running[key]
+        if not done.cancelled():
+            done.exception()  # retrieved, so a failure nobody waited for is not logged as such
+
+    def __len__(self) -> int:
+        return len(self._running)
+
+    def _incr(self, name: str):
+        with self._lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**asdict(self._stats), "in_flight": len(self._running)}
@@ -0,0 +1,375 @@
+"""
+Columnar transcript store for batch audits.
+
+TranscriptColumns holds the courses of many students as flat NumPy arrays
+(one row per course, rows grouped by student), so a program's rules are
+evaluated for every student at once instead of in a Python loop per
+student:
+
+    columns = TranscriptColumns.from_transcripts(snapshots)
+    result = BatchAuditor(get_program(title)).audit(columns)
+    result.fulfilled          # bool per student
+    result.received["Required Courses"]
+
+Course predicates come from rules.compile_block, so the batch path and the
+per-student evaluator read block details the same way.
+"""
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from program import Block, BlockType
+from course_db import get_course_db
+from rules import CoursePredicate, compile_block, course_number, can_evaluate, program_department, uses_honours_equivalents
+from transcript import CourseKey, TranscriptSnapshot, Transcript, course_key
+
+GRADE_POINTS: Dict[str, float] = {
+    "A": 4.0,
+    "A-": 3.7,
+    "B+": 3.3,
+    "B": 3.0,
+    "B-": 2.7,
+    "C+": 2.3,
+    "C": 2.0,
+    "D": 1.0,
+    "F": 0.0,
+}
+
+
+class Vocabulary:
+    """Maps strings (subjects) or course keys to dense integer ids."""
+
+    def __init__(self):
+        self._ids: Dict[object, int] = {}
+        self._lock = Lock()
+
+    def id(self, value) -> int:
+        found = self._ids.get(value)
+        if found is not None:
+            return found
+        with self._lock:
+            return self._ids.setdefault(value, len(self._ids))
+
+    def ids(self, values: Iterable) -> np.ndarray:
+        """Ids of values already in the vocabulary; unknown values are skipped."""
+        return np.fromiter(
+            (self._ids[v] for v in values if v in self._ids), dtype=np.int32
+        )
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+# Shared by every store so ids are comparable across batches
+SUBJECTS = Vocabulary()
+COURSES = Vocabulary()
+
+
+@dataclass
+class TranscriptColumns:
+    """
+    Courses of many students in columnar form.
+
+    Attributes:
+        student: Row -> student index (int32)
+        subject: Row -> subject id in SUBJECTS (int32)
+        course: Row -> (subject, code) id in COURSES (int32)
+        number: Row -> numeric part of the course code, -1 if none (int16)
+        credit: Row -> credits (float32)
+        grade_points: Row -> grade points, NaN for unknown grades (float32)
+        n_students: Number of students
+    """
+    student: np.ndarray
+    subject: np.ndarray
+    course: np.ndarray
+    number: np.ndarray
+    credit: np.ndarray
+    grade_points: np.ndarray
+    n_students: int
+
+    @classmethod
+    def from_transcripts(cls, transcripts: Iterable) -> "TranscriptColumns":
+        """Build from Transcripts or TranscriptSnapshots, in order."""
+        student: List[int] = []
+        subject: List[int] = []
+        course: List[int] = []
+        number: List[int] = []
+        credit: List[float] = []
+        points: List[float] = []
+        n = 0
+        for n, transcript in enumerate(transcripts, start=1):
+            if isinstance(transcript, Transcript):
+                transcript = transcript.snapshot()
+            for record in transcript:
+                key = record.key
+                student.append(n - 1)
+                subject.append(SUBJECTS.id(key[0]))
+                course.append(COURSES.id(key))
+                num = course_number(key[1])
+                number.append(-1 if num is None else num)
+                credit.append(record.credit or 0)
+                points.append(GRADE_POINTS.get(str(record.grade).strip().upper(), np.nan))
+        return cls(
+            student=np.asarray(student, dtype=np.int32),
+            subject=np.asarray(subject, dtype=np.int32),
+            course=np.asarray(course, dtype=np.int32),
+            number=np.asarray(number, dtype=np.int16),
+            credit=np.asarray(credit, dtype=np.float32),
+            grade_points=np.asarray(points, dtype=np.float32),
+            n_students=n,
+        )
+
+    def __len__(self) -> int:
+        return len(self.student)
+
+    @property
+    def usable(self) -> np.ndarray:
+        return self.credit != 0
+
+    def level(self) -> np.ndarray:
+        return np.where(self.number >= 0, self.number // 100 * 100, -1)
+
+    def sum_by_student(self, values: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Per-student sum of values over the rows where mask is True."""
+        weights = values if mask is None else np.where(mask, values, 0)
+        return np.bincount(self.student, weights=weights, minlength=self.n_students)
+
+    def credit_sums(self, mask: np.ndarray) -> np.ndarray:
+        return self.sum_by_student(self.credit, mask)
+
+    def gpa(self) -> np.ndarray:
+        """Credit-weighted GPA per student, NaN for students with no graded credits."""
+        graded = ~np.isnan(self.grade_points)
+        credits = self.sum_by_student(self.credit, graded)
+        points = self.sum_by_student(np.nan_to_num(self.grade_points) * self.credit, graded)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(credits > 0, points / credits, np.nan)
+
+
+def _course_ids(keys: Iterable[CourseKey]) -> np.ndarray:
+    return COURSES.ids(course_key(*key) for key in keys)
+
+
+def predicate_mask(columns: TranscriptColumns, predicate: CoursePredicate) -> np.ndarray:
+    """Vectorised CoursePredicate.matches over every row."""
+    included = np.isin(columns.course, _course_ids(predicate.includes))
+    if predicate.listed_only:
+        mask = included
+    else:
+        mask = columns.number >= 0
+        if predicate.subjects:
+            mask &= np.isin(columns.subject, SUBJECTS.ids(predicate.subjects))
+        level = columns.level()
+        if predicate.levels:
+            mask &= np.isin(level, np.fromiter(predicate.levels, dtype=np.int32))
+        if predicate.min_level is not None:
+            mask &= level >= predicate.min_level
+        if predicate.min_number is not None:
+            mask &= columns.number >= predicate.min_number
+        mask |= included
+    if predicate.excludes:
+        mask &= ~np.isin(columns.course, _course_ids(predicate.excludes))
+    return mask
+
+
+def listed_mask(columns: TranscriptColumns, block: Block, honours: bool = False) -> np.ndarray:
+    """Rows holding a course listed in block.courses (or, with honours, an equivalent of one)."""
+    keys = {course_key(c[0], c[1]) for c in block.courses}
+    if honours:
+        db = get_course_db()
+        keys = {equivalent for key in keys for equivalent in db.equivalents(*key)}
+    return np.isin(columns.course, _course_ids(keys))
+
+
+@dataclass
+class BatchResult:
+    """
+    Per-student outcome of one program over a TranscriptColumns.
+
+    Attributes:
+        program: Program name
+        received: Block name -> credits counted per student
+        block_fulfilled: Block name -> bool per student
+        fulfilled: Whole program fulfilled, per student
+        missing_required: Listed required courses not taken, per student
+    """
+    program: str
+    received: Dict[str, np.ndarray]
+    block_fulfilled: Dict[str, np.ndarray]
+    fulfilled: np.ndarray
+    missing_required: np.ndarray
+
+
+def take_until(
+    columns: TranscriptColumns,
+    order: np.ndarray,
+    mask: np.ndarray,
+    limit,
+    fit: bool = False,
+) -> np.ndarray:
+    """
+    Greedy per-student selection, vectorised.
+
+    Walking each student's rows in order, a row in mask is taken while the
+    credits taken before it are below limit (a scalar or one value per
+    student). This is the "fill to the minimum, one course at a time" loop
+    of the per-student evaluator as a segmented cumulative sum. With fit,
+    a row is taken only if it still fits under limit (for caps).
+    """
+    rows = order[mask[order]]
+    taken = np.zeros(len(columns), dtype=bool)
+    if len(rows) == 0:
+        return taken
+    credit = columns.credit[rows].astype(np.float64)
+    student = columns.student[rows]
+    cumulative = np.cumsum(credit)
+    before = cumulative - credit
+    first = np.r_[True, student[1:] != student[:-1]]
+    base = np.maximum.accumulate(np.where(first, before, 0))
+    limit = np.asarray(limit, dtype=np.float64)
+    if limit.ndim:
+        limit = limit[student]
+    if fit:
+        taken[rows[(cumulative - base) <= limit]] = True
+    else:
+        taken[rows[(before - base) < limit]] = True
+    return taken
+
+
+class BatchAuditor:
+    """
+    Audits one program for many students at once.
+
+    Follows rules.evaluate_program: required courses first, then each
+    group up to its minimum, then the rest of the block from eligible
+    courses, in the same preference order (program department first, lower
+    numbers, fewer credits) and without reusing a course. A cap is applied
+    as a prefix of each student's courses, so where the evaluator skips a
+    course that overflows a cap and takes a smaller one after it, the batch
+    count comes out lower; students near a threshold can be re-run through
+    the evaluator exactly.
+    """
+
+    def __init__(self, program: Block):
+        if not can_evaluate(program):
+            raise ValueError(f"'{program.name}' has rules that do not compile")
+        self.program = program
+        self.department = program_department(program)
+        self.honours = uses_honours_equivalents(program)
+
+    def _order(self, columns: TranscriptColumns) -> np.ndarray:
+        department = SUBJECTS.ids([self.department]) if self.department else np.empty(0, np.int32)
+        other = ~np.isin(columns.subject, department)
+        return np.lexsort((columns.credit, columns.number, other, columns.student))
+
+    def audit(self, columns: TranscriptColumns) -> BatchResult:
+        order = self._order(columns)
+        received: Dict[str, np.ndarray] = {}
+        block_fulfilled: Dict[str, np.ndarray] = {}
+        missing = np.zeros(columns.n_students, dtype=np.int32)
+
+        used = ~columns.usable
+        for block in self.program.blocks:
+            if block.block_type != BlockType.REQUIRED:
+                continue
+            rows = listed_mask(columns, block, self.honours) & ~used
+            used |= rows
+            if self.honours:
+                # A listed course and its equivalent satisfy one requirement, not two
+                db = get_course_db()
+                taken = sum(
+                    columns.credit_sums(rows & np.isin(columns.course, _course_ids(db.equivalents(c[0], c[1])))) > 0
+                    for c in block.courses
+                )
+            else:
+                taken = np.bincount(columns.student, weights=rows, minlength=columns.n_students)
+            missing += (len(block.courses) - taken).astype(np.int32)
+            received[block.name] = columns.credit_sums(rows)
+            block_fulfilled[block.name] = taken >= len(block.courses)
+
+        for block in self.program.blocks:
+            if block.block_type == BlockType.REQUIRED:
+                continue
+            rows, ok = self._complementary(columns, order, block, used, self.honours)
+            used |= rows
+            received[block.name] = columns.credit_sums(rows)
+            block_fulfilled[block.name] = ok
+
+        fulfilled = np.ones(columns.n_students, dtype=bool)
+        for ok in block_fulfilled.values():
+            fulfilled &= ok
+        return BatchResult(self.program.name, received, block_fulfilled, fulfilled, missing)
+
+    @staticmethod
+    def _complementary(
+        columns: TranscriptColumns,
+        order: np.ndarray,
+        block: Block,
+        used: np.ndarray,
+        honours: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        rules = compile_block(block)
+        ok = np.ones(columns.n_students, dtype=bool)
+        available = ~used
+
+        for group in rules.exclusive:
+            # Of a mutually exclusive pair only the preferred course counts
+            ids = np.isin(columns.course, _course_ids(group)) & available
+            available &= ~(ids & ~take_until(columns, order, ids, 1e-9))
+
+        def capped(mask: np.ndarray, taken: np.ndarray, general: bool) -> np.ndarray:
+            for limit in rules.limits:
+                if limit.max_credits is None or (limit.scope == "general" and not general):
+                    continue
+                matched = predicate_mask(columns, limit.predicate)
+                room = limit.max_credits - columns.credit_sums(taken & matched)
+                if limit.scope == "general":
+                    room = limit.max_credits - columns.credit_sums(general_rows & matched)
+                allowed = take_until(columns, order, mask & matched, np.maximum(room, 0), fit=True)
+                mask = mask & (~matched | allowed)
+            return mask
+
+        taken = np.zeros(len(columns), dtype=bool)
+        general_rows = np.zeros(len(columns), dtype=bool)
+        group_rows = np.zeros(len(columns), dtype=bool)
+        for group in block.blocks:
+            listed = listed_mask(columns, group, honours)
+            group_rows |= listed
+            rows = take_until(columns, order, capped(listed & available & ~taken, taken, False), group.minimum_credit or 0)
+            taken |= rows
+            ok &= columns.credit_sums(rows) >= (group.minimum_credit or 0)
+
+        eligible = listed_mask(columns, block, honours)
+        for predicate in rules.selection:
+            eligible |= predicate_mask(columns, predicate)
+        if not rules.selection:
+            eligible |= group_rows
+        pool = eligible & available & ~taken
+
+        # Floors first, then the rest of the block up to its minimum
+        for limit in rules.limits:
+            if limit.min_credits is None:
+                continue
+            matched = predicate_mask(columns, limit.predicate)
+            need = np.minimum(
+                limit.min_credits - columns.credit_sums(taken & matched),
+                (block.minimum_credit or 0) - columns.credit_sums(taken),
+            )
+            rows = take_until(columns, order, capped(pool & matched & ~taken, taken, True), np.maximum(need, 0))
+            taken |= rows
+            general_rows |= rows
+        need = (block.minimum_credit or 0) - columns.credit_sums(taken)
+        rows = take_until(columns, order, capped(pool & ~taken, taken, True), np.maximum(need, 0))
+        taken |= rows
+        general_rows |= rows
+
+        for limit in rules.limits:
+            if limit.min_credits is not None:
+                ok &= columns.credit_sums(taken & predicate_mask(columns, limit.predicate)) >= limit.min_credits
+        ok &= columns.credit_sums(taken) >= (block.minimum_credit or 0)
+        return taken, ok
+
+
+def audit_batch(program: Block, transcripts: Iterable) -> BatchResult:
+    """Convenience wrapper: columnarise transcripts and audit one program."""
+    return BatchAuditor(program).audit(TranscriptColumns.from_transcripts(transcripts))
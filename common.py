@@ -1,22 +1,105 @@
+import os
+import json
+import queue
+import atexit
+import random
 import logging
+from threading import Lock
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Optional
 
-def get_logger(name: str = None) -> logging.Logger:
-    logger = logging.getLogger(name)
-    if not logger.hasHandlers():  # Prevent duplicate handlers on reload
-        logger.setLevel(logging.DEBUG)
+__all__ = ["logging", "get_logger", "log_payload"]
+
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+_lock = Lock()
+
+
+def _level() -> int:
+    return getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+
+
+def _queue_handler() -> QueueHandler:
+    """
+    The handler every logger writes to.
 
-        # File handler - overwrite previous logs each run
-        fh = logging.FileHandler("app.log", mode="w")  # <-- changed "a" to "w"
-        fh.setLevel(logging.DEBUG)
+    Records are put on an in-memory queue; a single background listener
+    thread formats them and writes them to LOG_FILE (default: app.log),
+    rotating at LOG_MAX_MB (default: 10) and keeping LOG_BACKUPS old files
+    (default: 5). The request path never touches the disk.
+    """
+    global _handler, _listener
+    with _lock:
+        if _handler is None:
+            fh = RotatingFileHandler(
+                os.getenv("LOG_FILE", "app.log"),
+                maxBytes=int(float(os.getenv("LOG_MAX_MB", "10")) * 1024 * 1024),
+                backupCount=int(os.getenv("LOG_BACKUPS", "5")),
+                encoding="utf-8",
+                delay=True,
+            )
+            fh.setFormatter(logging.Formatter(
+                "[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s"
+            ))
+            _listener = QueueListener(_queue, fh, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+            _handler = QueueHandler(_queue)
+        return _handler
 
-        formatter = logging.Formatter(
-            "[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s"
-        )
-        fh.setFormatter(formatter)
 
-        logger.addHandler(fh)
+def get_logger(name: str = None) -> logging.Logger:
+    logger = logging.getLogger(name)
+    if not logger.hasHandlers():  # Prevent duplicate handlers on reload
+        # LOG_LEVEL sets the level (default: INFO); filtered records are
+        # dropped before any formatting happens
+        logger.setLevel(_level())
+        logger.addHandler(_queue_handler())
 
         # Prevent propagation to root logger
         logger.propagate = False
 
     return logger
+
+
+def log_payload(
+    logger: logging.Logger,
+    label: str,
+    payload: Any,
+    level: int = logging.DEBUG,
+    sample_rate: Optional[float] = None,
+    max_chars: Optional[int] = None,
+):
+    """
+    Log a large payload (e.g. a report) sampled and size-capped.
+
+    The payload is only serialised if the level is enabled and the call is
+    sampled, so unsampled calls cost a level check and a random number.
+
+    Args:
+        logger: Logger to write to
+        label: Short description logged before the payload
+        payload: JSON-serialisable object, or already encoded str/bytes
+        level: Log level (default: DEBUG)
+        sample_rate: Fraction of calls logged (default: LOG_PAYLOAD_SAMPLE or 1.0)
+        max_chars: Payload is truncated beyond this (default: LOG_PAYLOAD_MAX_CHARS or 2000)
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if sample_rate is None:
+        sample_rate = float(os.getenv("LOG_PAYLOAD_SAMPLE", "1.0"))
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    if max_chars is None:
+        max_chars = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+    if isinstance(payload, bytes):
+        text = payload.decode("utf-8", errors="replace")
+    elif isinstance(payload, str):
+        text = payload
+    else:
+        text = json.dumps(payload, separators=(",", ":"), default=str)
+    if len(text) > max_chars:
+        text = f"{text[:max_chars]}... ({len(text)} chars)"
+    logger.log(level, f"{label}: {text}")
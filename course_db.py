@@ -0,0 +1,156 @@
+"""
+Local course database: titles, credits and equivalences, bundled with the
+app (courses.json) so no network is needed.
+
+Equivalence groups (honours versions, cross-listings) are merged with a
+union-find when the file is loaded, so every lookup afterwards is a dict
+access:
+
+    db = get_course_db()
+    db.get("MATH", "323").title           # "Probability"
+    db.equivalents("MATH", "356")         # {("MATH", "323"), ("MATH", "356")}
+    db.fill(transcript)                   # fills Course.title and missing credits
+"""
+import os
+import json
+from threading import Lock
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+from transcript import Course, CourseKey, CourseRecord, Transcript, course_key
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "courses.json")
+
+
+class CourseInfo(NamedTuple):
+    subject_code: str
+    course_code: str
+    title: str
+    credits: Optional[int]
+
+    @property
+    def key(self) -> CourseKey:
+        return course_key(self.subject_code, self.course_code)
+
+
+def _parse_label(label: str) -> CourseKey:
+    """'MATH 323' -> ('MATH', '323')"""
+    subject, code = label.split()
+    return course_key(subject, code)
+
+
+class CourseDB:
+    """
+    Indexed, read-only course database.
+
+    Courses are indexed by (subject_code, course_code). Each course belongs
+    to exactly one equivalence class (a singleton if it has no equivalents).
+    """
+
+    def __init__(self, courses: Iterable[CourseInfo] = (), equivalents: Iterable[Iterable[CourseKey]] = ()):
+        self._courses: Dict[CourseKey, CourseInfo] = {info.key: info for info in courses}
+        self._classes: Dict[CourseKey, FrozenSet[CourseKey]] = self._build_classes(equivalents)
+
+    @staticmethod
+    def _build_classes(groups: Iterable[Iterable[CourseKey]]) -> Dict[CourseKey, FrozenSet[CourseKey]]:
+        parent: Dict[CourseKey, CourseKey] = {}
+
+        def find(key: CourseKey) -> CourseKey:
+            parent.setdefault(key, key)
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for group in groups:
+            keys = [course_key(*key) for key in group]
+            for key in keys[1:]:
+                parent[find(key)] = find(keys[0])
+
+        members: Dict[CourseKey, set] = {}
+        for key in parent:
+            members.setdefault(find(key), set()).add(key)
+        classes: Dict[CourseKey, FrozenSet[CourseKey]] = {}
+        for group in members.values():
+            frozen = frozenset(group)
+            for key in group:
+                classes[key] = frozen
+        return classes
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> "CourseDB":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        courses = [
+            CourseInfo(c["subject"], str(c["number"]), c.get("title", ""), c.get("credits"))
+            for c in data.get("courses", [])
+        ]
+        equivalents = [[_parse_label(label) for label in group] for group in data.get("equivalents", [])]
+        return cls(courses, equivalents)
+
+    def __contains__(self, key: CourseKey) -> bool:
+        return course_key(*key) in self._courses
+
+    def __len__(self) -> int:
+        return len(self._courses)
+
+    def get(self, subject_code: str, course_code) -> Optional[CourseInfo]:
+        return self._courses.get(course_key(subject_code, course_code))
+
+    def equivalents(self, subject_code: str, course_code) -> FrozenSet[CourseKey]:
+        """The course's equivalence class, including the course itself."""
+        key = course_key(subject_code, course_code)
+        return self._classes.get(key, frozenset((key,)))
+
+    def are_equivalent(self, a: CourseKey, b: CourseKey) -> bool:
+        return course_key(*b) in self.equivalents(*a)
+
+    def fill(self, courses: Iterable[Course], overwrite_credit: bool = False) -> int:
+        """
+        Fill title (and credit, where missing) of Courses in place.
+
+        Args:
+            courses: Courses, or a Transcript
+            overwrite_credit: If True, known credits replace the given ones
+                (failed courses keep 0)
+
+        Returns:
+            Number of courses found in the database
+        """
+        found = 0
+        for course in courses:
+            info = self._courses.get(course.key)
+            if info is None:
+                continue
+            found += 1
+            if not course.title:
+                course.title = info.title
+            if info.credits is not None and (course.credit is None or (overwrite_credit and course.credit != 0)):
+                course.credit = info.credits
+        if isinstance(courses, Transcript):
+            courses.changed()
+        return found
+
+    def fill_records(self, records: Iterable[CourseRecord]) -> List[CourseRecord]:
+        """Copies of records with title and missing credit filled in."""
+        result = []
+        for record in records:
+            info = self._courses.get(record.key)
+            if info is not None:
+                record = record._replace(
+                    title=record.title or info.title,
+                    credit=info.credits if record.credit is None else record.credit,
+                )
+            result.append(record)
+        return result
+
+
+_db: Optional[CourseDB] = None
+_db_lock = Lock()
+
+
+def get_course_db() -> CourseDB:
+    """Process-wide database, loaded from COURSE_DB_FILE (default: the bundled courses.json)."""
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = CourseDB.load(os.getenv("COURSE_DB_FILE") or DEFAULT_PATH)
+        return _db
@@ -11,15 +11,16 @@ from enum import Enum
 from dotenv import load_dotenv
 from transcript import *
 from program import * 
+from replay import get_traffic_store
+from hedging import Deadline
+from shared_cache import SharedCache, get_shared_cache
+
+from common import get_logger
 
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Handlers are configured by common.get_logger, never at import time
+logger = get_logger(__name__)
 
 
 class TaskState(Enum):
@@ -54,6 +55,8 @@ class FetchConfig:
         step_limit: Maximum steps for agent task execution (default: 2)
         debug_mode: If True, uses get_program function instead of API calls (default: False)
         debug_get_program: Function to use in debug mode: (title: str) -> Program
+        shared_ttl: Seconds a program fetched by any worker is served from the
+            shared cache, if one is configured (default: 3600)
     """
     max_retries: int = 1
     max_workers: int = 5
@@ -63,6 +66,7 @@ class FetchConfig:
     step_limit: int = 5
     debug_mode: bool = False
     debug_get_program: Optional[Callable[[str], Block]] = None
+    shared_ttl: float = 3600.0
 
 
 class ProgramFetchError(Exception):
@@ -70,6 +74,23 @@ class ProgramFetchError(Exception):
     pass
 
 
+# Last successfully fetched Block per title, in this process, for audits
+# that run out of time before a fresh fetch finishes
+_last_fetched: Dict[str, Block] = {}
+_last_fetched_lock = Lock()
+
+# Shared cache namespace of fetched program Blocks, by title
+PROGRAMS = "programs"
+
+
+def _decode_program(data: bytes) -> Optional[Block]:
+    try:
+        return Block.model_validate_json(data)
+    except ValueError as e:
+        logger.warning(f"Dropping unreadable shared program entry: {e}")
+        return None
+
+
 class ProgramFetcher:
     """
     Fetches and parses academic program information from course catalogs
@@ -94,6 +115,7 @@ class ProgramFetcher:
                        if debug_get_program is not provided in debug mode
         """
         self.config = config or FetchConfig()
+        self.traffic = get_traffic_store()
         
         # Debug mode validation
         if self.config.debug_mode:
@@ -107,7 +129,7 @@ class ProgramFetcher:
             self.api_base = os.getenv('API_BASE')
             self.api_key = os.getenv('API_KEY')
             
-            if not self.api_base or not self.api_key:
+            if (not self.api_base or not self.api_key) and not self.traffic.replaying:
                 raise ValueError("API_BASE and API_KEY must be provided")
         
         self._lock = Lock()
@@ -144,7 +166,8 @@ class ProgramFetcher:
         self,
         method: str,
         endpoint: str,
-        json_data: Optional[dict] = None
+        json_data: Optional[dict] = None,
+        deadline: Optional[Deadline] = None,
     ) -> dict:
         """
         Make an HTTP request with proper error handling.
@@ -153,13 +176,33 @@ class ProgramFetcher:
             method: HTTP method (GET, POST, etc.)
             endpoint: API endpoint path
             json_data: JSON payload for POST requests
+            deadline: Audit deadline capping the request timeout
         
         Returns:
             Response JSON
         
         Raises:
-            ProgramFetchError: If request fails
+            ProgramFetchError: If request fails or the deadline has passed
         """
+        timeout = self.config.request_timeout
+        if deadline is not None:
+            if deadline.expired:
+                raise ProgramFetchError(f"Deadline exceeded before {endpoint}")
+            timeout = deadline.cap(timeout)
+        return self.traffic.exchange(
+            "browser",
+            {"method": method, "endpoint": endpoint, "json": json_data},
+            lambda: self._send_request(method, endpoint, json_data, timeout),
+            error_type=ProgramFetchError,
+        )
+
+    def _send_request(
+        self,
+        method: str,
+        endpoint: str,
+        json_data: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> dict:
         url = f"{self.api_base}{endpoint}"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -172,7 +215,7 @@ class ProgramFetcher:
                 url=url,
                 headers=headers,
                 json=json_data,
-                timeout=self.config.request_timeout
+                timeout=timeout or self.config.request_timeout
             )
             response.raise_for_status()
             return response.json()
@@ -183,13 +226,14 @@ class ProgramFetcher:
         except json.JSONDecodeError as e:
             raise ProgramFetchError(f"Invalid JSON response: {e}")
     
-    def create_task(self, program_title: str, program_link: str) -> str:
+    def create_task(self, program_title: str, program_link: str, deadline: Optional[Deadline] = None) -> str:
         """
         Create a task and return task ID.
         
         Args:
             program_title: Title of the program
             program_link: URL to program page
+            deadline: Audit deadline, if any
         
         Returns:
             Task ID
@@ -208,7 +252,8 @@ class ProgramFetcher:
                     "prompt": prompt,
                     "mode": "text",
                     "stepLimit": self.config.step_limit
-                }
+                },
+                deadline=deadline,
             )
             
             task_id = data.get("taskId")
@@ -222,18 +267,19 @@ class ProgramFetcher:
             logger.error(f"Failed to create task for '{program_title}': {e}")
             raise
     
-    def verify_task_active(self, task_id: str) -> bool:
+    def verify_task_active(self, task_id: str, deadline: Optional[Deadline] = None) -> bool:
         """
         Verify that a task is in active status.
         
         Args:
             task_id: Task ID to verify
+            deadline: Audit deadline, if any
         
         Returns:
             True if task is active/running/queued/completed
         """
         try:
-            data = self._make_request("GET", f"/v1/task/{task_id}")
+            data = self._make_request("GET", f"/v1/task/{task_id}", deadline=deadline)
             state = data.get("state", "")
             
             valid_states = {s.value for s in TaskState}
@@ -250,21 +296,24 @@ class ProgramFetcher:
             logger.error(f"Failed to verify task {task_id}: {e}")
             return False
     
-    def poll_task(self, task_id: str) -> Optional[dict]:
+    def poll_task(self, task_id: str, deadline: Optional[Deadline] = None) -> Optional[dict]:
         """
         Poll task until completion or timeout.
         
         Args:
             task_id: Task ID to poll
+            deadline: Audit deadline; polling stops when it passes, even
+                before task_timeout
         
         Returns:
             Task data if completed, None if failed/timeout
         """
         start_time = time.time()
+        timeout = self.config.task_timeout if deadline is None else deadline.cap(self.config.task_timeout)
         
-        while time.time() - start_time < self.config.task_timeout:
+        while time.time() - start_time < timeout:
             try:
-                data = self._make_request("GET", f"/v1/task/{task_id}")
+                data = self._make_request("GET", f"/v1/task/{task_id}", deadline=deadline)
                 state = data.get("state")
                 
                 if state == TaskState.COMPLETED.value:
@@ -274,13 +323,13 @@ class ProgramFetcher:
                     logger.error(f"Task {task_id} failed")
                     return None
                 
-                time.sleep(self.config.poll_interval)
+                self.traffic.sleep(self.config.poll_interval)
                 
             except ProgramFetchError as e:
                 logger.error(f"Error polling task {task_id}: {e}")
-                time.sleep(self.config.poll_interval)
+                self.traffic.sleep(self.config.poll_interval)
         
-        logger.error(f"Task {task_id} timed out after {self.config.task_timeout}s")
+        logger.error(f"Task {task_id} timed out after {timeout:.0f}s")
         return None
     
     def parse_result(self, result_data: dict) -> Optional[Block]:
@@ -307,8 +356,8 @@ class ProgramFetcher:
             json_str = answer[start:end+1]
             parsed = json.loads(json_str)
             
-            # Validate and create Program object
-            program = Program(**parsed)
+            # Validate and create Block object
+            program = Block(**parsed)
             return program
             
         except (ValueError, json.JSONDecodeError, TypeError) as e:
@@ -357,17 +406,45 @@ class ProgramFetcher:
                 duration_seconds=duration
             )
     
+    @staticmethod
+    def cached_program(program_title: str) -> Optional[Block]:
+        """
+        A possibly stale Block for program_title without fetching: the last
+        one fetched in this process, else by any worker, else the bundled
+        catalog's.
+        """
+        with _last_fetched_lock:
+            program = _last_fetched.get(program_title)
+        if program is not None:
+            return program
+        shared = get_shared_cache()
+        data = shared.get(PROGRAMS, program_title) if shared is not None else None
+        program = _decode_program(data) if data is not None else None
+        if program is not None:
+            return program
+        try:
+            return CATALOG.get(program_title)
+        except ValueError:
+            return None
+
     def fetch_single_program(
         self,
         program_title: str,
-        attempt: int = 1
+        attempt: int = 1,
+        deadline: Optional[Deadline] = None,
     ) -> FetchResult:
         """
         Fetch and parse a single program with retry logic.
+
+        With a shared cache (see shared_cache.py), a program fetched by any
+        worker in the last config.shared_ttl seconds is returned without
+        fetching, and a fetch of the same title already running in another
+        worker is waited for instead of being repeated.
         
         Args:
             program_title: Title of program to fetch
             attempt: Current attempt number (for retry tracking)
+            deadline: Audit deadline; no request or retry starts after it
         
         Returns:
             FetchResult with success/failure status
@@ -375,8 +452,63 @@ class ProgramFetcher:
         # Debug mode path
         if self.config.debug_mode:
             return self._fetch_debug(program_title)
-        
-        # Normal API path
+
+        shared = get_shared_cache() if attempt == 1 else None
+        if shared is not None:
+            return self._fetch_shared(shared, program_title, deadline)
+        return self._fetch_remote(program_title, attempt, deadline)
+
+    def _fetch_shared(self, shared: SharedCache, program_title: str, deadline: Optional[Deadline]) -> FetchResult:
+        """fetch_single_program through the shared cache, holding its fill lease while fetching."""
+        start_time = time.time()
+        # Longest a fetch with all its retries can take
+        lease = self.config.task_timeout * (self.config.max_retries + 1)
+        while True:
+            data = shared.get(PROGRAMS, program_title, self.config.shared_ttl)
+            if data is None and not shared.claim(PROGRAMS, program_title, lease):
+                data = shared.wait(
+                    PROGRAMS,
+                    program_title,
+                    self.config.shared_ttl,
+                    timeout=deadline.remaining() if deadline is not None else None,
+                )
+                if data is None and deadline is not None and deadline.expired:
+                    return FetchResult(
+                        program_title=program_title,
+                        success=False,
+                        error="Deadline exceeded waiting for another worker's fetch",
+                        attempts=0,
+                        duration_seconds=time.time() - start_time
+                    )
+                if data is None:
+                    continue  # the other worker gave up; try to take over
+            if data is None:
+                break  # claimed: fetch it here
+            program = _decode_program(data)
+            if program is None:
+                shared.delete(PROGRAMS, program_title)
+                continue
+            logger.info(f"✓ '{program_title}' from the shared cache")
+            return FetchResult(
+                program_title=program_title,
+                success=True,
+                program=program,
+                attempts=0,
+                duration_seconds=time.time() - start_time
+            )
+
+        result = None
+        try:
+            result = self._fetch_remote(program_title, 1, deadline)
+        finally:
+            if result is not None and result.success:
+                shared.put(PROGRAMS, program_title, result.program.model_dump_json().encode("utf-8"))
+            else:
+                shared.release(PROGRAMS, program_title)
+        return result
+
+    def _fetch_remote(self, program_title: str, attempt: int, deadline: Optional[Deadline]) -> FetchResult:
+        """Fetch program_title from the browser agent API, retrying on failure."""
         start_time = time.time()
         program_link = self.PROGRAM_CATALOG.get(program_title)
         
@@ -390,13 +522,13 @@ class ProgramFetcher:
         
         try:
             # Create and verify task
-            task_id = self.create_task(program_title, program_link)
+            task_id = self.create_task(program_title, program_link, deadline)
             
-            if not self.verify_task_active(task_id):
+            if not self.verify_task_active(task_id, deadline):
                 raise ProgramFetchError(f"Task {task_id} not active")
             
             # Poll for results
-            result_data = self.poll_task(task_id)
+            result_data = self.poll_task(task_id, deadline)
             if not result_data:
                 raise ProgramFetchError("Task failed or timed out")
             
@@ -407,6 +539,8 @@ class ProgramFetcher:
             
             duration = time.time() - start_time
             logger.info(f"✓ Successfully fetched '{program_title}' in {duration:.1f}s")
+            with _last_fetched_lock:
+                _last_fetched[program_title] = program
             
             return FetchResult(
                 program_title=program_title,
@@ -420,11 +554,11 @@ class ProgramFetcher:
             duration = time.time() - start_time
             
             # Retry logic
-            if attempt <= self.config.max_retries:
+            if attempt <= self.config.max_retries and (deadline is None or not deadline.expired):
                 logger.warning(
                     f"Attempt {attempt} failed for '{program_title}': {e}. Retrying..."
                 )
-                return self.fetch_single_program(program_title, attempt + 1)
+                return self._fetch_remote(program_title, attempt + 1, deadline)
             
             logger.error(f"✗ Failed '{program_title}' after {attempt} attempts: {e}")
             return FetchResult(
@@ -0,0 +1,325 @@
+import os
+import time
+import math
+import asyncio
+from collections import deque
+from dataclasses import dataclass, asdict
+from threading import BoundedSemaphore, Lock
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+from common import *
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """raised when a call does not finish within its deadline"""
+    pass
+
+
+class CallPoolSaturated(RuntimeError):
+    """raised when every call thread is held by a running or abandoned call"""
+    pass
+
+
+class Deadline:
+    """
+    End-to-end time budget of one audit, as an absolute time.monotonic().
+
+    Passed down from the API to every stage (fetching, LLM calls), which cap
+    their own timeouts with remaining().
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cap(self, seconds: Optional[float]) -> float:
+        """seconds, or the time left if that is shorter (None means no limit)."""
+        remaining = self.remaining()
+        return remaining if seconds is None else min(seconds, remaining)
+
+
+@dataclass
+class HedgeConfig:
+    """
+    Configuration for hedged requests.
+
+    Attributes:
+        enabled: If True, a duplicate request is sent once the primary is slow (default: False)
+        percentile: Latency percentile (0-100) after which the hedge fires (default: 95)
+        min_samples: Recent latencies required before hedging kicks in (default: 10)
+        min_delay: Lower bound in seconds on the hedge delay (default: 5)
+        window: Number of recent latencies kept per model (default: 100)
+        deadline: Per-request deadline in seconds, None for no deadline (default: None)
+    """
+    enabled: bool = False
+    percentile: float = 95.0
+    min_samples: int = 10
+    min_delay: float = 5.0
+    window: int = 100
+    deadline: Optional[float] = None
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies for one model."""
+
+    def __init__(self, window: int = 100):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile of the window, None if it is empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(1, math.ceil(p / 100.0 * len(samples)))
+        return samples[min(rank, len(samples)) - 1]
+
+
+@dataclass
+class HedgeMetrics:
+    calls: int = 0
+    hedges_fired: int = 0
+    hedge_wins: int = 0
+    primary_wins: int = 0
+    deadlines_exceeded: int = 0
+    errors: int = 0
+    saturated: int = 0
+
+
+class _MetricsRegistry:
+    def __init__(self):
+        self._lock = Lock()
+        self._metrics = HedgeMetrics()
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            setattr(self._metrics, name, getattr(self._metrics, name) + value)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return asdict(self._metrics)
+
+    def reset(self):
+        with self._lock:
+            self._metrics = HedgeMetrics()
+
+
+HEDGE_METRICS = _MetricsRegistry()
+
+_trackers: Dict[str, LatencyTracker] = {}
+_trackers_lock = Lock()
+
+# Shared across agents so that abandoned (losing) calls do not pile up one
+# pool per audit. The sync SDK cannot interrupt an in-flight gRPC call, so a
+# losing request runs to completion in this pool and its result is dropped.
+# Abandoned calls can hold threads for as long as the client timeout, so a
+# call that finds no free thread fails at once (and a hedge is not sent)
+# instead of queuing behind them until its deadline passes unsent.
+_EXECUTOR_THREADS = int(os.getenv("LLM_CALL_THREADS", "32"))
+_executor = ThreadPoolExecutor(max_workers=_EXECUTOR_THREADS, thread_name_prefix="hedge")
+_free_threads = BoundedSemaphore(_EXECUTOR_THREADS)
+
+
+def _submit(fn: Callable[[], T]) -> Optional["Future[T]"]:
+    """fn running on a thread of _executor, None if every thread is taken."""
+    if not _free_threads.acquire(blocking=False):
+        return None
+    try:
+        future = _executor.submit(fn)
+    except BaseException:
+        _free_threads.release()
+        raise
+    future.add_done_callback(lambda _: _free_threads.release())
+    return future
+
+
+def get_latency_tracker(key: str, window: int = 100) -> LatencyTracker:
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = _trackers[key] = LatencyTracker(window)
+        return tracker
+
+
+class HedgedCaller:
+    """
+    Runs a blocking call with an optional hedge and an optional deadline.
+
+    If the call is still running after the configured latency percentile
+    of recent calls, an identical call is started and whichever succeeds
+    first wins. The other one is cancelled if it has not started yet and
+    otherwise abandoned.
+    """
+
+    def __init__(self, key: str, config: Optional[HedgeConfig] = None):
+        self.config = config or HedgeConfig()
+        self.tracker = get_latency_tracker(key, self.config.window)
+        self.logger = get_logger(__name__)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before firing a hedge, None if hedging is off."""
+        if not self.config.enabled or len(self.tracker) < self.config.min_samples:
+            return None
+        delay = self.tracker.percentile(self.config.percentile)
+        return max(delay, self.config.min_delay)
+
+    def call(self, fn: Callable[[], T], deadline: Optional[float] = None) -> T:
+        """
+        Run fn, hedging it if it is slow.
+
+        Args:
+            fn: Zero-argument callable performing the request
+            deadline: Seconds allowed for this call; overrides config.deadline
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            DeadlineExceeded: If no attempt finished within the deadline
+            CallPoolSaturated: If no call thread was free to run fn
+            Exception: Whatever fn raised, if every attempt failed
+        """
+        HEDGE_METRICS.incr("calls")
+        deadline = deadline if deadline is not None else self.config.deadline
+        delay = self.hedge_delay()
+
+        if delay is None and deadline is None:
+            try:
+                return self._timed(fn)
+            except Exception:
+                HEDGE_METRICS.incr("errors")
+                raise
+
+        start = time.monotonic()
+        expires = start + deadline if deadline is not None else None
+
+        def remaining() -> Optional[float]:
+            if expires is None:
+                return None
+            return max(0.0, expires - time.monotonic())
+
+        primary = _submit(lambda: self._timed(fn))
+        if primary is None:
+            HEDGE_METRICS.incr("saturated")
+            raise CallPoolSaturated(f"all {_EXECUTOR_THREADS} LLM call threads are busy")
+        pending = {primary}
+
+        if delay is not None:
+            first_wait = delay if expires is None else min(delay, remaining())
+            done, _ = wait(pending, timeout=first_wait)
+            if not done and (expires is None or remaining() > 0):
+                hedge = _submit(lambda: self._timed(fn))
+                if hedge is None:
+                    HEDGE_METRICS.incr("saturated")
+                    self.logger.warning(f"[Hedge] primary exceeded {delay:.1f}s, but no call thread is free to hedge")
+                else:
+                    HEDGE_METRICS.incr("hedges_fired")
+                    self.logger.info(f"[Hedge] primary exceeded {delay:.1f}s, sending hedge")
+                    pending.add(hedge)
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    HEDGE_METRICS.incr("primary_wins" if future is primary else "hedge_wins")
+                    self._cancel(pending)
+                    return future.result()
+                error = future.exception()
+
+        if pending:
+            self._cancel(pending)
+            HEDGE_METRICS.incr("deadlines_exceeded")
+            raise DeadlineExceeded(f"request exceeded its {deadline:.1f}s deadline")
+
+        HEDGE_METRICS.incr("errors")
+        raise error
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]], deadline: Optional[float] = None) -> T:
+        """
+        Async counterpart of call().
+
+        Unlike the threaded version, the losing attempt (and every attempt
+        once the deadline passes) is really cancelled.
+        """
+        HEDGE_METRICS.incr("calls")
+        deadline = deadline if deadline is not None else self.config.deadline
+        delay = self.hedge_delay()
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + deadline if deadline is not None else None
+
+        def remaining() -> Optional[float]:
+            if expires is None:
+                return None
+            return max(0.0, expires - loop.time())
+
+        primary = asyncio.ensure_future(self._timed_async(fn))
+        pending = {primary}
+        try:
+            if delay is not None:
+                first_wait = delay if expires is None else min(delay, remaining())
+                done, _ = await asyncio.wait(pending, timeout=first_wait)
+                if not done and (expires is None or remaining() > 0):
+                    HEDGE_METRICS.incr("hedges_fired")
+                    self.logger.info(f"[Hedge] primary exceeded {delay:.1f}s, sending hedge")
+                    pending.add(asyncio.ensure_future(self._timed_async(fn)))
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for future in done:
+                    if future.exception() is None:
+                        HEDGE_METRICS.incr("primary_wins" if future is primary else "hedge_wins")
+                        return future.result()
+                    error = future.exception()
+
+            if pending:
+                HEDGE_METRICS.incr("deadlines_exceeded")
+                raise DeadlineExceeded(f"request exceeded its {deadline:.1f}s deadline")
+
+            HEDGE_METRICS.incr("errors")
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _timed_async(self, fn: Callable[[], Awaitable[T]]) -> T:
+        start = time.monotonic()
+        result = await fn()
+        self.tracker.record(time.monotonic() - start)
+        return result
+
+    def _timed(self, fn: Callable[[], T]) -> T:
+        start = time.monotonic()
+        result = fn()
+        self.tracker.record(time.monotonic() - start)
+        return result
+
+    @staticmethod
+    def _cancel(futures):
+        for future in futures:
+            future.cancel()
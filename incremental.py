@@ -0,0 +1,386 @@
+"""
+Incremental re-audits.
+
+A finished audit is kept in the AuditStore under an audit id: the
+transcript snapshot, the program Blocks that were fetched and the reports.
+When the student edits a few courses, IncrementalPlan decides program by
+program whether the previous report still holds:
+
+- a program is re-run if a changed course can matter to it: the course (or
+  an honours equivalent) is listed in one of its blocks, it matches one of
+  its compiled selection rules, its previous report used it, or, for
+  blocks with prose the rule compiler does not understand, its subject
+  appears anywhere in the program;
+- because programs are audited in order and never reuse courses, a program
+  is also re-run if the courses taken by the programs before it changed in
+  a way that matters to it.
+
+Everything else is reused as is, and the program Blocks are reused too, so
+an incremental audit needs no fetch at all.
+
+With a shared cache (see shared_cache.py) audits are also written there, so
+an audit id or ETag handed out by one worker resolves in every worker.
+"""
+import os
+import re
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+from typing_extensions import TypedDict
+from pydantic import TypeAdapter
+from program import Block, _listed_courses
+from report import AgentBlockReport
+from rules import SUBJECT_NAMES, compile_block, uses_honours_equivalents, used_courses
+from course_db import get_course_db
+from transcript import CourseKey, CourseRecord, Transcript, TranscriptSnapshot, course_key
+from shared_cache import get_shared_cache
+from common import get_logger
+
+logger = get_logger(__name__)
+
+_SUBJECT_CODE = re.compile(r"\b([A-Z]{4})\b")
+
+
+@dataclass
+class AuditRecord:
+    """
+    A finished audit.
+
+    Attributes:
+        audit_id: Id handed to the client
+        snapshot: Transcript that was audited
+        programs: Program Blocks by the title they were fetched for
+        reports: Reports of the programs audited successfully, in audit order
+        titles: Program title of each report
+        etag: ETag the reports were served with, if any
+        created: time.monotonic() at which it was stored
+    """
+    audit_id: str
+    snapshot: TranscriptSnapshot
+    programs: Dict[str, Block]
+    reports: List[AgentBlockReport]
+    titles: List[str]
+    etag: Optional[str] = None
+    created: float = field(default_factory=time.monotonic)
+
+
+# Shared cache namespaces: encoded AuditRecords by audit id, audit ids by ETag
+AUDITS = "audits"
+AUDIT_ETAGS = "audit_etags"
+
+
+class _StoredAudit(TypedDict):
+    program_titles: List[str]
+    courses: List[Tuple[str, Any, Optional[int], Optional[str], str, int]]
+    programs: Dict[str, Block]
+    reports: List[AgentBlockReport]
+    titles: List[str]
+    etag: Optional[str]
+    # time.time() at which it was stored
+    stored: float
+
+
+_STORED_AUDIT = TypeAdapter(_StoredAudit)
+
+
+def encode_record(record: AuditRecord) -> bytes:
+    return _STORED_AUDIT.dump_json({
+        "program_titles": list(record.snapshot.program_titles),
+        "courses": [tuple(course) for course in record.snapshot.courses],
+        "programs": record.programs,
+        "reports": record.reports,
+        "titles": record.titles,
+        "etag": record.etag,
+        "stored": time.time() - (time.monotonic() - record.created),
+    })
+
+
+def decode_record(audit_id: str, data: bytes) -> AuditRecord:
+    stored = _STORED_AUDIT.validate_json(data)
+    snapshot = TranscriptSnapshot(
+        tuple(CourseRecord(*course) for course in stored["courses"]), tuple(stored["program_titles"])
+    )
+    return AuditRecord(
+        audit_id,
+        snapshot,
+        stored["programs"],
+        stored["reports"],
+        stored["titles"],
+        stored["etag"],
+        created=time.monotonic() - (time.time() - stored["stored"]),
+    )
+
+
+class AuditStore:
+    """
+    In-memory LRU of recent audits, per process, by audit id and by ETag,
+    written through to the shared cache when there is one.
+
+    The shared cache is SQLite and may wait on other workers' writes, so it
+    is kept off the event loop: writes go through one background thread
+    (an audit reaches other workers shortly after it is stored here), and
+    get_async()/find_async() only leave the loop on a local miss.
+    """
+
+    # Writes queued for the shared cache beyond which new ones are dropped
+    MAX_PENDING_WRITES = 1000
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._records: "OrderedDict[str, AuditRecord]" = OrderedDict()
+        self._etags: Dict[str, str] = {}
+        self._lock = Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audit-store")
+        self._pending = 0
+
+    def put(
+        self,
+        snapshot: TranscriptSnapshot,
+        programs: Dict[str, Block],
+        reports: Sequence[AgentBlockReport],
+        titles: Sequence[str],
+        etag: Optional[str] = None,
+    ) -> str:
+        record = AuditRecord(uuid.uuid4().hex, snapshot, dict(programs), list(reports), list(titles), etag)
+        self._add(record)
+        if get_shared_cache() is not None:
+            with self._lock:
+                full = self._pending >= self.MAX_PENDING_WRITES
+                if not full:
+                    self._pending += 1
+            if full:
+                logger.warning(f"[AuditStore] shared cache writes backed up, keeping {record.audit_id} local")
+            else:
+                self._writer.submit(self._put_shared, record)
+        return record.audit_id
+
+    def _put_shared(self, record: AuditRecord):
+        try:
+            shared = get_shared_cache()
+            shared.put(AUDITS, record.audit_id, encode_record(record))
+            if record.etag is not None:
+                shared.put(AUDIT_ETAGS, record.etag, record.audit_id.encode("utf-8"))
+        except Exception:
+            logger.exception(f"[AuditStore] could not share audit {record.audit_id}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _add(self, record: AuditRecord):
+        with self._lock:
+            self._records[record.audit_id] = record
+            if record.etag is not None:
+                self._etags[record.etag] = record.audit_id
+            while len(self._records) > self.max_entries:
+                self._drop(next(iter(self._records)))
+
+    def _drop(self, audit_id: str):
+        record = self._records.pop(audit_id)
+        if record.etag is not None and self._etags.get(record.etag) == audit_id:
+            del self._etags[record.etag]
+
+    def _get_local(self, audit_id: str) -> Optional[AuditRecord]:
+        with self._lock:
+            record = self._records.get(audit_id)
+            if record is None:
+                return None
+            if time.monotonic() - record.created > self.ttl:
+                self._drop(audit_id)
+                return None
+            self._records.move_to_end(audit_id)
+            return record
+
+    def get(self, audit_id: str) -> Optional[AuditRecord]:
+        return self._get_local(audit_id) or self._get_shared(audit_id)
+
+    async def get_async(self, audit_id: str) -> Optional[AuditRecord]:
+        """get() for the event loop: the shared cache is read on a thread."""
+        record = self._get_local(audit_id)
+        if record is None and get_shared_cache() is not None:
+            record = await asyncio.to_thread(self._get_shared, audit_id)
+        return record
+
+    def _get_shared(self, audit_id: str) -> Optional[AuditRecord]:
+        """An audit stored by another worker, copied into this one."""
+        shared = get_shared_cache()
+        data = shared.get(AUDITS, audit_id, self.ttl) if shared is not None else None
+        if data is None:
+            return None
+        try:
+            record = decode_record(audit_id, data)
+        except ValueError as e:
+            logger.warning(f"[AuditStore] dropping unreadable shared audit {audit_id}: {e}")
+            shared.delete(AUDITS, audit_id)
+            return None
+        self._add(record)
+        return record
+
+    def _find_local(self, etag: str) -> Optional[AuditRecord]:
+        with self._lock:
+            audit_id = self._etags.get(etag)
+        return self._get_local(audit_id) if audit_id is not None else None
+
+    def _find_shared(self, etag: str) -> Optional[AuditRecord]:
+        shared = get_shared_cache()
+        data = shared.get(AUDIT_ETAGS, etag, self.ttl) if shared is not None else None
+        return self.get(data.decode("utf-8")) if data is not None else None
+
+    def find(self, etag: str) -> Optional[AuditRecord]:
+        """The latest audit served with etag."""
+        return self._find_local(etag) or self._find_shared(etag)
+
+    async def find_async(self, etag: str) -> Optional[AuditRecord]:
+        """find() for the event loop: the shared cache is read on a thread."""
+        record = self._find_local(etag)
+        if record is None and get_shared_cache() is not None:
+            record = await asyncio.to_thread(self._find_shared, etag)
+        return record
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+_store: Optional[AuditStore] = None
+_store_lock = Lock()
+
+
+def get_audit_store() -> AuditStore:
+    """Process-wide store sized by AUDIT_STORE_SIZE (default: 1000) and AUDIT_STORE_TTL seconds (default: 3600)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AuditStore(
+                max_entries=int(os.getenv("AUDIT_STORE_SIZE", "1000")),
+                ttl=float(os.getenv("AUDIT_STORE_TTL", "3600")),
+            )
+        return _store
+
+
+def apply_diff(
+    snapshot: TranscriptSnapshot,
+    added: Iterable[CourseRecord] = (),
+    removed: Iterable[CourseKey] = (),
+    changed: Iterable[CourseRecord] = (),
+) -> Transcript:
+    """
+    A Transcript equal to snapshot with the diff applied.
+
+    Changed courses replace the existing record (grade and credit, keeping
+    its title and attempts), added courses go through Transcript.add_course
+    (so retakes behave as usual) and removed courses are dropped.
+    """
+    removed = {course_key(*key) for key in removed}
+    replaced = {record.key: record for record in changed}
+    transcript = Transcript()
+    for title in snapshot.get_program_titles():
+        transcript.add_program(title)
+    for record in snapshot:
+        if record.key in removed:
+            continue
+        new = replaced.pop(record.key, record)
+        transcript.add_course(record.subject_code, record.course_code, new.grade, new.credit)
+        course = transcript.get_course(record.subject_code, record.course_code)
+        course.title, course.attempts = record.title, record.attempts
+    for record in list(added) + list(replaced.values()):
+        transcript.add_course(record.subject_code, record.course_code, record.grade, record.credit)
+    transcript.changed()
+    return transcript
+
+
+def changed_courses(old: TranscriptSnapshot, new: TranscriptSnapshot) -> Set[CourseKey]:
+    """Keys of courses added, removed, or with a different grade or credit."""
+    before = {record.key: (record.grade, record.credit) for record in old}
+    after = {record.key: (record.grade, record.credit) for record in new}
+    return {key for key in before.keys() | after.keys() if before.get(key) != after.get(key)}
+
+
+def _program_subjects(program: Block) -> FrozenSet[str]:
+    """Subjects a program's prose could be talking about."""
+    subjects: Set[str] = set()
+
+    def walk(block: Block):
+        subjects.update(key[0] for key in _listed_courses(block.courses))
+        for detail in block.details:
+            subjects.update(_SUBJECT_CODE.findall(detail))
+            lowered = detail.lower()
+            subjects.update(code for name, code in SUBJECT_NAMES.items() if name in lowered)
+        for child in block.blocks:
+            walk(child)
+
+    walk(program)
+    return frozenset(subjects)
+
+
+def program_affected(program: Block, keys: Set[CourseKey], previous: Optional[AgentBlockReport] = None) -> bool:
+    """True if a change to any of keys could change program's report."""
+    if not keys:
+        return False
+    if previous is not None and not keys.isdisjoint(used_courses([previous])):
+        return True
+    if uses_honours_equivalents(program):
+        db = get_course_db()
+        keys = {equivalent for key in keys for equivalent in db.equivalents(*key)}
+    subjects = None
+
+    def walk(block: Block) -> bool:
+        nonlocal subjects
+        if not keys.isdisjoint(set(_listed_courses(block.courses))):
+            return True
+        rules = compile_block(block)
+        if any(rules.selects(*key) for key in keys):
+            return True
+        if not rules.complete:
+            if subjects is None:
+                subjects = _program_subjects(program)
+            if any(key[0] in subjects for key in keys):
+                return True
+        return any(walk(child) for child in block.blocks)
+
+    return walk(program)
+
+
+class IncrementalPlan:
+    """
+    Decides, while an audit runs, which previous reports can be reused.
+
+    Args:
+        previous: Reports of the previous audit, in audit order
+        changed: Course keys that differ between the two transcripts
+        titles: Program title of each previous report (default: the
+            reports' names)
+    """
+
+    def __init__(
+        self,
+        previous: Sequence[AgentBlockReport],
+        changed: Set[CourseKey],
+        titles: Optional[Sequence[str]] = None,
+    ):
+        self.previous = list(previous)
+        self.changed = set(changed)
+        titles = list(titles) if titles is not None else [report.name for report in self.previous]
+        self._index = {title: i for i, title in enumerate(titles)}
+        self.reused: List[str] = []
+        self.recomputed: List[str] = []
+
+    def reuse(
+        self, title: str, program: Block, reports_so_far: Sequence[AgentBlockReport]
+    ) -> Optional[AgentBlockReport]:
+        """The previous report for the program audited for title if it still holds, else None."""
+        i = self._index.get(title)
+        if i is None:
+            self.recomputed.append(title)
+            return None
+        # Courses taken by earlier programs, before and now
+        drift = used_courses(self.previous[:i]) ^ used_courses(reports_so_far)
+        if program_affected(program, self.changed | drift, self.previous[i]):
+            self.recomputed.append(title)
+            return None
+        self.reused.append(title)
+        return self.previous[i]
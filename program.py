@@ -1,358 +1,17 @@
+import os
+import re
+import copy
+import json
+import hashlib
+from threading import Lock
 from dataclasses import dataclass, field, asdict
-from typing import List, Iterator, Optional, Literal, Dict, Tuple
+from typing import List, Iterator, Iterable, Optional, Literal, Dict, Tuple
 from enum import Enum
-from pydantic import BaseModel, ValidationError, Field
-
-PROGRAMS = [
-  {
-  "minimum_credit": 36,
-  "block_type": "PROGRAM",
-  "name": "Computer Science Major Concentration (B.A.)",
-  "details": [],
-  "courses":[],
-  "blocks": [
-    {
-      "name": "Required Courses",
-      "minimum_credit": 18,
-      "block_type": "REQUIRED",
-      "details": [
-        "Students who have sufficient knowledge in programming do not need to take COMP 202 Foundations of Programming and should replace it with an additional course from the complementary block."
-      ],
-      "courses":[('COMP','202','3'),('COMP','206','3'),('COMP','250','3'),('COMP','251','3'),('COMP','273','3'),('MATH','240','3')],
-      "blocks": []
-    },
-    {
-      "name": "Complementary Courses",
-      "minimum_credit": 18,
-      "block_type": "COMPLEMENTARY",
-      "details": [
-        "18 credits selected as follows: 3 credits from each of the groups A, B, C, and D.",
-        "An additional 3 credits may be selected from Group A or B.",
-        "The remaining complementary credits must be selected from COMP 230 Logic and Computability and COMP courses at the 300 level or above (except COMP 396 Undergraduate Research Project)."
-      ],
-      "courses": [],
-      "blocks": [
-        {
-          "name": "Group A",
-          "minimum_credit": 3,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [('MATH', '222','3'),('MATH', '323','3'),('MATH', '324','3')],
-          "blocks": []
-        },
-        {
-          "name": "Group B",
-          "minimum_credit": 3,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [('MATH', '223','3'),('MATH', '318','3'),('MATH', '340','3')],
-          "blocks": []
-        },
-        {
-          "name": "Group C",
-          "minimum_credit": 3,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [('COMP', '330','3'),('COMP', '350','3'),('COMP', '360','3')],
-          "blocks": []
-        },
-        {
-          "name": "Group D",
-          "minimum_credit": 3,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [('COMP', '302','3'),('COMP', '303','3')],
-          "blocks": []
-        }
-      ]
-    }
-  ]
-},
-{
-  "minimum_credit": 36,
-  "block_type": "PROGRAM",
-  "name": "Sociology - Major Concentration (B.A.)",
-  "details": [
-    "Offered by: Sociology (Faculty of Arts)",
-    "Degree: Bachelor of Arts; Bachelor of Arts and Science",
-    "Program credit weight: 36"
-  ],
-  "description": "The purpose of the Major Concentration in Sociology is to give the student a comprehensive understanding of the field of sociology.",
-  "degree": "Bachelor of Arts",
-  "faculty": "Faculty of Arts",
-  "department": "Sociology",
-  "blocks": [
-    {
-      "name": "Required Courses",
-      "minimum_credit": 12,
-      "block_type": "REQUIRED",
-      "details": [
-          "Students may replace SOCI 350 with another 300-level or higher sociology course."
-      ],
-      "courses": [
-        ["SOCI", "210"],
-        ["SOCI", "211"],
-        ["SOCI", "330"],
-        ["SOCI", "350"]
-      ],
-      "blocks": []
-    },
-    {
-      "name": "Complementary Courses",
-      "minimum_credit": 24,
-      "block_type": "COMPLEMENTARY",
-      "details": [
-        "3 credits minimum at the 400 level or higher.",
-        "9 credits maximum at the 200 level.",
-        "No more than 6 credits of the current problems, independent study and/or reading courses may count toward the Major concentration."
-      ],
-      "courses": [
-        ["SOCI", "341"],
-        ["SOCI", "342"],
-        ["SOCI", "343"],
-        ["SOCI", "441"],
-        ["SOCI", "442"],
-        ["SOCI", "443"]
-      ],
-      "blocks": [
-        {
-          "name": "Institutions, Deviance, and Culture",
-          "minimum_credit": 0,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [
-            ["SOCI", "213"],
-            ["SOCI", "225"],
-            ["SOCI", "247"],
-            ["SOCI", "250"],
-            ["SOCI", "305"],
-            ["SOCI", "309"],
-            ["SOCI", "310"],
-            ["SOCI", "318"],
-            ["SOCI", "322"],
-            ["SOCI", "325"],
-            ["SOCI", "388"],
-            ["SOCI", "430"],
-            ["SOCI", "488"],
-            ["SOCI", "489"],
-            ["SOCI", "495"],
-            ["SOCI", "503"],
-            ["SOCI", "515"],
-            ["SOCI", "525"],
-            ["SOCI", "535"],
-            ["SOCI", "538"],
-            ["SOCI", "571"],
-            ["SOCI", "595"]
-          ],
-          "blocks": []
-        },
-        {
-          "name": "Politics and Social Change",
-          "minimum_credit": 0,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [
-            ["SOCI", "212"],
-            ["SOCI", "222"],
-            ["SOCI", "234"],
-            ["SOCI", "245"],
-            ["SOCI", "254"],
-            ["SOCI", "255"],
-            ["SOCI", "307"],
-            ["SOCI", "326"],
-            ["SOCI", "345"],
-            ["SOCI", "354"],
-            ["SOCI", "365"],
-            ["SOCI", "370"],
-            ["SOCI", "386"],
-            ["SOCI", "400"],
-            ["SOCI", "424"],
-            ["SOCI", "430"],
-            ["SOCI", "446"],
-            ["SOCI", "455"],
-            ["SOCI", "484"],
-            ["SOCI", "495"],
-            ["SOCI", "507"],
-            ["SOCI", "519"],
-            ["SOCI", "545"],
-            ["SOCI", "550"],
-            ["SOCI", "595"]
-          ],
-          "blocks": []
-        },
-        {
-          "name": "Social Stratification: Class, Ethnicity, and Gender",
-          "minimum_credit": 0,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [
-            ["SOCI", "227"],
-            ["SOCI", "230"],
-            ["SOCI", "255"],
-            ["SOCI", "270"],
-            ["SOCI", "300"],
-            ["SOCI", "321"],
-            ["SOCI", "333"],
-            ["SOCI", "335"],
-            ["SOCI", "355"],
-            ["SOCI", "366"],
-            ["SOCI", "375"],
-            ["SOCI", "410"],
-            ["SOCI", "415"],
-            ["SOCI", "430"],
-            ["SOCI", "475"],
-            ["SOCI", "505"],
-            ["SOCI", "520"],
-            ["SOCI", "526"],
-            ["SOCI", "530"],
-            ["SOCI", "595"]
-          ],
-          "blocks": []
-        },
-        {
-          "name": "Work, Organizations, and the Economy",
-          "minimum_credit": 0,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [
-            ["SOCI", "235"],
-            ["SOCI", "301"],
-            ["SOCI", "304"],
-            ["SOCI", "312"],
-            ["SOCI", "325"],
-            ["SOCI", "420"],
-            ["SOCI", "470"]
-          ],
-          "blocks": []
-        }
-      ]
-    }
-  ]
-},
-{
-  "minimum_credit": 46,
-  "block_type": "PROGRAM",
-  "name": "Mathematics - Major Concentration (B.A. & Sc.)",
-  "details": ["An honours equivalent of a course can also be used to fulfill requirements instead of the originally listed selections."],
-  "description": "The B.A.; Major Concentration in Mathematics aims to provide an overview of the foundations of mathematics.",
-  "degree": "Bachelor of Arts and Science",
-  "faculty": "Faculty of Science",
-  "department": "Mathematics and Statistics",
-  "blocks": [
-    {
-      "name": "Required Courses",
-      "minimum_credit": 28,
-      "block_type": "REQUIRED",
-      "details": [],
-      "courses":"(('MATH','133') AND ('MATH','140') AND ('MATH','141') AND ('MATH','222') AND ('MATH','235') AND ('MATH','236') AND ('MATH','242') AND ('MATH','243') AND (('MATH','323') OR ('MATH','356')))",
-      "blocks": []
-    },
-    {
-      "name": "Complementary Courses",
-      "minimum_credit": 18,
-      "block_type": "COMPLEMENTARY",
-      "details": [
-        "9-18 credits selected from Group A.",
-        "0-3 credits selected from Group B.",
-        "0-9 credits selected from Group C.",
-        "Either MATH 249 or MATH 316 may be taken, but not both."
-      ],
-      "courses": [],
-      "blocks": [
-        {
-          "name": "Group A",
-          "minimum_credit": 9,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [
-            ["MATH", "249"],
-            ["MATH", "314"],
-            ["MATH", "315"],
-            ["MATH", "316"],
-            ["MATH", "317"],
-            ["MATH", "318"],
-            ["MATH", "324"],
-            ["MATH", "340"],
-            ["MATH", "346"],
-            ["MATH", "378"],
-            ["MATH", "417"],
-            ["MATH", "451"]
-          ],
-          "blocks": []
-        },
-        {
-          "name": "Group B",
-          "minimum_credit": 0,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [
-            ["MATH", "329"],
-            ["MATH", "338"]
-          ],
-          "blocks": []
-        },
-        {
-          "name": "Group C",
-          "minimum_credit": 0,
-          "block_type": "CUSTOM",
-          "details": [],
-          "courses": [
-            ["MATH", "208"],
-            ["MATH", "308"],
-            ["MATH", "319"],
-            ["MATH", "326"],
-            ["MATH", "327"],
-            ["MATH", "335"],
-            ["MATH", "348"],
-            ["MATH", "352"],
-            ["MATH", "410"],
-            ["MATH", "420"],
-            ["MATH", "423"],
-            ["MATH", "427"],
-            ["MATH", "430"],
-            ["MATH", "447"],
-            ["MATH", "463"],
-            ["MATH", "478"]
-          ],
-          "blocks": []
-        }
-      ]
-    }
-  ]
-},
-{
-  "minimum_credit": 36,
-  "block_type": "PROGRAM",
-  "name": "Economics Major Concentration (B.A.)",
-  "details": [],
-  "courses":[],
-  "blocks": [
-    {
-      "name": "Required Courses",
-      "minimum_credit": 18,
-      "block_type": "REQUIRED",
-      "details": [
-        "All students must take 6 credits of approved statistics courses.",
-        "Students who have completed (MATH 203 and 204) or  (MATH 323 and MATH 324) or (MGCR 271 and MGSC 372), do not have to complete ECON 227D1 and ECON 227D2. They will be exempted. (a) If the students do not count the credits for the above Math, Management or other equivalent statistics courses as part of another program, the six credits for these courses will count towards their program requirements in economics. [That is, they will not have to substitute for them 6 credits in other economics courses]. (b) If the students count the credits for the above Math, Management or other equivalent statistics courses as part of another program, they will need to replace their corresponding number of credits with other economics courses above ECON '210' to fulfill the economics program requirements."
-      ],
-      "courses" : [('ECON','227D1','3'),('ECON','227D2','3'),('ECON','230D1','3'),('ECON','230D2','3'),('ECON','332','3'),('ECON','333','3')],
-      "blocks": []
-    },
-    {
-      "name": "Complementary Courses",
-      "minimum_credit": 18,
-      "block_type": "COMPLEMENTARY",
-      "details": [
-        "18 credits in Economics selected from other 200- (with numbers above 209), 300-, 400- and 500-level courses.",
-        "At least 6 of these credits must be in 400- or 500-level courses.",
-        "No more than 6 credits may be at the 200 level."
-      ],
-      "courses": [],
-      "blocks": []
-    }
-  ]
-}
-]
+from pydantic import BaseModel, ValidationError, Field, ConfigDict
+from dotenv import load_dotenv
+from transcript import CourseKey, course_key
+
+load_dotenv()
 
 class BlockType(Enum):
     PROGRAM="PROGRAM"
@@ -368,6 +27,8 @@ class Block(BaseModel):
     REQUIRED or COMPLEMENTARY or both blocks. A COMPLEMENTARY Block further can have one or 
     more CUSTOM blocks.
     """
+    model_config = ConfigDict(frozen=True)
+
     name: str
     minimum_credit: int = Field(description="minimum credit requirments for this block. Should be 0 for CUSTOM blocks" )
     block_type: BlockType
@@ -394,27 +55,213 @@ class Block(BaseModel):
         return result
 
 
-'''
-used for testing agent. so that we do not have to use the browser agent again and again
-'''
-def get_program(program_name: str) -> Optional[Block]:
-    for program in PROGRAMS:
-        if program.get("name") == program_name:
-            program["block_type"] = BlockType(program["block_type"])
+@dataclass(frozen=True)
+class BlockRef:
+    """Location of a block inside a program: the program name and the names on the path to it."""
+    program: str
+    path: Tuple[str, ...]
 
-            def convert_block(data: dict) -> Block:
-                data = data.copy()
-                data["block_type"] = BlockType(data["block_type"])
-                data["blocks"] = [convert_block(b) for b in data.get("blocks", [])]
+    @property
+    def block_name(self) -> str:
+        return self.path[-1] if self.path else self.program
 
-                return Block(**data)
 
-            return convert_block(program)
+@dataclass(frozen=True)
+class CatalogEntry:
+    name: str
+    version: str
+    data: dict = field(repr=False, compare=False)
 
-    raise ValueError("Program not found")  
 
+_COURSE_PATTERN = re.compile(r"\(\s*'([A-Z]{3,4})'\s*,\s*'(\w+)'")
 
 
-# program = get_program("Computer Science Major Concentration (B.A.)")
-# print(program.to_dict())
+def _listed_courses(courses) -> Iterator[CourseKey]:
+    """Course keys listed by a block, whether as tuples or as a boolean expression string."""
+    if isinstance(courses, str):
+        for subject, code in _COURSE_PATTERN.findall(courses):
+            yield course_key(subject, code)
+        return
+    for course in courses or []:
+        if isinstance(course, (list, tuple)) and len(course) >= 2:
+            yield course_key(course[0], course[1])
+
+
+class ProgramCatalog:
+    """
+    Indexed catalog of programs.
+
+    Programs are looked up by name in O(1). Each name can hold several
+    versions (the latest added is current); the version defaults to a hash of
+    the program's content. Block trees are validated once per version and the
+    same frozen Block is returned to every caller. An inverted index maps
+    (subject_code, course_code) to every block that lists the course.
+
+    A catalog can sit on top of a compiled catalog file (see from_file);
+    programs in the file are decoded the first time they are asked for and
+    programs added later take precedence over them.
+    """
+
+    def __init__(self, programs: Iterable[dict] = (), source: Optional["CompiledCatalog"] = None):
+        self._lock = Lock()
+        self._entries: Dict[str, List[CatalogEntry]] = {}
+        self._blocks: Dict[Tuple[str, str], Block] = {}
+        self._course_index: Dict[CourseKey, List[BlockRef]] = {}
+        self._source = source
+        self._added = set()
+        for program in programs:
+            self.add(program)
+
+    @classmethod
+    def from_file(cls, path: str) -> "ProgramCatalog":
+        """Catalog backed by a memory-mapped compiled catalog file."""
+        from catalog_file import CompiledCatalog
+        return cls(source=CompiledCatalog(path))
+
+    @staticmethod
+    def content_version(data: dict) -> str:
+        canonical = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+
+    def add(self, program: dict, version: Optional[str] = None) -> CatalogEntry:
+        """
+        Add a program (as raw catalog data) and make it the current version.
+
+        Args:
+            program: Program dict in the Block schema
+            version: Version label (default: content hash)
+
+        Returns:
+            The new CatalogEntry
+        """
+        data = copy.deepcopy(program)
+        name = data["name"]
+        entry = CatalogEntry(name, version or self.content_version(data), data)
+        with self._lock:
+            previous = self._entries.get(name)
+            if previous:
+                self._unindex(previous[-1])
+            self._entries.setdefault(name, []).append(entry)
+            self._added.add(name)
+            self._index(entry)
+        return entry
+
+    def _index(self, entry: CatalogEntry):
+        def walk(block: dict, path: Tuple[str, ...]):
+            ref = BlockRef(entry.name, path)
+            for key in _listed_courses(block.get("courses")):
+                refs = self._course_index.setdefault(key, [])
+                if ref not in refs:
+                    refs.append(ref)
+            for child in block.get("blocks", []) or []:
+                walk(child, path + (child.get("name", ""),))
+
+        walk(entry.data, ())
+
+    def _unindex(self, entry: CatalogEntry):
+        for key in list(self._course_index):
+            refs = [ref for ref in self._course_index[key] if ref.program != entry.name]
+            if refs:
+                self._course_index[key] = refs
+            else:
+                del self._course_index[key]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries or (self._source is not None and name in self._source)
+
+    def __len__(self) -> int:
+        return len(self.names())
 
+    def names(self) -> List[str]:
+        names = dict.fromkeys(self._source.names()) if self._source is not None else {}
+        names.update(dict.fromkeys(self._entries))
+        return list(names)
+
+    def _load(self, name: str) -> Optional[List[CatalogEntry]]:
+        """Decode a program from the compiled file into an entry."""
+        if self._source is None or name not in self._source:
+            return None
+        entry = CatalogEntry(name, self._source.version(name), self._source.raw(name))
+        with self._lock:
+            return self._entries.setdefault(name, [entry])
+
+    def entry(self, name: str, version: Optional[str] = None) -> CatalogEntry:
+        entries = self._entries.get(name) or self._load(name)
+        if not entries:
+            raise ValueError("Program not found")
+        if version is None:
+            return entries[-1]
+        for entry in entries:
+            if entry.version == version:
+                return entry
+        raise ValueError(f"Program version not found: {name}@{version}")
+
+    def version(self, name: str) -> str:
+        """Current version label of a program."""
+        return self.entry(name).version
+
+    def versions(self, name: str) -> List[str]:
+        return [entry.version for entry in self._entries.get(name) or self._load(name) or []]
+
+    def get(self, name: str, version: Optional[str] = None) -> Block:
+        """
+        Return the (shared, frozen) Block for a program.
+
+        Raises:
+            ValueError: If the program or version is unknown, or its data is not a valid Block
+        """
+        entry = self.entry(name, version)
+        cache_key = (entry.name, entry.version)
+        block = self._blocks.get(cache_key)
+        if block is None:
+            block = Block.model_validate(entry.data)
+            with self._lock:
+                block = self._blocks.setdefault(cache_key, block)
+        return block
+
+    def blocks_for_course(self, subject_code: str, course_code) -> List[BlockRef]:
+        """Every block (in every current program) that lists the course."""
+        key = course_key(subject_code, course_code)
+        refs = list(self._course_index.get(key, ()))
+        if self._source is not None:
+            refs += [
+                BlockRef(program, path)
+                for program, path in self._source.course_refs(key)
+                if program not in self._added
+            ]
+        return refs
+
+    def programs_for_course(self, subject_code: str, course_code) -> List[str]:
+        return list(dict.fromkeys(ref.program for ref in self.blocks_for_course(subject_code, course_code)))
+
+    def is_listed(self, subject_code: str, course_code, program: Optional[str] = None) -> bool:
+        """True if the course is listed by name in any block (of program, if given)."""
+        refs = self.blocks_for_course(subject_code, course_code)
+        return any(program is None or ref.program == program for ref in refs)
+
+
+def load_catalog() -> ProgramCatalog:
+    """
+    The process-wide catalog: the compiled file named by PROGRAM_CATALOG_FILE
+    if set, otherwise the programs bundled in program_data.py.
+    """
+    path = os.getenv("PROGRAM_CATALOG_FILE")
+    if path:
+        return ProgramCatalog.from_file(path)
+    from program_data import PROGRAMS
+    return ProgramCatalog(PROGRAMS)
+
+
+CATALOG = load_catalog()
+
+
+'''
+used for testing agent. so that we do not have to use the browser agent again and again
+'''
+def get_program(program_name: str) -> Optional[Block]:
+    return CATALOG.get(program_name)
+
+
+
+# program = get_program("Computer Science Major Concentration (B.A.)")
+# print(program.to_dict())
\ No newline at end of file
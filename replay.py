@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import defaultdict
+from threading import Lock
+from typing import Awaitable, Callable, Dict, List, Optional, Type
+from common import *
+
+
+class ReplayMiss(Exception):
+    """raised in replay mode when no fixture matches a request"""
+    pass
+
+
+class ReplayedError(Exception):
+    """an error that was recorded and is being replayed"""
+    pass
+
+
+def request_key(request: dict) -> str:
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class TrafficStore:
+    """
+    Records external exchanges to fixture files and serves them back.
+
+    Each channel ("llm", "browser") is a directory of JSONL files, one per
+    request key, holding the exchanges for that request in the order they
+    happened. Replay serves them back in the same order, repeating the last
+    one once a key is exhausted (e.g. the final "completed" poll of a task).
+
+    Modes:
+        off: exchanges go straight to perform()
+        record: perform() is called and its result appended to the fixtures
+        replay: fixtures are served, perform() is never called
+    """
+
+    def __init__(self, path: str, mode: str = "off", latency_scale: float = 1.0):
+        if mode not in ("off", "record", "replay"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.logger = get_logger(__name__)
+        self._lock = Lock()
+        self._fixtures: Dict[str, List[dict]] = {}
+        self._cursors: Dict[str, int] = defaultdict(int)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _file(self, channel: str, key: str) -> str:
+        return os.path.join(self.path, channel, f"{key}.jsonl")
+
+    def _load(self, channel: str, key: str) -> List[dict]:
+        cache_key = f"{channel}/{key}"
+        if cache_key not in self._fixtures:
+            file = self._file(channel, key)
+            if not os.path.exists(file):
+                raise ReplayMiss(f"No {channel} fixture for request {key[:12]}")
+            with open(file, "r", encoding="utf-8") as f:
+                self._fixtures[cache_key] = [json.loads(line) for line in f if line.strip()]
+        return self._fixtures[cache_key]
+
+    def sleep(self, seconds: float):
+        """Sleep for seconds, scaled by latency_scale while replaying."""
+        if self.replaying:
+            seconds *= self.latency_scale
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def exchange(
+        self,
+        channel: str,
+        request: dict,
+        perform: Callable[[], dict],
+        error_type: Type[Exception] = ReplayedError,
+    ) -> dict:
+        """
+        Run one request/response exchange through the store.
+
+        Args:
+            channel: Fixture channel, e.g. "llm" or "browser"
+            request: JSON-serialisable description of the request (used as key)
+            perform: Callable making the real request and returning a JSON-serialisable dict
+            error_type: Exception raised when a recorded failure is replayed
+
+        Returns:
+            The response dict
+        """
+        if self.mode == "off":
+            return perform()
+
+        key = request_key(request)
+
+        if self.replaying:
+            entry = self._next(channel, key)
+            self.sleep(entry.get("latency", 0.0))
+            return self._response(entry, error_type)
+
+        start = time.monotonic()
+        # Stays None if perform() is interrupted (KeyboardInterrupt, ...):
+        # there is no outcome to record, and the interruption propagates
+        entry = None
+        try:
+            response = perform()
+            entry = {"request": request, "response": response}
+        except Exception as e:
+            entry = {"request": request, "error": str(e)}
+            raise
+        finally:
+            if entry is not None:
+                entry["latency"] = round(time.monotonic() - start, 4)
+                self._append(channel, key, entry)
+        return response
+
+    async def exchange_async(
+        self,
+        channel: str,
+        request: dict,
+        perform: Callable[[], Awaitable[dict]],
+        error_type: Type[Exception] = ReplayedError,
+    ) -> dict:
+        """Async counterpart of exchange(); perform is a coroutine function."""
+        if self.mode == "off":
+            return await perform()
+
+        key = request_key(request)
+
+        if self.replaying:
+            entry = self._next(channel, key)
+            delay = entry.get("latency", 0.0) * self.latency_scale
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return self._response(entry, error_type)
+
+        start = time.monotonic()
+        # Stays None if perform() is cancelled (a losing hedge, a deadline)
+        entry = None
+        try:
+            response = await perform()
+            entry = {"request": request, "response": response}
+        except Exception as e:
+            entry = {"request": request, "error": str(e)}
+            raise
+        finally:
+            if entry is not None:
+                entry["latency"] = round(time.monotonic() - start, 4)
+                self._append(channel, key, entry)
+        return response
+
+    def _next(self, channel: str, key: str) -> dict:
+        with self._lock:
+            exchanges = self._load(channel, key)
+            cursor = self._cursors[f"{channel}/{key}"]
+            self._cursors[f"{channel}/{key}"] = cursor + 1
+        return exchanges[min(cursor, len(exchanges) - 1)]
+
+    @staticmethod
+    def _response(entry: dict, error_type: Type[Exception]) -> dict:
+        if "error" in entry:
+            raise error_type(entry["error"])
+        return entry["response"]
+
+    def _append(self, channel: str, key: str, entry: dict):
+        file = self._file(channel, key)
+        with self._lock:
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            with open(file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+_store: Optional[TrafficStore] = None
+_store_lock = Lock()
+
+
+def get_traffic_store() -> TrafficStore:
+    """
+    Process-wide store configured from the environment.
+
+    REPLAY_MODE is off, record or replay; REPLAY_DIR is the fixture directory
+    (default: fixtures) and REPLAY_LATENCY_SCALE multiplies recorded latencies
+    and poll intervals during replay (default: 1.0, 0 disables waiting).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TrafficStore(
+                path=os.getenv("REPLAY_DIR", "fixtures"),
+                mode=os.getenv("REPLAY_MODE", "off") or "off",
+                latency_scale=float(os.getenv("REPLAY_LATENCY_SCALE", "1.0")),
+            )
+        return _store
+
+
+def set_traffic_store(store: Optional[TrafficStore]):
+    """Install a store explicitly (e.g. from a benchmark script)."""
+    global _store
+    with _store_lock:
+        _store = store
@@ -0,0 +1,222 @@
+from __future__ import annotations
+import json
+import hashlib
+from enum import Enum
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+from typing_extensions import NotRequired, TypedDict
+from pydantic import BaseModel, Field, TypeAdapter
+from program import BlockType
+
+
+class Status(Enum):
+    FULFILLED = "FULFILLED"
+    UNFULFILLED = "UNFULFILLED"
+
+
+class AgentBlockReport(BaseModel):
+    """     
+    A BlockReport represents a report of a Block. A Block is "block of requirements".
+    Each Block can be of only 4 types; PROGRAM, REQUIRED, COMPLEMENTARY, CUSTOM. 
+    A PROGRAM can contain either REQUIRED or COMPLEMENTARY or both blocks. A COMPLEMENTARY Block 
+    further can have one or more CUSTOM blocks. Example Report:
+    { 
+        "name": "XYZ Major",
+        "minimum_credit": 36,
+        "received_credit":21,
+        "block_type":"PROGRAM",
+        "notes":["overall need 15 more credits" ],
+        "status": "UNFULFILLED",
+        "courses": [], //shoudl be left empty for block's of type PROGRAM 
+        "blocks":[
+                    {
+                        "name": "Required Courses",
+                        "minimum_credit": 18,
+                        "received_credit":12,
+                        "block_type":"REQUIRED",
+                        "status": "UNFULFILLED",
+                        "courses": [('MATH', '223','3'),('MATH', '318','3'),('MATH', '340','3'),('MATH', '370','3')],
+                        "notes": ["need 6 credits from MATH 389, MATH 240"],
+                        "blocks":[],
+                    },
+                    {
+                        "name": "Complementary Courses",
+                        "minimum_credit": 18,
+                        "received_credit":6,
+                        "block_type":"COMPLEMENTARY",
+                        "status": "UNFULFILLED",
+                        "courses": [('MATH', '223','3')], //courses that generally goes to the complementary block and not to any specific CUSTOM block
+                        "notes": ["need 3 more credits from Group A","9 credit from any MATH courses 300 level and above except MATH 389"],
+                        "blocks":[
+                            {
+                                "name": "Group A",
+                                "block_type": "CUSTOM",
+                                "courses": [('PHYS', '141','3')],
+                            }
+                        ],
+                    }    
+                ]
+    }
+    """
+   
+    name: str = Field(description="Name of the block. eg:'Major Mathematics','Required Courses', 'Group A', 'Complementary Courses' etc.")
+    minimum_credit: Optional[int] = Field(default=None, description="Minimum credit requierments for this block. Must be 0 skipped for CUSTOM blocks.")
+    received_credit: Optional[int] = Field(default=None,description="Total credit recieved for this block. For COMPLEMENTARY block total credit count includes the credit recieved for contained CUSTOM blocks. SO, for CUSTOM blocks this field can be skipped.")
+    block_type: BlockType
+    notes: List[str] = Field(default_factory=list,
+        description="""
+            Notes can be dropped to specifiy the requirements that is still needed to be 
+            fufilled for this block. When requirements have not been fulfilled. Provide a 1 line note 
+            on what is needed. For example: 'Need (COMP 230 or COMP 350) and MATH 360 ', 'need 6 credits 
+            from Ecom 300 level and above'", "need 8 credits from COMP courses 300 level and above except COMP 396".
+            When there is a big list of courses (generally from a block), then you can directly refer 
+            to block's name. For example: "need 6 more credits from block A". Since, the structure is recursive 
+            makes sure we do not repeat notes.
+        """)
+    
+    status: Status= Field(description="If all the requirements of this block has been fulfilled then status is FULFILLED otherwise UNFULFILLED.")  
+    courses: List[Tuple[str,str,str]]  = Field(default_factory=list, description="Courses fulfilling this block's requirements. Example: [('MATH','223','3'),('COMP','206','4'))]")
+    blocks:  Optional[List[AgentBlockReport]] = Field(default_factory=list, description="Only PROGRAM, and COMPLEMENTARY blocks can further have nested blocks.")
+    
+    def to_dict(self):
+        """Convert this report (and all nested reports) into a plain dict."""
+        return {
+            "name": self.name,
+            "minimum_credit": self.minimum_credit,
+            "received_credit": self.received_credit,
+            "block_type": self.block_type.value,   # Enum → string
+            "notes": self.notes,
+            "status": self.status.value,           # Enum → string
+            "courses": self.courses,
+            "blocks": [b.to_dict() for b in self.blocks],  # recursive
+        }
+
+
+class ProgramFailure(BaseModel):
+    """
+    A program that could not be audited; the other programs' reports stand.
+
+    Attributes:
+        program: Program title
+        stage: "fetch" if the program could not be fetched, "audit" if every
+            attempt to audit it failed
+        error: Last error message
+    """
+    program: str
+    stage: Literal["fetch", "audit"]
+    error: str
+
+
+class ProgramDegradation(BaseModel):
+    """
+    A program reported on a shortcut because the audit's deadline was close.
+
+    Attributes:
+        program: Program title
+        reasons: "fetch" if a cached (possibly outdated) copy of the program
+            was audited, "audit" if it was evaluated locally from its
+            compiled rules instead of by the LLM; both if both happened
+        blocks: Blocks of a locally evaluated program whose rules did not
+            all compile, so their result is approximate
+    """
+    program: str
+    reasons: List[Literal["fetch", "audit"]] = Field(default_factory=list)
+    blocks: List[str] = Field(default_factory=list)
+
+
+class _ReportBody(TypedDict):
+    reports: List[AgentBlockReport]
+    failures: NotRequired[List[ProgramFailure]]
+    degraded: NotRequired[List[ProgramDegradation]]
+    audit_id: NotRequired[str]
+
+
+_REPORT_BODY = TypeAdapter(_ReportBody)
+
+
+def encode_reports(
+    reports: Sequence[AgentBlockReport],
+    indent: Optional[int] = None,
+    audit_id: Optional[str] = None,
+    failures: Sequence[ProgramFailure] = (),
+    degraded: Sequence[ProgramDegradation] = (),
+) -> bytes:
+    """
+    Encode reports as the /audit response body, {"reports": [...]}, with
+    "failures" when some programs could not be audited, "degraded" when some
+    were audited on a shortcut to meet the deadline, and "audit_id" when
+    the audit was stored for incremental re-audits.
+
+    The tree is serialised once, straight to JSON bytes by pydantic-core,
+    with the same shape as to_dict(); no intermediate dicts are built and
+    nothing is validated again.
+    """
+    body: _ReportBody = {"reports": list(reports)}
+    if failures:
+        body["failures"] = list(failures)
+    if degraded:
+        body["degraded"] = list(degraded)
+    if audit_id is not None:
+        body["audit_id"] = audit_id
+    return _REPORT_BODY.dump_json(body, indent=indent)
+
+
+def report_digest(report: AgentBlockReport) -> str:
+    """Hex sha256 of a report tree's JSON encoding."""
+    return hashlib.sha256(report.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def reports_digest(reports: Sequence[AgentBlockReport]) -> str:
+    """Hex sha256 of a list of reports, in order."""
+    return hashlib.sha256("".join(report_digest(report) for report in reports).encode("utf-8")).hexdigest()
+
+
+def _block_paths(reports: Sequence[AgentBlockReport]) -> Dict[str, List[int]]:
+    """Path ([report index, block index, ...]) of every block by digest; the first one wins."""
+    paths: Dict[str, List[int]] = {}
+
+    def walk(block: AgentBlockReport, path: List[int]):
+        paths.setdefault(report_digest(block), path)
+        for i, child in enumerate(block.blocks or []):
+            walk(child, path + [i])
+
+    for i, report in enumerate(reports):
+        walk(report, [i])
+    return paths
+
+
+def encode_delta(
+    reports: Sequence[AgentBlockReport],
+    base: Sequence[AgentBlockReport],
+    base_etag: str,
+    indent: Optional[int] = None,
+    audit_id: Optional[str] = None,
+    failures: Sequence[ProgramFailure] = (),
+    degraded: Sequence[ProgramDegradation] = (),
+) -> bytes:
+    """
+    Encode reports relative to base, reports the client already has.
+
+    The body is the /audit body plus "delta": base_etag. Any block (or whole
+    report) identical to one in base is sent as {"ref": path}, the path
+    being [report index, nested block index, ...] into base; other blocks
+    are sent in full, with their nested blocks encoded the same way.
+    """
+    paths = _block_paths(base)
+
+    def node(block: AgentBlockReport) -> dict:
+        path = paths.get(report_digest(block))
+        if path is not None:
+            return {"ref": path}
+        encoded = block.model_dump(mode="json", exclude={"blocks"})
+        encoded["blocks"] = [node(child) for child in block.blocks or []]
+        return encoded
+
+    body = {"delta": base_etag, "reports": [node(report) for report in reports]}
+    if failures:
+        body["failures"] = [failure.model_dump() for failure in failures]
+    if degraded:
+        body["degraded"] = [degradation.model_dump() for degradation in degraded]
+    if audit_id is not None:
+        body["audit_id"] = audit_id
+    separators = None if indent is not None else (",", ":")
+    return json.dumps(body, indent=indent, separators=separators).encode("utf-8")
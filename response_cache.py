@@ -0,0 +1,197 @@
+import os
+import json
+import hashlib
+import tempfile
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple, Type, TypeVar
+from pydantic import BaseModel
+from common import *
+
+M = TypeVar("M", bound=BaseModel)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+
+def normalise_content(content: str) -> str:
+    """
+    Normalise a message so that formatting-only differences hash the same.
+
+    JSON payloads are re-encoded with sorted keys and no whitespace; any other
+    text has trailing whitespace stripped from every line.
+    """
+    try:
+        return json.dumps(json.loads(content), sort_keys=True, separators=(",", ":"))
+    except (ValueError, TypeError):
+        return "\n".join(line.rstrip() for line in content.strip().splitlines())
+
+
+def make_key(model: str, params: Dict[str, object], messages: Sequence[Tuple[str, str]]) -> str:
+    """
+    Hash a request into a cache key.
+
+    Args:
+        model: Model name
+        params: Sampling parameters (max_tokens, temperature, ...)
+        messages: List of (role, content) pairs in send order
+
+    Returns:
+        Hex sha256 digest
+    """
+    canonical = json.dumps(
+        {
+            "model": model,
+            "params": params,
+            "messages": [[role, normalise_content(content)] for role, content in messages],
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of parsed LLM responses, one JSON file per key.
+
+    Entries are evicted least-recently-used first once the directory grows
+    past max_bytes. In read-only mode lookups work but nothing is written
+    or evicted, which keeps a checked-in cache stable in CI.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, read_only: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.logger = get_logger(__name__)
+        self._lock = Lock()
+        self._stats = CacheStats()
+        if not read_only:
+            os.makedirs(path, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def _entries(self) -> List[Tuple[str, int, float]]:
+        entries = []
+        if not os.path.isdir(self.path):
+            return entries
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                file = os.path.join(root, name)
+                try:
+                    st = os.stat(file)
+                except FileNotFoundError:
+                    continue
+                entries.append((file, st.st_size, st.st_mtime))
+        return entries
+
+    def get(self, key: str, model: Type[M]) -> Optional[M]:
+        """Return the cached model for key, or None on a miss."""
+        file = self._file(key)
+        try:
+            with open(file, "r", encoding="utf-8") as f:
+                value = model.model_validate_json(f.read())
+        except FileNotFoundError:
+            self._incr("misses")
+            return None
+        except ValueError as e:
+            action = "ignoring" if self.read_only else "dropping"
+            self.logger.warning(f"[ResponseCache] {action} unreadable entry {key}: {e}")
+            if not self.read_only:
+                try:
+                    size = os.path.getsize(file)
+                    os.remove(file)
+                except OSError:
+                    pass
+                else:
+                    with self._lock:
+                        self._size -= size
+            self._incr("misses")
+            return None
+
+        if not self.read_only:
+            try:
+                os.utime(file)  # mtime doubles as last-access time for eviction
+            except OSError:
+                pass
+        self._incr("hits")
+        return value
+
+    def put(self, key: str, value: BaseModel):
+        """Store value under key. No-op in read-only mode."""
+        if self.read_only:
+            return
+        data = value.model_dump_json().encode("utf-8")
+        file = self._file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+
+        try:
+            previous = os.path.getsize(file)
+        except OSError:
+            previous = 0
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(file), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, file)
+
+        with self._lock:
+            self._size += len(data) - previous
+            self._stats.writes += 1
+            over = self._size > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            size = sum(s for _, s, _ in entries)
+            # Evict down to 90% so that a full cache does not rescan on every put
+            target = int(self.max_bytes * 0.9)
+            for file, entry_size, _ in entries:
+                if size <= target:
+                    break
+                try:
+                    os.remove(file)
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+                self._stats.evictions += 1
+            self._size = size
+
+    def _incr(self, name: str):
+        with self._lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**asdict(self._stats), "bytes": self._size}
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = Lock()
+
+
+def open_cache(path: str, max_bytes: int = 256 * 1024 * 1024, read_only: bool = False) -> ResponseCache:
+    """Return the process-wide cache for path, creating it on first use."""
+    path = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = ResponseCache(path, max_bytes, read_only)
+        return cache
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    with _caches_lock:
+        return {path: cache.stats() for path, cache in _caches.items()}
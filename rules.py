@@ -0,0 +1,608 @@
+"""
+Compiles the prose in Block.details into course predicates and credit limits.
+
+Only the phrasings that recur across the catalogue are recognised, e.g.
+
+    "COMP courses at the 300 level or above (except COMP 396 ...)"
+    "18 credits in Economics selected from other 200- (with numbers above 209), 300-, ..."
+    "No more than 6 credits may be at the 200 level."
+    "At least 6 of these credits must be in 400- or 500-level courses."
+    "9-18 credits selected from Group A."
+    "Either MATH 249 or MATH 316 may be taken, but not both."
+
+Anything else is kept in CompiledRules.unrecognised, and a block with
+unrecognised rules is left to the LLM. Blocks whose rules all compile can be
+evaluated locally with evaluate_program().
+"""
+import re
+import weakref
+from dataclasses import dataclass, field
+from threading import RLock
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+from program import Block, BlockType
+from course_db import get_course_db
+from report import AgentBlockReport, Status
+from transcript import CourseKey, CourseRecord, course_key
+
+SUBJECT_NAMES: Dict[str, str] = {
+    "computer science": "COMP",
+    "economics": "ECON",
+    "mathematics": "MATH",
+    "math": "MATH",
+    "sociology": "SOCI",
+    "physics": "PHYS",
+}
+
+_COURSE_REF = re.compile(r"\b([A-Z]{4})\s+'?(\d{3}[A-Z0-9]*)'?")
+_NUMBER = re.compile(r"^(\d+)")
+
+
+def course_number(course_code) -> Optional[int]:
+    """Numeric part of a course code: '227D1' -> 227."""
+    match = _NUMBER.match(str(course_code).strip())
+    return int(match.group(1)) if match else None
+
+
+def course_level(course_code) -> Optional[int]:
+    """Hundreds level of a course code: '227D1' -> 200."""
+    number = course_number(course_code)
+    return None if number is None else number // 100 * 100
+
+
+@dataclass(frozen=True)
+class CoursePredicate:
+    """
+    A course filter.
+
+    Attributes:
+        subjects: Allowed subject codes; empty means any subject
+        levels: Allowed levels (300 means 300-399); empty means any level
+        min_level: Lowest allowed level, inclusive
+        min_number: Lowest allowed course number, inclusive
+        includes: Courses that always match
+        excludes: Courses that never match
+        listed_only: If True, only the includes match
+    """
+    subjects: FrozenSet[str] = frozenset()
+    levels: FrozenSet[int] = frozenset()
+    min_level: Optional[int] = None
+    min_number: Optional[int] = None
+    includes: FrozenSet[CourseKey] = frozenset()
+    excludes: FrozenSet[CourseKey] = frozenset()
+    listed_only: bool = False
+
+    @classmethod
+    def listed(cls, keys: Iterable[CourseKey]) -> "CoursePredicate":
+        return cls(includes=frozenset(keys), listed_only=True)
+
+    def matches(self, subject_code: str, course_code) -> bool:
+        key = course_key(subject_code, course_code)
+        if key in self.excludes:
+            return False
+        if key in self.includes:
+            return True
+        if self.listed_only:
+            return False
+        if self.subjects and key[0] not in self.subjects:
+            return False
+        number = course_number(course_code)
+        if number is None:
+            return False
+        level = number // 100 * 100
+        if self.levels and level not in self.levels:
+            return False
+        if self.min_level is not None and level < self.min_level:
+            return False
+        if self.min_number is not None and number < self.min_number:
+            return False
+        return True
+
+    def filter(self, courses: Iterable[CourseRecord]) -> List[CourseRecord]:
+        return [c for c in courses if self.matches(c.subject_code, c.course_code)]
+
+
+@dataclass(frozen=True)
+class CreditLimit:
+    """
+    A cap and/or floor on the credits a block takes from matching courses.
+
+    scope is "block" for limits on everything the block uses, or "general"
+    for limits only on courses counted outside the block's groups (e.g.
+    "an additional 3 credits may be selected from Group A or B").
+    """
+    predicate: CoursePredicate
+    max_credits: Optional[int] = None
+    min_credits: Optional[int] = None
+    scope: str = "block"
+    text: str = ""
+
+
+@dataclass
+class CompiledRules:
+    selection: List[CoursePredicate] = field(default_factory=list)
+    limits: List[CreditLimit] = field(default_factory=list)
+    exclusive: List[FrozenSet[CourseKey]] = field(default_factory=list)
+    honours_equivalents: bool = False
+    unrecognised: List[str] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        """True if every detail of the block was understood."""
+        return not self.unrecognised
+
+    def selects(self, subject_code: str, course_code) -> bool:
+        return any(p.matches(subject_code, course_code) for p in self.selection)
+
+    def eligible(self, courses: Iterable[CourseRecord]) -> List[CourseRecord]:
+        """Courses picked by any selection predicate, in bulk."""
+        return [c for c in courses if self.selects(c.subject_code, c.course_code)]
+
+
+# --- recognisers -----------------------------------------------------------
+
+_INFO = re.compile(
+    r"^(offered by|degree|program credit weight)\b|credits selected as follows|credits from each of the groups",
+    re.I,
+)
+_EXEMPTION = re.compile(r"exempt|do not need to take|may replace|should replace", re.I)
+_HONOURS = re.compile(r"honours equivalent", re.I)
+_EXCLUSIVE = re.compile(
+    r"either\s+([A-Z]{4})\s+(\d{3}\w*)\s+or\s+([A-Z]{4})\s+(\d{3}\w*)\s+may be taken,?\s+but not both", re.I
+)
+_LEVEL_OR_ABOVE = re.compile(r"\b([A-Z]{4})\s+courses\s+at\s+the\s+(\d)00[- ]level\s+or\s+(?:above|higher)")
+_EXCEPT = re.compile(r"\(except\s+([^)]*)\)", re.I)
+_CREDITS_IN_LEVELS = re.compile(
+    r"(\d+)\s+credits\s+in\s+([A-Za-z][A-Za-z ]*?)\s+selected\s+from\s+(.*?)level\s+courses", re.I
+)
+_LEVEL_LIST = re.compile(r"(\d)00-")
+_NUMBERS_ABOVE = re.compile(r"numbers\s+above\s+(\d{3})", re.I)
+_SUBJECT_ABOVE = re.compile(r"\b([A-Z]{4})\s+(?:courses\s+)?above\s+'?(\d{3})'?")
+_MAX_AT_LEVEL = re.compile(
+    r"no more than\s+(\d+)\s+credits\s+(?:may be\s+)?(?:at|in)\s+the\s+(\d)00[- ]level"
+    r"|(\d+)\s+credits\s+maximum\s+at\s+the\s+(\d)00[- ]level",
+    re.I,
+)
+_MIN_AT_LEVEL = re.compile(r"(\d+)\s+credits\s+minimum\s+at\s+the\s+(\d)00[- ]level(\s+or\s+(?:higher|above))?", re.I)
+_AT_LEAST_IN_LEVELS = re.compile(r"at least\s+(\d+)\s+(?:of these\s+)?credits\s+must be\s+(?:in|at)\s+(.*?)level", re.I)
+_GROUP_RANGE = re.compile(r"(\d+)\s*-\s*(\d+)\s+credits\s+selected\s+from\s+group\s+([A-Z])\b", re.I)
+_GROUP_ADDITIONAL = re.compile(
+    r"an additional\s+(\d+)\s+credits\s+may be selected from\s+group\s+([A-Z])(?:\s+or\s+(?:group\s+)?([A-Z]))?\b", re.I
+)
+
+
+def _group_courses(block: Block, letters: Sequence[str]) -> FrozenSet[CourseKey]:
+    wanted = {f"group {letter.lower()}" for letter in letters if letter}
+    keys: Set[CourseKey] = set()
+    for child in block.blocks:
+        if child.name.strip().lower() in wanted:
+            keys.update(course_key(c[0], c[1]) for c in child.courses)
+    return frozenset(keys)
+
+
+def _compile_detail(detail: str, block: Block, rules: CompiledRules) -> bool:
+    """Add what detail says to rules; returns False if it was not understood."""
+    if _INFO.search(detail):
+        return True
+    if _EXEMPTION.search(detail):
+        # Exemptions are the advisor's call; the audit assumes none are granted
+        return True
+    if _HONOURS.search(detail):
+        rules.honours_equivalents = True
+        return True
+
+    match = _EXCLUSIVE.search(detail)
+    if match:
+        a = course_key(match.group(1), match.group(2))
+        b = course_key(match.group(3), match.group(4))
+        rules.exclusive.append(frozenset((a, b)))
+        return True
+
+    match = _GROUP_RANGE.search(detail)
+    if match:
+        low, high, letter = int(match.group(1)), int(match.group(2)), match.group(3)
+        rules.limits.append(CreditLimit(
+            CoursePredicate.listed(_group_courses(block, [letter])),
+            max_credits=high, min_credits=low or None, text=detail,
+        ))
+        return True
+
+    match = _GROUP_ADDITIONAL.search(detail)
+    if match:
+        keys = _group_courses(block, [match.group(2), match.group(3)])
+        rules.selection.append(CoursePredicate.listed(keys))
+        rules.limits.append(CreditLimit(
+            CoursePredicate.listed(keys), max_credits=int(match.group(1)), scope="general", text=detail,
+        ))
+        return True
+
+    match = _MAX_AT_LEVEL.search(detail)
+    if match:
+        credits = int(match.group(1) or match.group(3))
+        level = int(match.group(2) or match.group(4)) * 100
+        rules.limits.append(CreditLimit(CoursePredicate(levels=frozenset({level})), max_credits=credits, text=detail))
+        return True
+
+    match = _MIN_AT_LEVEL.search(detail)
+    if match:
+        level = int(match.group(2)) * 100
+        predicate = CoursePredicate(min_level=level) if match.group(3) else CoursePredicate(levels=frozenset({level}))
+        rules.limits.append(CreditLimit(predicate, min_credits=int(match.group(1)), text=detail))
+        return True
+
+    match = _AT_LEAST_IN_LEVELS.search(detail)
+    if match:
+        levels = frozenset(int(d) * 100 for d in re.findall(r"(\d)00", match.group(2)))
+        if levels:
+            rules.limits.append(CreditLimit(CoursePredicate(levels=levels), min_credits=int(match.group(1)), text=detail))
+            return True
+
+    match = _LEVEL_OR_ABOVE.search(detail)
+    if match:
+        excludes: Set[CourseKey] = set()
+        for except_clause in _EXCEPT.findall(detail):
+            excludes.update(course_key(s, c) for s, c in _COURSE_REF.findall(except_clause))
+        includes = {course_key(s, c) for s, c in _COURSE_REF.findall(detail)} - excludes
+        rules.selection.append(CoursePredicate(
+            subjects=frozenset({match.group(1)}),
+            min_level=int(match.group(2)) * 100,
+            includes=frozenset(includes),
+            excludes=frozenset(excludes),
+        ))
+        return True
+
+    match = _CREDITS_IN_LEVELS.search(detail)
+    if match:
+        subject = SUBJECT_NAMES.get(match.group(2).strip().lower())
+        levels = frozenset(int(d) * 100 for d in _LEVEL_LIST.findall(match.group(3) + "-"))
+        if subject and levels:
+            above = _NUMBERS_ABOVE.search(detail)
+            rules.selection.append(CoursePredicate(
+                subjects=frozenset({subject}),
+                levels=levels,
+                min_number=int(above.group(1)) + 1 if above else None,
+            ))
+            return True
+
+    match = _SUBJECT_ABOVE.search(detail)
+    if match:
+        rules.selection.append(CoursePredicate(
+            subjects=frozenset({match.group(1)}), min_number=int(match.group(2)) + 1,
+        ))
+        return True
+
+    return False
+
+
+# Rules by id() of live Blocks; an entry goes away with its Block. Blocks are
+# not hashable, and fetched or decoded ones are new instances every time.
+_compiled: Dict[int, Tuple["weakref.ref[Block]", CompiledRules]] = {}
+# Reentrant: a collection inside the lock may run _forget on the same thread
+_compiled_lock = RLock()
+
+
+def _forget(key: int, ref: "weakref.ref[Block]"):
+    with _compiled_lock:
+        cached = _compiled.get(key)
+        if cached is not None and cached[0] is ref:
+            del _compiled[key]
+
+
+def compile_block(block: Block) -> CompiledRules:
+    """
+    Compile a block's details. Results are memoised per Block instance for
+    as long as it is alive, which is cheap because catalog Blocks are shared
+    and frozen.
+    """
+    key = id(block)
+    with _compiled_lock:
+        cached = _compiled.get(key)
+    if cached is not None and cached[0]() is block:
+        return cached[1]
+    rules = CompiledRules()
+    for detail in block.details:
+        if not _compile_detail(detail, block, rules):
+            rules.unrecognised.append(detail)
+    ref = weakref.ref(block, lambda ref: _forget(key, ref))
+    with _compiled_lock:
+        _compiled[key] = (ref, rules)
+    return rules
+
+
+# --- local evaluation ------------------------------------------------------
+
+def _sort_key(course: CourseRecord, department: Optional[str]):
+    # Same department first, then lower level, then fewer credits
+    return (
+        course.subject_code != department,
+        course_number(course.course_code) or 0,
+        course.credit or 0,
+    )
+
+
+def _report_course(course: CourseRecord) -> Tuple[str, str, str]:
+    return (course.subject_code, str(course.course_code), str(course.credit))
+
+
+def program_department(program: Block) -> Optional[str]:
+    """Subject most common among the program's required courses."""
+    counts: Dict[str, int] = {}
+    for block in program.blocks:
+        if block.block_type == BlockType.REQUIRED:
+            for course in block.courses:
+                counts[course[0]] = counts.get(course[0], 0) + 1
+    return max(counts, key=counts.get) if counts else None
+
+
+def can_evaluate(program: Block) -> bool:
+    """True if every block of program compiles."""
+    def ok(block: Block) -> bool:
+        if not compile_block(block).complete:
+            return False
+        return all(ok(child) for child in block.blocks)
+    return ok(program)
+
+
+class _Ledger:
+    """Credits taken so far, checked against a block's limits."""
+
+    def __init__(self, limits: List[CreditLimit]):
+        self.limits = limits
+        self.used = [0] * len(limits)
+
+    def allows(self, course: CourseRecord, general: bool) -> bool:
+        for i, limit in enumerate(self.limits):
+            if limit.max_credits is None or (limit.scope == "general" and not general):
+                continue
+            if limit.predicate.matches(course.subject_code, course.course_code):
+                if self.used[i] + (course.credit or 0) > limit.max_credits:
+                    return False
+        return True
+
+    def take(self, course: CourseRecord, general: bool):
+        for i, limit in enumerate(self.limits):
+            if limit.scope == "general" and not general:
+                continue
+            if limit.predicate.matches(course.subject_code, course.course_code):
+                self.used[i] += course.credit or 0
+
+    def shortfalls(self) -> List[Tuple[CreditLimit, int]]:
+        return [
+            (limit, limit.min_credits - self.used[i])
+            for i, limit in enumerate(self.limits)
+            if limit.min_credits is not None and self.used[i] < limit.min_credits
+        ]
+
+
+def _required_report(
+    block: Block,
+    available: Dict[CourseKey, CourseRecord],
+    used: Set[CourseKey],
+    equivalents: Callable[[CourseKey], FrozenSet[CourseKey]],
+) -> AgentBlockReport:
+    taken, missing = [], []
+    for subject, code, *_ in block.courses:
+        # The listed course itself first, then any equivalent the student took
+        listed = course_key(subject, code)
+        options = [listed] + sorted(equivalents(listed) - {listed})
+        course = next((available[k] for k in options if k in available and k not in used), None)
+        if course is not None:
+            used.add(course.key)
+            taken.append(course)
+        else:
+            missing.append(f"{subject} {code}")
+    received = sum(c.credit or 0 for c in taken)
+    notes = [f"Need {', '.join(missing)}"] if missing else []
+    return AgentBlockReport(
+        name=block.name,
+        minimum_credit=block.minimum_credit,
+        received_credit=received,
+        block_type=block.block_type,
+        notes=notes,
+        status=Status.UNFULFILLED if missing else Status.FULFILLED,
+        courses=[_report_course(c) for c in taken],
+        blocks=[],
+    )
+
+
+def _complementary_report(
+    block: Block,
+    candidates: List[CourseRecord],
+    used: Set[CourseKey],
+    equivalents: Callable[[CourseKey], FrozenSet[CourseKey]],
+) -> AgentBlockReport:
+    rules = compile_block(block)
+    ledger = _Ledger(rules.limits)
+    listed = {course_key(c[0], c[1]) for c in block.courses}
+    blocked: Set[CourseKey] = set()
+
+    def usable(course: CourseRecord) -> bool:
+        return course.key not in used and course.key not in blocked
+
+    def take(course: CourseRecord, general: bool):
+        used.add(course.key)
+        ledger.take(course, general)
+        for group in rules.exclusive:
+            if course.key in group:
+                blocked.update(group - {course.key})
+
+    # 1. Each CUSTOM group up to its own minimum
+    group_reports, total, notes = [], 0, []
+    group_keys: Set[CourseKey] = set()
+    for group in block.blocks:
+        keys = {course_key(c[0], c[1]) for c in group.courses}
+        group_keys |= keys
+        chosen, credits = [], 0
+        for course in candidates:
+            if credits >= group.minimum_credit:
+                break
+            if not keys.isdisjoint(equivalents(course.key)) and usable(course) and ledger.allows(course, general=False):
+                take(course, general=False)
+                chosen.append(course)
+                credits += course.credit or 0
+        total += credits
+        if credits < group.minimum_credit:
+            notes.append(f"Need {group.minimum_credit - credits} credits from {group.name}")
+        group_reports.append(AgentBlockReport(
+            name=group.name,
+            minimum_credit=group.minimum_credit,
+            received_credit=credits,
+            block_type=group.block_type,
+            status=Status.FULFILLED if credits >= group.minimum_credit else Status.UNFULFILLED,
+            courses=[_report_course(c) for c in chosen],
+            blocks=[],
+        ))
+
+    # 2. The rest of the block from anything eligible, floors first
+    def eligible(course: CourseRecord) -> bool:
+        if course.key in listed or rules.selects(course.subject_code, course.course_code):
+            return True
+        # Without a selection rule, the block's groups are its pool
+        return not rules.selection and course.key in group_keys
+
+    general = []
+    pool = [c for c in candidates if eligible(c)]
+    for i, limit in enumerate(rules.limits):
+        if limit.min_credits is None:
+            continue
+        for course in pool:
+            if ledger.used[i] >= limit.min_credits or total >= block.minimum_credit:
+                break
+            if (
+                usable(course)
+                and limit.predicate.matches(course.subject_code, course.course_code)
+                and ledger.allows(course, general=True)
+            ):
+                take(course, general=True)
+                general.append(course)
+                total += course.credit or 0
+    for course in pool:
+        if total >= block.minimum_credit:
+            break
+        if usable(course) and ledger.allows(course, general=True):
+            take(course, general=True)
+            general.append(course)
+            total += course.credit or 0
+
+    for limit, short in ledger.shortfalls():
+        notes.append(f"Need {short} more credits: {limit.text}" if limit.text else f"Need {short} more credits")
+    if total < block.minimum_credit:
+        notes.append(f"Need {block.minimum_credit - total} more credits")
+
+    fulfilled = not notes
+    return AgentBlockReport(
+        name=block.name,
+        minimum_credit=block.minimum_credit,
+        received_credit=total,
+        block_type=block.block_type,
+        notes=notes,
+        status=Status.FULFILLED if fulfilled else Status.UNFULFILLED,
+        courses=[_report_course(c) for c in general],
+        blocks=group_reports,
+    )
+
+
+def _no_equivalents(key: CourseKey) -> FrozenSet[CourseKey]:
+    return frozenset((key,))
+
+
+def uses_honours_equivalents(program: Block) -> bool:
+    """True if the program (or any block in it) accepts honours equivalents."""
+    if compile_block(program).honours_equivalents:
+        return True
+    return any(uses_honours_equivalents(child) for child in program.blocks)
+
+
+def used_courses(reports: Iterable[AgentBlockReport]) -> Set[CourseKey]:
+    """Every course already allocated by earlier program reports."""
+    keys: Set[CourseKey] = set()
+
+    def walk(report: AgentBlockReport):
+        for course in report.courses:
+            keys.add(course_key(course[0], course[1]))
+        for child in report.blocks or []:
+            walk(child)
+
+    for report in reports:
+        walk(report)
+    return keys
+
+
+def _evaluate(
+    program: Block,
+    courses: Iterable[CourseRecord],
+    used: Optional[Set[CourseKey]],
+    degraded: Optional[List[str]],
+) -> AgentBlockReport:
+    used = set(used or ())
+    equivalents = _no_equivalents
+    if uses_honours_equivalents(program):
+        db = get_course_db()
+        equivalents = lambda key: db.equivalents(*key)
+    department = program_department(program)
+    candidates = sorted((c for c in courses if c.is_usable()), key=lambda c: _sort_key(c, department))
+    available = {c.key: c for c in candidates}
+
+    children = []
+    for block in sorted(program.blocks, key=lambda b: b.block_type != BlockType.REQUIRED):
+        if degraded is not None and not can_evaluate(block):
+            degraded.append(block.name)
+        if block.block_type == BlockType.REQUIRED:
+            children.append(_required_report(block, available, used, equivalents))
+        else:
+            children.append(_complementary_report(block, candidates, used, equivalents))
+
+    received = sum(child.received_credit or 0 for child in children)
+    fulfilled = all(child.status == Status.FULFILLED for child in children)
+    notes = [] if fulfilled else [f"overall need {max(program.minimum_credit - received, 0)} more credits"]
+    return AgentBlockReport(
+        name=program.name,
+        minimum_credit=program.minimum_credit,
+        received_credit=received,
+        block_type=program.block_type,
+        notes=notes,
+        status=Status.FULFILLED if fulfilled else Status.UNFULFILLED,
+        courses=[],
+        blocks=children,
+    )
+
+
+def evaluate_program(
+    program: Block,
+    courses: Iterable[CourseRecord],
+    used: Optional[Set[CourseKey]] = None,
+) -> Optional[AgentBlockReport]:
+    """
+    Evaluate a program deterministically, without the LLM.
+
+    Args:
+        program: PROGRAM block
+        courses: The student's courses
+        used: Courses already allocated to other programs (not reused)
+
+    Returns:
+        The report, or None if some block has rules that did not compile
+    """
+    if not can_evaluate(program):
+        return None
+    return _evaluate(program, courses, used, None)
+
+
+def evaluate_best_effort(
+    program: Block,
+    courses: Iterable[CourseRecord],
+    used: Optional[Set[CourseKey]] = None,
+) -> Tuple[AgentBlockReport, List[str]]:
+    """
+    Evaluate a program without the LLM even if some of its rules did not
+    compile, for audits out of time.
+
+    Blocks with unrecognised rules are evaluated from the rules that did
+    compile (so they may accept too much or too little); blocks whose
+    courses are an expression are left UNFULFILLED with a note.
+
+    Returns:
+        The report, and the names of the top-level blocks that were not
+        evaluated exactly
+    """
+    degraded: List[str] = []
+    return _evaluate(program, courses, used, degraded), degraded
@@ -0,0 +1,285 @@
+"""
+Cache shared by the worker processes of one host.
+
+With uvicorn --workers N every process has its own in-memory caches, so the
+more workers, the lower their hit rates. Entries stored here are visible to
+every process as soon as they are written. The cache is one SQLite database
+in WAL mode: readers never block the writer, and SQLite's file locks
+serialise writers across processes, so no external service is needed.
+
+Entries are bytes under a (namespace, key) pair, with the wall-clock time
+they were written. Fill leases let one thread fill a key while the others,
+in any process, wait for its entry instead of doing the same work: claim()
+takes the lease in an IMMEDIATE transaction, which holds the database's
+write lock. A lease expires after a set time, so a worker that dies while
+filling only delays the others.
+
+Every failure of the database is logged and treated as a miss; the cache
+never fails the caller.
+"""
+import os
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import Dict, Optional
+from common import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    written REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_written ON entries (written);
+CREATE TABLE IF NOT EXISTS leases (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+@dataclass
+class SharedCacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    waits: int = 0
+    errors: int = 0
+
+
+class SharedCache:
+    """
+    SQLite-backed cache shared by processes.
+
+    Args:
+        path: Database file; created if missing
+        max_bytes: Size of stored values after which the oldest entries are
+            evicted
+        busy_timeout: Seconds a statement waits for another process's write
+            lock before failing
+    """
+
+    # Writes between two checks of the stored size
+    CHECK_EVERY = 64
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, busy_timeout: float = 5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = Lock()
+        self._stats = SharedCacheStats()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    @property
+    def _owner(self) -> str:
+        """Lease owner id of the calling thread."""
+        return f"{os.getpid()}-{threading.get_ident()}-{id(self)}"
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection; connections are not shared by threads or inherited by forks."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _failed(self, operation: str, e: sqlite3.Error):
+        logger.warning(f"[SharedCache] {operation} failed: {e}")
+        self._incr("errors")
+
+    def get(self, namespace: str, key: str, max_age: Optional[float] = None) -> Optional[bytes]:
+        """The value stored under key, or None if missing or older than max_age seconds."""
+        try:
+            row = self._connect().execute(
+                "SELECT value, written FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("get", e)
+            return None
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            self._incr("misses")
+            return None
+        self._incr("hits")
+        return row[0]
+
+    def put(self, namespace: str, key: str, value: bytes):
+        """Store value under key and release the caller's lease on it, if any."""
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, written) VALUES (?, ?, ?, ?)",
+                    (namespace, key, sqlite3.Binary(value), time.time()),
+                )
+                conn.execute(
+                    "DELETE FROM leases WHERE namespace = ? AND key = ? AND owner = ?", (namespace, key, self._owner)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._failed("put", e)
+            return
+        with self._lock:
+            self._stats.writes += 1
+            self._writes += 1
+            check = self._writes % self.CHECK_EVERY == 0
+        if check:
+            self._evict()
+
+    def delete(self, namespace: str, key: str):
+        try:
+            self._connect().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+
+    def claim(self, namespace: str, key: str, seconds: float) -> bool:
+        """
+        Take the fill lease on key for seconds, unless another thread or
+        process holds a live one. Also True if the database cannot be used,
+        so that the caller does the work itself.
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT owner, expires FROM leases WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                claimed = row is None or row[0] == self._owner or row[1] <= now
+                if claimed:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO leases (namespace, key, owner, expires) VALUES (?, ?, ?, ?)",
+                        (namespace, key, self._owner, now + seconds),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._failed("claim", e)
+            return True
+        return claimed
+
+    def release(self, namespace: str, key: str):
+        """Give up the caller's lease on key without storing anything."""
+        try:
+            self._connect().execute(
+                "DELETE FROM leases WHERE namespace = ? AND key = ? AND owner = ?", (namespace, key, self._owner)
+            )
+        except sqlite3.Error as e:
+            self._failed("release", e)
+
+    def _leased(self, namespace: str, key: str) -> bool:
+        try:
+            row = self._connect().execute(
+                "SELECT 1 FROM leases WHERE namespace = ? AND key = ? AND expires > ?", (namespace, key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("lease check", e)
+            return False
+        return row is not None
+
+    def wait(
+        self,
+        namespace: str,
+        key: str,
+        max_age: Optional[float] = None,
+        timeout: Optional[float] = None,
+        poll_interval: float = 0.1,
+    ) -> Optional[bytes]:
+        """
+        Wait for the process holding the lease on key to store it.
+
+        Returns the value once stored, or None if the lease is released
+        without a value, expires, or timeout seconds pass first.
+        """
+        self._incr("waits")
+        until = None if timeout is None else time.monotonic() + timeout
+        while True:
+            value = self.get(namespace, key, max_age)
+            if value is not None or not self._leased(namespace, key):
+                return value
+            if until is not None and time.monotonic() >= until:
+                return None
+            time.sleep(poll_interval)
+
+    def _evict(self):
+        """Delete the oldest entries until stored values fit in 90% of max_bytes."""
+        try:
+            conn = self._connect()
+            size = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()[0]
+            if size <= self.max_bytes:
+                return
+            target = int(self.max_bytes * 0.9)
+            evicted = 0
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute("SELECT rowid, LENGTH(value) FROM entries ORDER BY written").fetchall()
+                for rowid, length in rows:
+                    if size <= target:
+                        break
+                    conn.execute("DELETE FROM entries WHERE rowid = ?", (rowid,))
+                    size -= length
+                    evicted += 1
+                conn.execute("DELETE FROM leases WHERE expires <= ?", (time.time(),))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._failed("evict", e)
+            return
+        with self._lock:
+            self._stats.evictions += evicted
+
+    def _incr(self, name: str):
+        with self._lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters of this process; the database is shared, the counters are not."""
+        with self._lock:
+            return asdict(self._stats)
+
+
+_cache: Optional[SharedCache] = None
+_cache_lock = Lock()
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """
+    Process-wide cache on SHARED_CACHE_FILE, sized by SHARED_CACHE_MAX_MB
+    (default: 256); None if SHARED_CACHE_FILE is unset or cannot be opened.
+    """
+    global _cache
+    path = os.getenv("SHARED_CACHE_FILE")
+    if not path:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = SharedCache(path, max_bytes=int(float(os.getenv("SHARED_CACHE_MAX_MB", "256")) * 1024 * 1024))
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"[SharedCache] cannot open {path}: {e}")
+                return None
+        return _cache
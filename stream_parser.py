@@ -0,0 +1,159 @@
+import json
+from typing import Callable, List, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+
+
+class StreamAborted(ValueError):
+    """raised when streamed output is clearly not going to be a valid report"""
+    pass
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "key", "expect_key", "name", "is_block")
+
+    def __init__(self, kind: str, start: int, is_block: bool):
+        self.kind = kind              # "{" or "["
+        self.start = start            # offset of the opening bracket in the text
+        self.key: Optional[str] = None
+        self.expect_key = kind == "{"
+        self.name: Optional[str] = None
+        self.is_block = is_block      # top-level report or an element of "blocks"
+
+
+class IncrementalReportParser:
+    """
+    Incremental JSON scanner for a streamed report tree.
+
+    Text is fed as it arrives. Every object that closes inside a "blocks"
+    array is validated on the spot and handed to on_block together with the
+    names of the blocks enclosing it, so callers see e.g. "Required Courses"
+    long before the whole report is done. Inner blocks are emitted before
+    the block that contains them.
+
+    The scanner aborts as soon as the output is clearly unusable: it does not
+    start with an object, a nested block fails validation, nesting runs away,
+    or the same block is emitted twice (the model looping).
+    """
+
+    def __init__(
+        self,
+        model: Type[BaseModel],
+        on_block: Optional[Callable[[Tuple[str, ...], BaseModel], None]] = None,
+        max_depth: int = 16,
+    ):
+        self.model = model
+        self.on_block = on_block
+        self.max_depth = max_depth
+        self.blocks: List[Tuple[Tuple[str, ...], BaseModel]] = []
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string: List[str] = []
+        self._last_string: Optional[str] = None
+        self._start = -1
+        self._end = -1
+        self._seen = set()
+
+    @property
+    def done(self) -> bool:
+        """True once the top-level object has closed."""
+        return self._end != -1
+
+    def feed(self, chunk: str):
+        """Consume the next piece of streamed text."""
+        if self.done or not chunk:
+            return
+        self._text += chunk
+        for ch in chunk:
+            self._step(ch)
+            self._pos += 1
+            if self.done:
+                break
+
+    def result(self) -> BaseModel:
+        """Validate and return the complete report."""
+        if not self.done:
+            raise StreamAborted("stream ended before the report was complete")
+        return self.model.model_validate_json(self._text[self._start:self._end + 1])
+
+    def _step(self, ch: str):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+                self._string.append(ch)
+            elif ch == "\\":
+                self._escape = True
+                self._string.append(ch)
+            elif ch == '"':
+                self._in_string = False
+                self._close_string()
+            else:
+                self._string.append(ch)
+            return
+
+        if ch.isspace():
+            return
+
+        if self._start == -1:
+            if ch != "{":
+                raise StreamAborted(f"report does not start with an object: {ch!r}")
+            self._start = self._pos
+
+        frame = self._stack[-1] if self._stack else None
+
+        if ch == '"':
+            self._in_string = True
+            self._string = []
+        elif ch == ":":
+            if frame is not None and frame.kind == "{":
+                frame.key = self._last_string
+                frame.expect_key = False
+        elif ch == ",":
+            if frame is not None and frame.kind == "{":
+                frame.expect_key = True
+        elif ch in "{[":
+            if len(self._stack) >= self.max_depth:
+                raise StreamAborted("report nesting is too deep")
+            is_block = ch == "{" and (frame is None or self._in_blocks(len(self._stack) - 1))
+            self._stack.append(_Frame(ch, self._pos, is_block))
+        elif ch in "}]":
+            if not self._stack or self._stack[-1].kind != ("{" if ch == "}" else "["):
+                raise StreamAborted(f"unbalanced {ch!r} in report")
+            closed = self._stack.pop()
+            if not self._stack:
+                self._end = self._pos
+            elif closed.is_block:
+                self._emit(closed)
+
+    def _close_string(self):
+        value = json.loads('"' + "".join(self._string) + '"')
+        self._last_string = value
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None and frame.kind == "{" and not frame.expect_key and frame.key == "name":
+            frame.name = value
+
+    def _in_blocks(self, index: int) -> bool:
+        """True if the frame at index is an array stored under a "blocks" key."""
+        if index < 1:
+            return False
+        array, owner = self._stack[index], self._stack[index - 1]
+        return array.kind == "[" and owner.kind == "{" and owner.key == "blocks"
+
+    def _emit(self, frame: _Frame):
+        raw = self._text[frame.start:self._pos + 1]
+        try:
+            block = self.model.model_validate_json(raw)
+        except ValidationError as e:
+            raise StreamAborted(f"invalid nested block: {e.errors()[0].get('msg')}") from e
+
+        path = tuple(f.name or "" for f in self._stack if f.is_block)
+        ident = (path, frame.name)
+        if ident in self._seen:
+            raise StreamAborted(f"block {frame.name!r} emitted twice")
+        self._seen.add(ident)
+
+        self.blocks.append((path, block))
+        if self.on_block:
+            self.on_block(path, block)
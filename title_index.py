@@ -0,0 +1,117 @@
+"""
+In-memory search over program titles, for typeahead and title validation.
+
+Titles are matched two ways: word prefixes ("comp sci maj" finds
+"Computer Science Major Concentration (B.A.)") through a sorted word list
+and bisect, and character trigrams for typos ("Econmics"). Everything is
+built once per title list; a search touches only the matching postings.
+"""
+import re
+import hashlib
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set, Tuple
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalise_title(title: str) -> str:
+    """Lowercase words only: 'Economics Major (B.A.)' -> 'economics major b a'."""
+    return " ".join(_WORD.findall(title.lower()))
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class TitleMatch:
+    title: str
+    score: float
+    exact: bool = False
+
+
+class TitleIndex:
+    """
+    Prefix and trigram index over a fixed list of titles.
+
+    Attributes:
+        titles: The indexed titles, in their original spelling
+        etag: Digest of the title list; changes whenever the titles do
+    """
+
+    # Share of the query's trigrams a title must contain to be suggested
+    MIN_SIMILARITY = 0.5
+
+    def __init__(self, titles: Iterable[str]):
+        self.titles: List[str] = sorted(dict.fromkeys(titles))
+        self._title_set = frozenset(self.titles)
+        self._normalised = [normalise_title(t) for t in self.titles]
+        self._exact: Dict[str, int] = {n: i for i, n in enumerate(self._normalised)}
+        self._words: List[Tuple[str, int]] = sorted(
+            (word, i) for i, n in enumerate(self._normalised) for word in set(n.split())
+        )
+        self._grams: Dict[str, Set[int]] = {}
+        for i, n in enumerate(self._normalised):
+            for gram in _trigrams(n):
+                self._grams.setdefault(gram, set()).add(i)
+        self.etag = hashlib.sha256("\n".join(self.titles).encode("utf-8")).hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def __contains__(self, title: str) -> bool:
+        return title in self._title_set
+
+    def _with_prefix(self, prefix: str) -> Set[int]:
+        ids = set()
+        i = bisect_left(self._words, (prefix, -1))
+        while i < len(self._words) and self._words[i][0].startswith(prefix):
+            ids.add(self._words[i][1])
+            i += 1
+        return ids
+
+    def search(self, query: str, limit: int = 10) -> List[TitleMatch]:
+        """
+        Titles matching query, best first.
+
+        Scores: 1.0 for the exact title (ignoring case and punctuation), 0.9
+        when the title starts with the query, 0.8 when every query word
+        prefixes a title word, otherwise up to 0.7 by the share of the
+        query's trigrams found in the title.
+        """
+        q = normalise_title(query)
+        if not q:
+            return [TitleMatch(t, 0.0) for t in self.titles[:limit]]
+
+        scores: Dict[int, float] = {}
+        exact = self._exact.get(q)
+        if exact is not None:
+            scores[exact] = 1.0
+
+        words = q.split()
+        matched = self._with_prefix(words[0])
+        for word in words[1:]:
+            if not matched:
+                break
+            matched &= self._with_prefix(word)
+        for i in matched:
+            if i not in scores:
+                scores[i] = 0.9 if self._normalised[i].startswith(q) else 0.8
+
+        if len(scores) < limit:
+            grams = _trigrams(q)
+            shared: Dict[int, int] = {}
+            for gram in grams:
+                for i in self._grams.get(gram, ()):
+                    shared[i] = shared.get(i, 0) + 1
+            for i, count in shared.items():
+                if i in scores:
+                    continue
+                similarity = count / len(grams)
+                if similarity >= self.MIN_SIMILARITY:
+                    scores[i] = round(similarity * 0.7, 3)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.titles[item[0]]))
+        return [TitleMatch(self.titles[i], score, score == 1.0) for i, score in ranked[:limit]]
@@ -1,35 +1,79 @@
-from typing import List, Iterator, Optional, Literal, Dict, Tuple
+import sys
+import json
+import hashlib
+from typing import List, Iterator, Optional, Literal, Dict, Tuple, NamedTuple, Any
+
+CourseKey = Tuple[str, str]
+
+
+def course_key(subject_code: str, course_code) -> CourseKey:
+    # Interned: the same few thousand codes recur across every transcript
+    return (
+        sys.intern(str(subject_code).strip().upper()),
+        sys.intern(str(course_code).strip().upper()),
+    )
+
 
 class Course:
+    __slots__ = (
+        "title",
+        "subject_code",
+        "course_code",
+        "credit",
+        "grade",
+        "done",
+        "associated_with_program",
+        "associated_program_title",
+        "associated_program_block_name",
+        "attempts",
+        "_notes",
+    )
+
     title:str
-    subject_code: str 
-    course_code: str 
+    subject_code: str
+    course_code: str
     credit: int
     grade: str
     done: bool
     associated_with_program: bool
-    associated_program_title: str 
-    associated_program_block_name: str 
-    notes: List[str]
-    
+    associated_program_title: str
+    associated_program_block_name: str
+    attempts: int
+
     def __init__(self,subject_code:str,course_code:str, credit:int = None, grade:str=None):
-        self.subject_code = subject_code
-        self.course_code = course_code    
+        # Subject codes repeat across every transcript; share one string per code
+        self.subject_code = sys.intern(subject_code)
+        self.course_code = sys.intern(course_code) if isinstance(course_code, str) else course_code
         self.grade = grade
         self.associated_with_program = False
-        self.associated_program_title = "" 
-        self.associated_program_block_name = "" 
-        self.notes = [] 
+        self.associated_program_title = ""
+        self.associated_program_block_name = ""
+        self._notes: Optional[List[str]] = None
         self.title = ""
         self.credit = credit
         self.done = False
-                   
+        self.attempts = 1
+
+    @property
+    def key(self) -> CourseKey:
+        return course_key(self.subject_code, self.course_code)
+
+    @property
+    def notes(self) -> List[str]:
+        if self._notes is None:
+            self._notes = []
+        return self._notes
+
+    @notes.setter
+    def notes(self, notes: List[str]):
+        self._notes = notes
+
     def is_usable(self):
         return self.credit != 0
 
     def add_note(self,note:str):
         self.notes.append(note)
-    
+
     def change_note(self,note:str):
         self.notes=[]
         self.notes.append(note)
@@ -54,7 +98,7 @@ class Course:
             "subject_code": self.subject_code,
             "course_code": self.course_code,
             "credit": self.credit,
-            "grade": self.grade, 
+            "grade": self.grade,
             "done": self.done
         }
 
@@ -75,32 +119,240 @@ class Course:
 
         return result
 
-    
+
+
+class CourseRecord(NamedTuple):
+    """Immutable, hashable view of one course as it appears on a transcript."""
+    subject_code: str
+    course_code: Any
+    credit: Optional[int]
+    grade: Optional[str]
+    title: str = ""
+    attempts: int = 1
+
+    @property
+    def key(self) -> CourseKey:
+        return course_key(self.subject_code, self.course_code)
+
+    def is_usable(self) -> bool:
+        return self.credit != 0
+
+    @classmethod
+    def from_course(cls, course: Course) -> "CourseRecord":
+        return cls(
+            course.subject_code,
+            course.course_code,
+            course.credit,
+            course.grade,
+            course.title,
+            course.attempts,
+        )
+
+
+class TranscriptSnapshot:
+    """
+    Frozen copy of a Transcript.
+
+    Snapshots hold no audit state, so one snapshot can be shared by any
+    number of concurrent audits, programs and cache entries without copying.
+    They compare and hash by content; fingerprint() is a stable digest for
+    use in cache keys.
+    """
+    __slots__ = ("courses", "program_titles", "_index", "_hash", "_fingerprint")
+
+    def __init__(self, courses: Tuple[CourseRecord, ...], program_titles: Tuple[str, ...]):
+        object.__setattr__(self, "courses", tuple(courses))
+        object.__setattr__(self, "program_titles", tuple(program_titles))
+        object.__setattr__(self, "_index", {course.key: i for i, course in enumerate(self.courses)})
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_fingerprint", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TranscriptSnapshot is immutable")
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash((self.courses, self.program_titles)))
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TranscriptSnapshot):
+            return NotImplemented
+        return self.courses == other.courses and self.program_titles == other.program_titles
+
+    def fingerprint(self) -> str:
+        """Hex sha256 of the snapshot's content, stable across processes."""
+        if self._fingerprint is None:
+            canonical = json.dumps(
+                [list(self.program_titles), [list(course) for course in self.courses]],
+                separators=(",", ":"),
+                default=str,
+            )
+            object.__setattr__(self, "_fingerprint", hashlib.sha256(canonical.encode("utf-8")).hexdigest())
+        return self._fingerprint
+
+    def get_program_titles(self) -> Tuple[str, ...]:
+        return self.program_titles
+
+    def has_course(self, subject_code: str, course_code) -> bool:
+        return course_key(subject_code, course_code) in self._index
+
+    def get_course(self, subject_code: str, course_code) -> Optional[CourseRecord]:
+        position = self._index.get(course_key(subject_code, course_code))
+        return None if position is None else self.courses[position]
+
+    def __contains__(self, key: CourseKey) -> bool:
+        return course_key(*key) in self._index
+
+    def __len__(self) -> int:
+        return len(self.courses)
+
+    def __iter__(self) -> Iterator[CourseRecord]:
+        return iter(self.courses)
+
+
+class Allocation(NamedTuple):
+    program_title: str
+    block_name: str
+
+
+class AllocationOverlay:
+    """
+    Per-audit course allocations on top of a shared TranscriptSnapshot.
+
+    This is the mutable state Course used to carry (associated program and
+    block, notes, done). Each audit owns its overlay; the snapshot under it
+    is never written to.
+    """
+
+    def __init__(self, snapshot: TranscriptSnapshot):
+        self.snapshot = snapshot
+        self._allocations: Dict[CourseKey, Allocation] = {}
+        self._notes: Dict[CourseKey, List[str]] = {}
+
+    def associate(self, key: CourseKey, program_title: str, block_name: str):
+        self._allocations[course_key(*key)] = Allocation(program_title, block_name)
+
+    def release(self, key: CourseKey):
+        self._allocations.pop(course_key(*key), None)
+
+    def allocation(self, key: CourseKey) -> Optional[Allocation]:
+        return self._allocations.get(course_key(*key))
+
+    def is_associated(self, key: CourseKey) -> bool:
+        return course_key(*key) in self._allocations
+
+    def add_note(self, key: CourseKey, note: str):
+        self._notes.setdefault(course_key(*key), []).append(note)
+
+    def notes(self, key: CourseKey) -> List[str]:
+        return list(self._notes.get(course_key(*key), ()))
+
+    def course_dict_full(self, course: CourseRecord) -> Dict[str, any]:
+        """Same shape as Course.to_dict_full, with state taken from the overlay."""
+        allocation = self._allocations.get(course.key)
+        result = {
+            "title": course.title,
+            "subject_code": course.subject_code,
+            "course_code": course.course_code,
+            "credit": course.credit,
+            "grade": course.grade,
+            "done": allocation is not None,
+            "associated_with_program": allocation is not None,
+        }
+        if allocation is not None:
+            result["associated_program_title"] = allocation.program_title
+            result["associated_program_block_name"] = allocation.block_name
+        return result
+
+    def usable_courses_serializable(self) -> List[Dict[str, any]]:
+        result = []
+        for course in self.snapshot:
+            if course.is_usable():
+                d = self.course_dict_full(course)
+                d.pop("done", None)
+                result.append(d)
+        return result
+
 
 class Transcript:
+    """
+    Courses a student took plus the programs to audit.
+
+    Courses are indexed by (subject_code, course_code), so membership checks
+    are O(1). A course added twice is kept once: a passed attempt replaces
+    earlier ones (the latest grade counts), a failed attempt never replaces
+    a passed one. The course keeps its first position in the transcript.
+
+    A Transcript is a builder; audits work on snapshot(), which is immutable
+    and cached until the transcript changes.
+    """
     courses: List[Course]
     program_titles : List[str]
 
     def __init__(self):
         self.courses = []
         self.program_titles = []
-          
+        self._index: Dict[CourseKey, int] = {}
+        self._snapshot: Optional[TranscriptSnapshot] = None
+
     def add_program(self,title:str) -> "Transcript":
         self.program_titles.append(title)
+        self._snapshot = None
         return self
-    
+
     def get_program_titles(self):
         return self.program_titles
 
     def add_course(self, subject_code: str, course_code: int, grade: str, credit: int,) -> "Transcript":
-        self.courses.append(Course(
+        course = Course(
             subject_code=subject_code,
             course_code=course_code,
             grade=grade,
             credit=credit,
-        ))
+        )
+        self._snapshot = None
+        key = course.key
+        position = self._index.get(key)
+        if position is None:
+            self._index[key] = len(self.courses)
+            self.courses.append(course)
+            return self
+
+        previous = self.courses[position]
+        course.attempts = previous.attempts + 1
+        if course.is_usable() or not previous.is_usable():
+            self.courses[position] = course
+        else:
+            previous.attempts = course.attempts
         return self
-                
+
+    def changed(self):
+        """Drop the cached snapshot after Courses were edited in place."""
+        self._snapshot = None
+
+    def snapshot(self) -> TranscriptSnapshot:
+        """Immutable copy of the transcript, rebuilt only after a change."""
+        if self._snapshot is None:
+            self._snapshot = TranscriptSnapshot(
+                tuple(CourseRecord.from_course(course) for course in self.courses),
+                tuple(self.program_titles),
+            )
+        return self._snapshot
+
+    def has_course(self, subject_code: str, course_code) -> bool:
+        return course_key(subject_code, course_code) in self._index
+
+    def get_course(self, subject_code: str, course_code) -> Optional[Course]:
+        position = self._index.get(course_key(subject_code, course_code))
+        return None if position is None else self.courses[position]
+
+    def __contains__(self, key: CourseKey) -> bool:
+        return course_key(*key) in self._index
+
+    def __len__(self) -> int:
+        return len(self.courses)
+
     def __iter__(self) -> Iterator[Course]:
         for course in self.courses:
             yield course
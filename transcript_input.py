@@ -0,0 +1,97 @@
+"""
+Transcripts as submitted by clients, and their validation.
+
+Shared by the HTTP API and the offline batch runner so that a transcript is
+accepted or rejected the same way by both: the request models, numeric
+course codes, failed courses worth 0 credits unless given, and credits
+filled from the course database, with an error for any still unknown.
+"""
+from typing import Iterable, List, Optional
+from pydantic import BaseModel, Field
+from transcript import CourseRecord, Transcript
+from course_db import get_course_db
+
+
+class InvalidTranscript(ValueError):
+    """raised when a submitted transcript cannot be audited"""
+    pass
+
+
+class CourseInput(BaseModel):
+    """
+    Input model for a single course in the transcript.
+
+    Attributes:
+        subject_code: Department/subject code (e.g., "COMP", "MATH", "ECON", "PHYS")
+        course_code: Course number as a string (must be numeric, e.g., "206", "133", "350")
+        grade: Letter grade received (e.g., "A", "A-", "B+", "B", "B-", "C+", "C", "F")
+        credit: Number of credits earned. Use 0 for failed courses (grade "F"). If omitted,
+                the credits are looked up in the local course database
+    """
+    subject_code: str = Field(..., description="Subject code (e.g., 'COMP', 'MATH', 'ECON')")
+    course_code: str = Field(..., description="Course code as a string (must be numeric, e.g., '206', '133', '350')")
+    grade: str = Field(..., description="Grade received (e.g., 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'F')")
+    credit: Optional[int] = Field(None, description="Number of credits for the course. Use 0 for failed courses. Omit to look it up.")
+
+
+class TranscriptInput(BaseModel):
+    """
+    Input model for transcript data containing programs and courses.
+
+    Attributes:
+        program_titles: List of program names to audit against. Must match exact program names
+                       as they appear in the system (e.g., "Computer Science Major Concentration (B.A.)")
+        courses: List of all courses the student has taken
+    """
+    program_titles: List[str] = Field(..., description="List of program titles to audit against")
+    courses: List[CourseInput] = Field(..., description="List of courses taken by the student")
+
+
+def course_code(course) -> int:
+    """The numeric code of a CourseInput (or any input with a course_code)."""
+    try:
+        return int(course.course_code)
+    except (ValueError, TypeError):
+        raise InvalidTranscript(f"Invalid course_code '{course.course_code}'. Course codes must be numeric.")
+
+
+def course_credit(course: CourseInput) -> Optional[int]:
+    if course.credit is None and course.grade.strip().upper() == "F":
+        return 0
+    return course.credit
+
+
+def check_credits(courses: Iterable) -> None:
+    unknown = [f"{c.subject_code} {c.course_code}" for c in courses if c.credit is None]
+    if unknown:
+        raise InvalidTranscript(f"Unknown credits for {', '.join(unknown)}. Please provide the credit.")
+
+
+def build_transcript(transcript_input: TranscriptInput) -> Transcript:
+    """A Transcript for transcript_input, with titles and missing credits filled in."""
+    transcript = Transcript()
+    for program_title in transcript_input.program_titles:
+        transcript.add_program(program_title)
+    for course in transcript_input.courses:
+        transcript.add_course(
+            subject_code=course.subject_code,
+            course_code=course_code(course),
+            grade=course.grade,
+            credit=course_credit(course)
+        )
+
+    # Titles, and credits the user left out, come from the course database
+    get_course_db().fill(transcript)
+    check_credits(transcript)
+    return transcript
+
+
+def build_records(courses: List[CourseInput]) -> List[CourseRecord]:
+    """Validated CourseRecords for the courses of an incremental diff."""
+    records = [
+        CourseRecord(course.subject_code, course_code(course), course_credit(course), course.grade)
+        for course in courses
+    ]
+    records = get_course_db().fill_records(records)
+    check_credits(records)
+    return records
@@ -4,34 +4,116 @@ import ReportViewer from './components/ReportViewer'
 import LoadingIndicator from './components/LoadingIndicator'
 import './App.css'
 
+const courseId = (c) => `${c.subject_code.trim().toUpperCase()} ${String(c.course_code).trim()}`
+
+// Added, removed and changed courses between two transcripts
+function diffCourses(before, after) {
+  const previous = new Map(before.map(c => [courseId(c), c]))
+  const current = new Map(after.map(c => [courseId(c), c]))
+  const added = [], removed = [], changed = []
+  for (const [id, course] of current) {
+    const old = previous.get(id)
+    if (!old) added.push(course)
+    else if (old.grade !== course.grade || old.credit !== course.credit) changed.push(course)
+  }
+  for (const [id, course] of previous) {
+    if (!current.has(id)) removed.push({ subject_code: course.subject_code, course_code: course.course_code })
+  }
+  return { added, removed, changed }
+}
+
+const sameTitles = (a, b) => a.length === b.length && a.every((title, i) => title === b[i])
+
+// Rebuild the reports of a delta response ({"ref": path} nodes point into
+// base). Unchanged blocks are the very objects of base, so the viewer can
+// skip them.
+function applyDelta(nodes, base) {
+  const resolve = (node) => {
+    if (node.ref) {
+      let block = base[node.ref[0]]
+      for (const i of node.ref.slice(1)) block = block.blocks[i]
+      return block
+    }
+    return { ...node, blocks: node.blocks.map(resolve) }
+  }
+  return nodes.map(resolve)
+}
+
+// Response body of an audit request, given the last audit the client holds
+async function readAudit(response, lastAudit) {
+  if (response.status === 304) {
+    return { reports: lastAudit.reports, audit_id: lastAudit.audit_id, etag: lastAudit.etag }
+  }
+  if (!response.ok) {
+    const errorData = await response.json()
+    throw new Error(errorData.detail || `HTTP error! status: ${response.status}`)
+  }
+  const data = await response.json()
+  data.etag = response.headers.get('ETag')
+  if (data.delta) {
+    data.reports = applyDelta(data.reports, lastAudit.reports)
+  }
+  return data
+}
+
+// Conditional request headers and query string for the last audit's ETag
+function conditional(lastAudit) {
+  if (!lastAudit?.etag) return { headers: {}, query: '' }
+  return {
+    headers: { 'If-None-Match': lastAudit.etag },
+    query: `?delta_from=${encodeURIComponent(lastAudit.etag)}`,
+  }
+}
+
 function App() {
   const [reports, setReports] = useState(null)
+  const [failures, setFailures] = useState([])
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
 
   const [transcriptCollapsed, setTranscriptCollapsed] = useState(false)
+  // The last successful audit, re-audited incrementally when only courses change
+  const [lastAudit, setLastAudit] = useState(null)
 
   const handleAudit = async (transcriptData) => {
     setLoading(true)
     setError(null)
     setReports(null)
+    setFailures([])
+
+    const incremental = lastAudit && sameTitles(lastAudit.transcript.program_titles, transcriptData.program_titles)
+    const request = incremental
+      ? {
+          url: '/audit/incremental',
+          body: {
+            audit_id: lastAudit.audit_id,
+            transcript: lastAudit.transcript,
+            reports: lastAudit.reports,
+            ...diffCourses(lastAudit.transcript.courses, transcriptData.courses),
+          },
+        }
+      : { url: '/audit', body: transcriptData }
 
     try {
-      const response = await fetch('/audit', {
+      const { headers, query } = conditional(lastAudit)
+      const response = await fetch(request.url + query, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...headers,
         },
-        body: JSON.stringify(transcriptData),
+        body: JSON.stringify(request.body),
       })
 
-      if (!response.ok) {
-        const errorData = await response.json()
-        throw new Error(errorData.detail || `HTTP error! status: ${response.status}`)
-      }
-
-      const data = await response.json()
+      const data = await readAudit(response, lastAudit)
       setReports(data.reports)
+      setFailures(data.failures || [])
+      setLastAudit({
+        audit_id: data.audit_id,
+        etag: data.etag,
+        transcript: { ...transcriptData, courses: transcriptData.courses.map(c => ({ ...c })) },
+        reports: data.reports,
+      })
       setTranscriptCollapsed(true) // Collapse transcript builder after successful audit
     } catch (err) {
       setError(err.message)
@@ -41,6 +123,24 @@ function App() {
     }
   }
 
+  // Audit again only the programs that failed; the others keep their reports
+  const handleRetry = async () => {
+    setLoading(true)
+    setError(null)
+    try {
+      const response = await fetch(`/audit/${lastAudit.audit_id}/retry`, { method: 'POST' })
+      const data = await readAudit(response, lastAudit)
+      setReports(data.reports)
+      setFailures(data.failures || [])
+      setLastAudit({ ...lastAudit, audit_id: data.audit_id, etag: data.etag, reports: data.reports })
+    } catch (err) {
+      setError(err.message)
+      console.error('Error retrying audit:', err)
+    } finally {
+      setLoading(false)
+    }
+  }
+
   return (
     <div className="app">
       <main className="app-main">
@@ -81,6 +181,18 @@ function App() {
               </div>
             )}
 
+            {failures.length > 0 && !loading && (
+              <div className="error-message">
+                <strong>Not audited:</strong>{' '}
+                {failures.map(f => `${f.program} (${f.error})`).join('; ')}
+                {lastAudit?.audit_id && (
+                  <button className="btn-retry" onClick={handleRetry}>
+                    Retry failed programs
+                  </button>
+                )}
+              </div>
+            )}
+
             {reports && !loading && (
               <div className="app-section">
                 <ReportViewer reports={reports} />
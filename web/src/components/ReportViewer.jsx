@@ -4,6 +4,9 @@ import './ReportViewer.css'
 
 const VALID_GRADES = ["A", "A-", "B+", "B", "B-", "C+", "C", "F"]
 
+// Normalized copy of each report block received from the API
+const normalizedBlocks = new WeakMap()
+
 function ReportViewer({ reports: initialReports }) {
   const [reports, setReports] = useState(initialReports)
   const [expandedBlocks, setExpandedBlocks] = useState(new Set())
@@ -33,24 +36,24 @@ function ReportViewer({ reports: initialReports }) {
     })
   }
 
-  // Normalize reports on mount and when initialReports change
+  // Normalize reports on mount and when initialReports change. Blocks a
+  // delta response left unchanged are the same objects as before, so their
+  // normalized copies are reused instead of being rebuilt.
   useEffect(() => {
-    const normalizeReports = (reports) => {
-      return reports.map(report => {
-        const normalizeBlock = (block) => {
-          const normalized = {
-            ...block,
-            courses: normalizeCourses(block.courses)
-          }
-          if (block.blocks && block.blocks.length > 0) {
-            normalized.blocks = block.blocks.map(normalizeBlock)
-          }
-          return normalized
-        }
-        return normalizeBlock(report)
-      })
+    const normalizeBlock = (block) => {
+      const cached = normalizedBlocks.get(block)
+      if (cached) return cached
+      const normalized = {
+        ...block,
+        courses: normalizeCourses(block.courses)
+      }
+      if (block.blocks && block.blocks.length > 0) {
+        normalized.blocks = block.blocks.map(normalizeBlock)
+      }
+      normalizedBlocks.set(block, normalized)
+      return normalized
     }
-    setReports(normalizeReports(initialReports))
+    setReports(initialReports.map(normalizeBlock))
   }, [initialReports])
 
   const toggleBlock = (path) => {
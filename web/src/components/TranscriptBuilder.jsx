@@ -1,4 +1,4 @@
-import { useState } from 'react'
+import { useRef, useState } from 'react'
 import { Plus, Trash2, FileText, Send, ChevronDown } from 'lucide-react'
 import './TranscriptBuilder.css'
 
@@ -62,10 +62,34 @@ function TranscriptBuilder({ onAudit, loading, onCollapse }) {
     setProgramTitles([...programTitles, ""])
   }
 
+  const [suggestions, setSuggestions] = useState([])
+  const [knownTitles, setKnownTitles] = useState({})
+  const suggestTimer = useRef(null)
+
+  // Ask the API for matching titles while the user types (debounced)
+  const fetchSuggestions = (value) => {
+    clearTimeout(suggestTimer.current)
+    suggestTimer.current = setTimeout(async () => {
+      try {
+        const response = await fetch(`/programs?q=${encodeURIComponent(value)}&limit=8`)
+        if (!response.ok) return
+        const data = await response.json()
+        setSuggestions(data.results.map(r => r.title))
+        setKnownTitles(known => ({
+          ...known,
+          [value]: data.results.some(r => r.exact && r.title === value)
+        }))
+      } catch (err) {
+        // Suggestions are a convenience; the audit still validates titles
+      }
+    }, 150)
+  }
+
   const updateProgram = (index, value) => {
     const newPrograms = [...programTitles]
     newPrograms[index] = value
     setProgramTitles(newPrograms)
+    fetchSuggestions(value)
   }
 
   const removeProgram = (index) => {
@@ -154,9 +178,12 @@ function TranscriptBuilder({ onAudit, loading, onCollapse }) {
                 type="text"
                 value={program}
                 onChange={(e) => updateProgram(index, e.target.value)}
+                onFocus={(e) => fetchSuggestions(e.target.value)}
                 placeholder="Program title..."
                 disabled={loading}
-                className="input-compact"
+                list="program-suggestions"
+                className={`input-compact${program && knownTitles[program] === false ? ' input-unknown' : ''}`}
+                title={program && knownTitles[program] === false ? 'Not a known program title' : undefined}
               />
               {programTitles.length > 1 && (
                 <button
@@ -171,6 +198,9 @@ function TranscriptBuilder({ onAudit, loading, onCollapse }) {
             </div>
           ))}
         </div>
+        <datalist id="program-suggestions">
+          {suggestions.map(title => <option key={title} value={title} />)}
+        </datalist>
       </div>
 
       <div className="builder-section compact">